@@ -0,0 +1,118 @@
+# benchmarks/backend_latency.py
+"""
+Backend 延遲比較：同一組 RentalBackend 方法分別在 Supabase 與本機 SQLite 上執行，
+列出每個方法的中位數耗時（每次先清除參考資料快取，量到的是實際查詢）
+
+    supabase  SupabaseDB（需 .streamlit/secrets.toml 的 [supabase] 連線設定）
+    sqlite    SQLiteDB（--sqlite 指定的檔案）
+
+--seed 先把 Supabase 的資料整批複製到 SQLite 檔案，兩邊資料量相同才有可比性；
+離線時可用 --only sqlite 只量 SQLite。
+
+用法:
+    python benchmarks/backend_latency.py [--sqlite bench.db] [--seed] [--only sqlite] [--trials 20]
+"""
+import argparse
+import csv
+import io
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# st.secrets 從工作目錄的 .streamlit/secrets.toml 讀取
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+from services.schema import SOURCE_TABLES, column_types  # noqa: E402
+from services.sqlite_db import SQLiteDB  # noqa: E402
+
+YEAR = date.today().year
+
+# 名稱 -> 呼叫方式，取自各 view 實際使用的方法
+CALLS = {
+    "get_tenants": lambda db: db.get_tenants(),
+    "get_payment_schedule": lambda db: db.get_payment_schedule(year=YEAR, limit=50),
+    "get_payment_summary": lambda db: db.get_payment_summary(YEAR),
+    "get_rent_records": lambda db: db.get_rent_records(year=YEAR, limit=50),
+    "get_rent_summary": lambda db: db.get_rent_summary(YEAR),
+    "get_monthly_rollup": lambda db: db.get_monthly_rollup(YEAR - 4, YEAR),
+    "get_pnl": lambda db: db.get_pnl(YEAR - 4, YEAR),
+    "get_pending_rents": lambda db: db.get_pending_rents(),
+    "get_rent_matrix": lambda db: db.get_rent_matrix(YEAR),
+    "get_overdue_payments": lambda db: db.get_overdue_payments(),
+    "get_all_periods": lambda db: db.get_all_periods(),
+    "get_expenses": lambda db: db.get_expenses(50),
+    "get_memos": lambda db: db.get_memos(),
+}
+
+
+def _time(db, call, trials: int) -> float:
+    call(db)  # 第一次含建立連線，不計入
+    runs = []
+    for _ in range(trials):
+        db._invalidate("tenants", "periods")
+        t0 = time.perf_counter()
+        call(db)
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs)
+
+
+def seed(source, target):
+    """
+    把 source 的所有資料表複製到 target（SQLite），先清空 target（monthly_rollup 由 target 的 trigger 重算）
+
+    source 還沒有的資料表（例如未建立 rooms 的既有資料庫）保留 target 的預設資料
+    """
+    upstream = source._load_schema()
+    with target._get_connection() as conn:
+        cur = conn.cursor()
+        for table in SOURCE_TABLES:
+            if table not in upstream:
+                continue
+            types = column_types(table)
+            buf = io.BytesIO()
+            source.copy_to_csv(f"SELECT {', '.join(types)} FROM {table}", buf)
+            rows = csv.reader(io.StringIO(buf.getvalue().decode("utf-8")))
+            next(rows)
+            # COPY 的 NULL 是空白欄位、布林是 t/f
+            bools = [i for i, kind in enumerate(types.values()) if kind == "bool"]
+            data = []
+            for row in rows:
+                row = [v if v != "" else None for v in row]
+                for i in bools:
+                    row[i] = None if row[i] is None else int(row[i] == "t")
+                data.append(row)
+            cur.execute(f"DELETE FROM {table}")
+            cur.executemany(
+                f"INSERT INTO {table}({', '.join(types)}) VALUES({', '.join('?' * len(types))})", data
+            )
+            print(f"seeded {table}: {len(data)} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sqlite", default="bench.db", help="SQLite 檔案路徑")
+    parser.add_argument("--seed", action="store_true", help="先從 Supabase 複製資料到 SQLite")
+    parser.add_argument("--only", choices=("supabase", "sqlite"))
+    parser.add_argument("--trials", type=int, default=20)
+    args = parser.parse_args()
+
+    supabase = None
+    if args.only != "sqlite" or args.seed:
+        from services.db import SupabaseDB
+        supabase = SupabaseDB()
+    sqlite = SQLiteDB(args.sqlite)
+    if args.seed:
+        seed(supabase, sqlite)
+
+    backends = {name: db for name, db in (("supabase", supabase), ("sqlite", sqlite)) if args.only in (None, name)}
+    print(f"{'method':<24}" + "".join(f"{name + ' ms':>14}" for name in backends))
+    for name, call in CALLS.items():
+        print(f"{name:<24}" + "".join(f"{_time(db, call, args.trials):>14.2f}" for db in backends.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/cold_start.py
+"""
+冷啟動基準測試：每次都開新的 Python process，量測
+
+    import   - 載入 main 相依模組 + 單一 view 的時間（不需資料庫）
+    render   - 以 AppTest 執行 main.py 第一次 rerun 到畫面完成的時間
+               （需 .streamlit/secrets.toml 中的 [supabase] 連線設定，加上 --render）
+
+用法:
+    python benchmarks/cold_start.py [--trials 5] [--render]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# view 模組 -> main.ROUTES 的選單項目
+VIEWS = {
+    "dashboard": "📊 儀表板",
+    "rent": "💵 租金收繳",
+    "tracking": "📅 繳費追蹤",
+    "tenants": "👥 房客管理",
+    "electricity": "⚡ 電費管理",
+    "expenses": "💰 支出管理",
+    "settings": "⚙️ 系統設置",
+}
+
+IMPORT_SNIPPET = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import streamlit, services.db
+t1 = time.perf_counter()
+import views.{view}
+t2 = time.perf_counter()
+print(json.dumps({{"base_ms": (t1 - t0) * 1000, "view_ms": (t2 - t1) * 1000,
+                   "pandas_loaded": "pandas" in sys.modules}}))
+"""
+
+RENDER_SNIPPET = """
+import os, sys, time, json, tomllib
+os.chdir({root!r}); sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+with open(os.path.join({root!r}, ".streamlit", "secrets.toml"), "rb") as f:
+    secrets = tomllib.load(f)
+at = AppTest.from_file(os.path.join({root!r}, "main.py"), default_timeout=120)
+for k, v in secrets.items():
+    at.secrets[k] = v
+at.session_state["menu"] = {menu!r}
+t0 = time.perf_counter()
+at.run()
+print(json.dumps({{"render_ms": (time.perf_counter() - t0) * 1000,
+                   "exceptions": [e.value for e in at.exception]}}))
+"""
+
+
+def _run(snippet: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_imports(trials: int):
+    print(f"{'view':<12} {'base ms':>9} {'view ms':>9}  pandas loaded")
+    for view in VIEWS:
+        runs = [_run(IMPORT_SNIPPET.format(root=ROOT, view=view)) for _ in range(trials)]
+        base = statistics.median(r["base_ms"] for r in runs)
+        view_ms = statistics.median(r["view_ms"] for r in runs)
+        print(f"{view:<12} {base:>9.1f} {view_ms:>9.1f}  {runs[0]['pandas_loaded']}")
+
+
+def bench_render(trials: int):
+    print(f"\n{'view':<12} {'first render ms':>16}")
+    for view, menu in VIEWS.items():
+        runs = [_run(RENDER_SNIPPET.format(root=ROOT, menu=menu)) for _ in range(trials)]
+        errors = [e for r in runs for e in r["exceptions"]]
+        render = statistics.median(r["render_ms"] for r in runs)
+        print(f"{view:<12} {render:>16.1f}" + (f"  ({errors[0][:60]})" if errors else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--render", action="store_true", help="同時量測 AppTest 第一次 rerun 時間")
+    args = parser.parse_args()
+
+    bench_imports(args.trials)
+    if args.render:
+        bench_render(args.trials)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/db_backends.py
+"""
+連線池基準測試：同一組查詢分別以下列方式執行，比較每個查詢的耗時
+
+    psycopg2    ThreadedConnectionPool 取連線 + _read_frame（目前預設）
+    sqlalchemy  SQLAlchemy QueuePool（pool_pre_ping）取連線 + _read_frame
+    read_sql    pd.read_sql 直接傳入 SQLAlchemy engine
+
+需 .streamlit/secrets.toml 中的 [supabase] 連線設定。
+
+用法:
+    python benchmarks/db_backends.py [--trials 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# st.secrets 從工作目錄的 .streamlit/secrets.toml 讀取
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+from services.db import SupabaseDB, _read_frame  # noqa: E402
+
+YEAR = date.today().year
+
+# 名稱 -> (SQL, 參數)，取自 SupabaseDB 各個讀取方法
+QUERIES = {
+    "tenants": ("SELECT * FROM tenants WHERE is_active=1 ORDER BY room_number", ()),
+    "payment_schedule": ("""
+        SELECT * FROM payment_schedule WHERE payment_year=%s
+        ORDER BY payment_year DESC, payment_month DESC, room_number LIMIT 51
+    """, (YEAR,)),
+    "rent_records": ("""
+        SELECT * FROM rent_records WHERE year=%s
+        ORDER BY year DESC, month DESC, room_number LIMIT 51
+    """, (YEAR,)),
+    "pending_rents": ("""
+        SELECT id, room_number, tenant_name, year, month, actual_amount, status
+        FROM rent_records WHERE status IN ('待確認', '未收')
+        ORDER BY year DESC, month DESC, room_number
+    """, ()),
+    "expenses": ("SELECT * FROM expenses ORDER BY expense_date DESC LIMIT %s", (50,)),
+}
+
+
+def _time(fn, trials: int) -> float:
+    fn()  # 第一次含建立連線，不計入
+    runs = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs)
+
+
+def _via_pool(db, query, params):
+    def run():
+        with db._get_connection() as conn:
+            return _read_frame(conn, query, params)
+    return run
+
+
+def _via_read_sql(engine, query, params):
+    def run():
+        return pd.read_sql(query, engine, params=params)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=20)
+    args = parser.parse_args()
+
+    raw_db = SupabaseDB(backend="psycopg2")
+    engine_db = SupabaseDB(backend="sqlalchemy")
+    engine = engine_db._init_connection().engine
+
+    print(f"{'query':<18} {'psycopg2 ms':>12} {'sqlalchemy ms':>14} {'read_sql ms':>12}")
+    for name, (query, params) in QUERIES.items():
+        raw = _time(_via_pool(raw_db, query, params), args.trials)
+        pooled = _time(_via_pool(engine_db, query, params), args.trials)
+        read_sql = _time(_via_read_sql(engine, query, params), args.trials)
+        print(f"{name:<18} {raw:>12.2f} {pooled:>14.2f} {read_sql:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/lease_status.py
+"""
+租約狀態基準測試：以隨機產生的大量房間比較
+
+    loop        逐列 iterrows 計算剩餘天數與狀態（改寫前儀表板的做法）
+    vectorized  services.leases.lease_status
+
+兩者結果須一致（不一致時直接 AssertionError）；不需資料庫。
+
+用法:
+    python benchmarks/lease_status.py [--rooms 1000 5000 20000] [--trials 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from services.leases import EXPIRING_DAYS, lease_status  # noqa: E402
+
+TODAY = date.today()
+
+
+def make_portfolio(n_rooms: int, seed: int = 0):
+    """n_rooms 個房間、約 85% 有房客，租約結束日落在今天前後一年內"""
+    rng = np.random.default_rng(seed)
+    rooms = [f"{b}-{i:04d}" for b in range(1, n_rooms // 1000 + 2) for i in range(1000)][:n_rooms]
+    occupied = [room for room in rooms if rng.random() < 0.85]
+    tenants = pd.DataFrame({
+        "room_number": occupied,
+        "tenant_name": [f"房客{i}" for i in range(len(occupied))],
+        "lease_end": pd.to_datetime(TODAY) + pd.to_timedelta(rng.integers(-365, 365, len(occupied)), unit="D"),
+        "payment_method": rng.choice(["月繳", "半年繳", "年繳"], len(occupied)),
+    })
+    return tenants, rooms
+
+
+def loop_status(tenants, rooms):
+    """改寫前的做法：每間房逐列查詢房客並計算狀態"""
+    active = tenants.set_index("room_number")
+    out = {}
+    for room in rooms:
+        if room in active.index:
+            t = active.loc[room]
+            days = (t["lease_end"].date() - TODAY).days
+            if days < 0:
+                out[room] = ("red", f"{abs(days)} 天已逾期")
+            elif days < EXPIRING_DAYS:
+                out[room] = ("orange", t["tenant_name"])
+            else:
+                out[room] = ("green", t["tenant_name"])
+        else:
+            out[room] = ("gray", "空房")
+    return out
+
+
+def vectorized_status(tenants, rooms):
+    df = lease_status(tenants, rooms, TODAY).set_index("room_number")
+    return dict(zip(df.index, zip(df["color"], df["status_text"])))
+
+
+def _time(fn, trials: int) -> float:
+    runs = []
+    for _ in range(trials):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--trials", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rooms':>8}{'loop ms':>14}{'vectorized ms':>16}")
+    for n in args.rooms:
+        tenants, rooms = make_portfolio(n)
+        assert loop_status(tenants, rooms) == vectorized_status(tenants, rooms), f"{n} 間房的結果不一致"
+        loop = _time(lambda: loop_status(tenants, rooms), args.trials)
+        vec = _time(lambda: vectorized_status(tenants, rooms), args.trials)
+        print(f"{n:>8}{loop:>14.1f}{vec:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/room_grid.py
+"""
+房間卡片渲染基準測試：以隨機產生的大量房間比較
+
+    cards   每間房一個 display_room_card（改寫前儀表板的做法，另外每 4 間房一組 st.columns）
+    grid    components.cards.room_grid（所有房間一個 markdown 元素）
+
+記錄送給前端的 markdown 元素數與 HTML 位元組數，以及產生 HTML 的時間；
+不需資料庫，也不啟動 Streamlit（以記錄器取代 components.cards 裡的 st）。
+
+用法:
+    python benchmarks/room_grid.py [--rooms 1000 5000 20000] [--trials 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.lease_status import make_portfolio  # noqa: E402
+from components import cards  # noqa: E402
+from services.leases import lease_status  # noqa: E402
+
+
+class _Recorder:
+    """只記錄 st.markdown 呼叫的替身"""
+
+    def __init__(self):
+        self.elements = 0
+        self.bytes = 0
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.elements += 1
+        self.bytes += len(body.encode("utf-8"))
+
+
+def per_card(rooms):
+    for room, color, text, detail in zip(rooms["room_number"], rooms["color"], rooms["status_text"], rooms["detail_text"]):
+        cards.display_room_card(room, color, text, detail)
+
+
+def single_grid(rooms):
+    cards.room_grid(rooms)
+
+
+def _measure(fn, rooms, trials: int):
+    runs = []
+    for _ in range(trials):
+        cards.st = recorder = _Recorder()
+        t0 = time.perf_counter()
+        fn(rooms)
+        runs.append((time.perf_counter() - t0) * 1000)
+    return recorder, statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--trials", type=int, default=5)
+    args = parser.parse_args()
+
+    st = cards.st
+    print(f"{'rooms':>8}{'cards elems':>14}{'cards KB':>11}{'cards ms':>11}{'grid elems':>13}{'grid KB':>10}{'grid ms':>10}")
+    try:
+        for n in args.rooms:
+            tenants, all_rooms = make_portfolio(n)
+            rooms = lease_status(tenants, all_rooms, date.today()).drop_duplicates("room_number")
+            old, old_ms = _measure(per_card, rooms, args.trials)
+            new, new_ms = _measure(single_grid, rooms, args.trials)
+            # 改寫前每 4 間房另外有一個 st.columns 容器與 4 個 column
+            old_elements = old.elements + -(-n // 4) * 5
+            print(f"{n:>8}{old_elements:>14}{old.bytes / 1024:>11.0f}{old_ms:>11.1f}"
+                  f"{new.elements:>13}{new.bytes / 1024:>10.0f}{new_ms:>10.1f}")
+    finally:
+        cards.st = st
+
+
+if __name__ == "__main__":
+    main()
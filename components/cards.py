@@ -1,27 +1,50 @@
 # components/cards.py
+import html
+
 import streamlit as st
 
+# KPI 卡片：顏色 -> (背景, 邊框)
+CARD_COLORS = {
+    "blue": ("#f0f4f8", "#98c1d9"),
+    "green": ("#edf2f0", "#99b898"),
+    "orange": ("#fdf3e7", "#e0c3a5"),
+    "red": ("#fbeaea", "#e5989b"),
+}
+# 房間卡片：顏色 -> (背景, 文字)；其餘顏色（空房的 gray）用 ROOM_DEFAULT
+ROOM_COLORS = {
+    "green": ("#eaf4e7", "#2f5d34"),
+    "red": ("#fae3e3", "#8a2c2c"),
+    "orange": ("#fef5e6", "#8a5a2c"),
+}
+ROOM_DEFAULT = ("#f8f9fa", "#4a5568")
+
+# kpi_grid / room_grid 共用的樣式：每個卡片只帶 class，不重複 inline style；
+# 由 main.py 與 assets/style.css 一起在每次 rerun 注入一次，各個 grid 不再各帶一份
+GRID_CSS = (
+    ".cg-grid{display:grid;gap:12px;margin-bottom:12px}"
+    ".cg-kpi{border-radius:10px;padding:16px;border:1px solid;border-left-width:5px;box-shadow:0 1px 2px rgba(0,0,0,0.05)}"
+    ".cg-kpi-t{color:#4a5568;font-size:0.9rem;font-weight:600;letter-spacing:0.5px}"
+    ".cg-kpi-v{color:#2d3748;font-size:1.6rem;font-weight:700;margin-top:6px;font-family:Segoe UI,sans-serif}"
+    ".cg-room{border-radius:12px;padding:12px;text-align:center;height:100px;display:flex;flex-direction:column;"
+    "justify-content:center;align-items:center;box-shadow:0 1px 3px rgba(0,0,0,0.05)}"
+    ".cg-room-n{font-size:1.3rem;font-weight:700}"
+    ".cg-room-s{font-size:0.9rem;font-weight:600;margin-top:4px}"
+    ".cg-room-d{font-size:0.75rem;opacity:0.8}"
+    + "".join(f".cg-kpi.{c}{{background:{bg};border-color:{bd}}}" for c, (bg, bd) in CARD_COLORS.items())
+    + "".join(f".cg-room.{c}{{background:{bg};color:{fg}}}" for c, (bg, fg) in ROOM_COLORS.items())
+    + ".cg-room{background:%s;color:%s}" % ROOM_DEFAULT
+)
+
 
 def display_card(title: str, value: str, color: str = "blue"):
     """顯示 KPI 卡片"""
-    colors = {
-        "blue": "#f0f4f8",
-        "green": "#edf2f0",
-        "orange": "#fdf3e7",
-        "red": "#fbeaea",
-    }
-    bordercolors = {
-        "blue": "#98c1d9",
-        "green": "#99b898",
-        "orange": "#e0c3a5",
-        "red": "#e5989b",
-    }
+    bgcolor, bordercolor = CARD_COLORS.get(color, CARD_COLORS["blue"])
     textcolor = "#4a5568"
     valuecolor = "#2d3748"
 
     st.markdown(
         f"""
-        <div style="background: {colors.get(color, colors['blue'])}; border-radius: 10px; padding: 16px; margin-bottom: 12px; border: 1px solid {bordercolors.get(color, bordercolors['blue'])}; border-left: 5px solid {bordercolors.get(color, bordercolors['blue'])}; box-shadow: 0 1px 2px rgba(0,0,0,0.05);">
+        <div style="background: {bgcolor}; border-radius: 10px; padding: 16px; margin-bottom: 12px; border: 1px solid {bordercolor}; border-left: 5px solid {bordercolor}; box-shadow: 0 1px 2px rgba(0,0,0,0.05);">
             <div style="color: {textcolor}; font-size: 0.9rem; font-weight: 600; letter-spacing: 0.5px;">{title}</div>
             <div style="color: {valuecolor}; font-size: 1.6rem; font-weight: 700; margin-top: 6px; font-family: Segoe UI, sans-serif;">{value}</div>
         </div>
@@ -32,14 +55,7 @@ def display_card(title: str, value: str, color: str = "blue"):
 
 def display_room_card(room, statuscolor, statustext, detailtext):
     """顯示房間卡片"""
-    bgcolor = {"green": "#eaf4e7", "red": "#fae3e3", "orange": "#fef5e6"}.get(
-        statuscolor, "#f8f9fa"
-    )
-    textcolor = {
-        "green": "#2f5d34",
-        "red": "#8a2c2c",
-        "orange": "#8a5a2c",
-    }.get(statuscolor, "#4a5568")
+    bgcolor, textcolor = ROOM_COLORS.get(statuscolor, ROOM_DEFAULT)
 
     st.markdown(
         f"""
@@ -53,6 +69,59 @@ def display_room_card(room, statuscolor, statustext, detailtext):
     )
 
 
+def _color_class(color, palette) -> str:
+    return f" {color}" if color in palette else ""
+
+
+def kpi_grid(cards, columns: int = None):
+    """
+    一次顯示一整列 KPI 卡片（單一 markdown 元素的 CSS grid，取代每張卡片一個元素）
+
+    params:
+        cards: [(title, value, color), ...]
+        columns: 每列卡片數（None 為全部排成一列）
+    """
+    cards = list(cards)
+    body = "".join(
+        f'<div class="cg-kpi{_color_class(color, CARD_COLORS) or " blue"}">'
+        f'<div class="cg-kpi-t">{html.escape(str(title))}</div>'
+        f'<div class="cg-kpi-v">{html.escape(str(value))}</div></div>'
+        for title, value, color in cards
+    )
+    template = f"repeat({columns or max(len(cards), 1)}, minmax(0, 1fr))"
+    st.markdown(
+        f'<div class="cg-grid" style="grid-template-columns:{template}">{body}</div>',
+        unsafe_allow_html=True,
+    )
+
+
+def room_grid(rooms, min_width: int = 140):
+    """
+    一次顯示所有房間卡片（單一 markdown 元素的 CSS grid）
+
+    元素數量與房間數無關，傳給瀏覽器的只有每間房的房號與文字；
+    欄數依畫面寬度自動調整（每張卡片至少 min_width px）
+
+    params:
+        rooms: 含 room_number / color / status_text / detail_text 欄位的 DataFrame
+               （services.leases.lease_status 的結果）
+    """
+    body = "".join(
+        f'<div class="cg-room{_color_class(color, ROOM_COLORS)}">'
+        f'<div class="cg-room-n">{html.escape(str(room))}</div>'
+        f'<div class="cg-room-s">{html.escape(str(text))}</div>'
+        f'<div class="cg-room-d">{html.escape(str(detail))}</div></div>'
+        for room, color, text, detail in zip(
+            rooms["room_number"], rooms["color"], rooms["status_text"], rooms["detail_text"]
+        )
+    )
+    st.markdown(
+        f'<div class="cg-grid" style="grid-template-columns:repeat(auto-fill, minmax({min_width}px, 1fr))">'
+        f"{body}</div>",
+        unsafe_allow_html=True,
+    )
+
+
 def section_header(title: str, icon: str = "📋"):
     """顯示區塊標題"""
     st.markdown(f"### {icon} {title}")
@@ -71,11 +140,8 @@ def info_box(title: str, content: str, box_type: str = "info"):
 
 
 def metric_row(col_titles: list, col_values: list, col_colors: list = None):
-    """顯示度量指標行"""
+    """顯示度量指標行（單一元素，見 kpi_grid）"""
     if col_colors is None:
         col_colors = ["blue"] * len(col_titles)
     
-    cols = st.columns(len(col_titles))
-    for col, title, value, color in zip(cols, col_titles, col_values, col_colors):
-        with col:
-            display_card(title, value, color)
+    kpi_grid(zip(col_titles, col_values, col_colors))
@@ -0,0 +1,47 @@
+# components/pager.py
+import streamlit as st
+
+
+def _push(state_key, cursor):
+    st.session_state[state_key].append(cursor)
+
+
+def _pop(state_key):
+    if len(st.session_state[state_key]) > 1:
+        st.session_state[state_key].pop()
+
+
+def keyset_pager(key: str, fetch, cursor_of, page_size: int = 50, total=None):
+    """
+    keyset 分頁：只向資料庫要一頁資料
+
+    params:
+        key: 分頁狀態的 key；篩選條件不同時請給不同的 key，會從第一頁開始
+        fetch: fetch(after, limit) -> DataFrame
+        cursor_of: 由一頁的最後一列取得下一頁的 after，例如 (year, month, room)
+        page_size: 每頁筆數
+        total: 總筆數估計（顯示用，可省略）
+
+    returns:
+        目前這一頁的 DataFrame
+    """
+    state_key = f"pager_{key}"
+    cursors = st.session_state.setdefault(state_key, [None])
+
+    # 多取一筆來判斷是否還有下一頁
+    df = fetch(cursors[-1], page_size + 1)
+    has_next = len(df) > page_size
+    df = df.iloc[:page_size]
+
+    page_no = len(cursors)
+    c1, c2, c3 = st.columns([1, 2, 1])
+    c1.button("◀ 上一頁", key=f"{state_key}_prev", disabled=page_no == 1,
+              on_click=_pop, args=(state_key,), use_container_width=True)
+    caption = f"第 {page_no} 頁"
+    if total is not None:
+        caption += f" · 約 {total:,} 筆"
+    c2.caption(caption)
+    c3.button("下一頁 ▶", key=f"{state_key}_next", disabled=not has_next,
+              on_click=_push, args=(state_key, cursor_of(df.iloc[-1]) if has_next else None),
+              use_container_width=True)
+    return df
@@ -0,0 +1,32 @@
+# components/refresh.py
+import streamlit as st
+from streamlit.errors import StreamlitAPIException
+
+_FLASH_KEY = "_flash_messages"
+
+
+def flash(message: str, icon: str = "✅"):
+    """排入提示訊息，在下一次（含 fragment）rerun 開頭顯示"""
+    st.session_state.setdefault(_FLASH_KEY, []).append((message, icon))
+
+
+def show_flash():
+    """顯示並清空排隊中的提示訊息（main 與各 fragment 開頭呼叫）"""
+    for message, icon in st.session_state.pop(_FLASH_KEY, []):
+        st.toast(message, icon=icon)
+
+
+def refresh_after_write(message: str = None, icon: str = "✅"):
+    """
+    寫入成功後的刷新
+
+    在 @st.fragment 內只重跑該 fragment（例如備忘錄清單、待確認租金），
+    不在 fragment 內則整頁重跑。不再 time.sleep 等待提示顯示，
+    提示改由下一次 rerun 開頭的 show_flash() 以 toast 呈現。
+    """
+    if message:
+        flash(message, icon)
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
@@ -0,0 +1,32 @@
+# components/tabs.py
+import streamlit as st
+
+
+def lazy_tabs(labels: list, key: str) -> str:
+    """
+    取代 st.tabs 的分頁切換
+
+    st.tabs 每次 rerun 都會執行所有分頁內容（含查詢）；
+    這裡只回傳目前選中的分頁，view 用 if/elif 只執行該分頁。
+    選擇結果存在 session_state，切換到別的頁面再回來仍會保留。
+    """
+    store_key = f"lazy_tab_{key}"
+    widget_key = f"{store_key}_widget"
+
+    if st.session_state.get(store_key) not in labels:
+        st.session_state[store_key] = labels[0]
+    # widget 不在畫面上時 Streamlit 會清掉它的狀態，所以由 store_key 還原
+    if st.session_state.get(widget_key) not in labels:
+        st.session_state[widget_key] = st.session_state[store_key]
+
+    def _remember():
+        st.session_state[store_key] = st.session_state[widget_key]
+
+    return st.radio(
+        key,
+        labels,
+        key=widget_key,
+        horizontal=True,
+        label_visibility="collapsed",
+        on_change=_remember,
+    )
@@ -1,5 +1,8 @@
 import streamlit as st
 import os
+import importlib
+
+from components.cards import GRID_CSS
 
 # 設定頁面配置
 st.set_page_config(
@@ -9,28 +12,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 載入自定義 CSS
-def load_css(file_name):
+# 載入自定義 CSS（檔案內容每個 process 只讀一次）
+@st.cache_resource
+def read_css(file_name):
     try:
         with open(file_name) as f:
-            st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+            return f.read()
     except FileNotFoundError:
-        pass  # 容錯處理
+        return ""  # 容錯處理
+
+def load_css(file_name):
+    # 頁面樣式與 KPI / 房間卡片 grid 的樣式一起注入（每次 rerun 一個元素）
+    css = read_css(file_name) + GRID_CSS
+    st.markdown(f'<style>{css}</style>', unsafe_allow_html=True)
 
 css_path = os.path.join("assets", "style.css")
 load_css(css_path)
 
-# 初始化資料庫
-from services.db import SupabaseDB
+# 選單項目 -> View 模組名稱（選到才 import，冷啟動只載入一個 view）
+ROUTES = {
+    "📊 儀表板": "dashboard",
+    "💵 租金收繳": "rent",
+    "📅 繳費追蹤": "tracking",
+    "👥 房客管理": "tenants",
+    "⚡ 電費管理": "electricity",
+    "💰 支出管理": "expenses",
+    "📈 損益報表": "reports",
+    "⚙️ 系統設置": "settings",
+}
+
+# 初始化資料庫（RENTAL_DB_BACKEND=sqlite 時改用本機 SQLite，見 services/backend.py）
+from services.backend import open_backend
 
 @st.cache_resource
 def get_db():
-    return SupabaseDB()
+    db = open_backend()
+    # 背景暖機：開連線池、預載參考資料，並預先 import 其餘 view
+    db.start_warm_up(preload_modules=[f"views.{name}" for name in ROUTES.values()])
+    return db
 
 db = get_db()
 
-# 引入所有 Views
-from views import dashboard, tenants, rent, electricity, expenses, tracking, settings
+from services.query_stats import track_queries, check_budget
+from services.profiling import profiling_enabled, profile_rerun
+from components.refresh import show_flash
+
+def load_view(menu):
+    return importlib.import_module(f"views.{ROUTES[menu]}")
 
 def main():
     with st.sidebar:
@@ -39,34 +67,29 @@ def main():
         
         menu = st.radio(
             "功能選單",
-            [
-                "📊 儀表板",
-                "💵 租金收繳",
-                "📅 繳費追蹤",
-                "👥 房客管理",
-                "⚡ 電費管理",
-                "💰 支出管理",
-                "⚙️ 系統設置"
-            ],
-            label_visibility="collapsed"
+            list(ROUTES.keys()),
+            label_visibility="collapsed",
+            key="menu"
         )
         
+    show_flash()
+    
     # 路由邏輯
-    if menu == "📊 儀表板":
-        dashboard.render(db)
-    elif menu == "💵 租金收繳":
-        rent.render(db)
-    elif menu == "📅 繳費追蹤":
-        tracking.render(db)
-    elif menu == "👥 房客管理":
-        tenants.render(db)
-    elif menu == "⚡ 電費管理":
-        electricity.render(db)
-    elif menu == "💰 支出管理":
-        expenses.render(db)
-    elif menu == "⚙️ 系統設置":
-        settings.render(db)
+    view = load_view(menu)
+    # 查詢逾時改用上次結果時，提示顯示在頁面最上方
+    notice = st.container()
+    with track_queries() as stats:
+        view.render(db)
+    if stats.degraded:
+        age = max(age for _, age in stats.degraded)
+        notice.warning(f"⏳ 資料庫回應逾時，部分資料為 {age:.0f} 秒前的結果，請稍後重新整理")
+    st.session_state["last_query_stats"] = {"menu": menu, **stats.to_dict()}
+    check_budget(menu, stats, getattr(view, "QUERY_BUDGET", None))
 
 if __name__ == "__main__":
-    main()
+    if profiling_enabled():
+        with profile_rerun():
+            main()
+    else:
+        main()
 
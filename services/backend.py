@@ -0,0 +1,767 @@
+# services/backend.py
+"""
+資料存取介面
+
+views 只透過 RentalBackend 的方法讀寫資料；
+SupabaseDB（services/db.py，PostgreSQL）與 SQLiteDB（services/sqlite_db.py，本機檔案）各自實作。
+以環境變數 RENTAL_DB_BACKEND 選擇（預設 supabase），見 open_backend()。
+"""
+import abc
+import os
+import importlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, date, timedelta
+
+from services.query_stats import untracked
+from services.rooms import RoomRegistry, default_registry
+
+logger = logging.getLogger(__name__)
+
+
+class _LazyModule:
+    """第一次存取屬性時才 import（pandas 約需 0.5 秒，延後到真正查詢時）"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pd = _LazyModule("pandas")
+
+# 常數定義
+WATER_FEE = 100
+PAYMENT_METHODS = ["月繳", "半年繳", "年繳"]
+
+# 參考資料（房客、計費期間）在 process 內的快取秒數
+REF_CACHE_TTL = 60
+# 資料表欄位清單（驗證 columns 參數用）與房間清單（get_rooms）的快取秒數
+SCHEMA_CACHE_TTL = 3600
+
+# 重複值多的字串欄位改用 category（房號、狀態、繳費方式、支出分類）
+CATEGORY_COLUMNS = {"room_number", "房號", "status", "繳費狀態", "payment_method", "category"}
+
+# 批次匯入的暫存表欄位（依此順序讀取 CSV）
+IMPORT_STAGING = {
+    "tenants": """room_number text, tenant_name text, phone text, deposit numeric, base_rent numeric,
+                  lease_start date, lease_end date, payment_method text, has_water_fee boolean""",
+    "meters": "room_number text, meter_start_reading numeric, meter_end_reading numeric",
+    "expenses": "expense_date date, category text, amount numeric, description text",
+}
+IMPORT_COLUMNS = {
+    name: [col.split()[0] for col in ddl.split(",")]
+    for name, ddl in IMPORT_STAGING.items()
+}
+
+# 選擇 backend：supabase（預設）或 sqlite；sqlite 檔案位置由 RENTAL_SQLITE_PATH 指定
+BACKEND_ENV = "RENTAL_DB_BACKEND"
+SQLITE_PATH_ENV = "RENTAL_SQLITE_PATH"
+BACKENDS = ("supabase", "sqlite")
+# 設定時 Supabase 的讀取改查這個本機 SQLite 鏡像（services/mirror.py）
+MIRROR_PATH_ENV = "RENTAL_MIRROR_PATH"
+# Supabase 只讀寫這個 property 的資料（未設定時不篩選，見 SupabaseDB 的 property_id）
+PROPERTY_ENV = "RENTAL_PROPERTY_ID"
+
+# 損益報表（get_pnl）的彙總粒度
+PNL_GRANULARITIES = ("month", "year")
+
+# 寫入方法 -> 會修改的資料表（其餘介面方法皆為唯讀）
+WRITE_TABLES = {
+    "add_tenant": ("tenants", "payment_schedule"),
+    "update_tenant": ("tenants",),
+    "delete_tenant": ("tenants",),
+    "mark_payment_done": ("payment_schedule",),
+    "mark_payments_done_bulk": ("payment_schedule",),
+    "batch_record_rent": ("rent_records",),
+    "confirm_rent_payment": ("rent_records",),
+    "confirm_rent_payments": ("rent_records",),
+    "add_electricity_period": ("electricity_period",),
+    "delete_electricity_period": ("electricity_period", "electricity_payment", "electricity_meter",
+                                  "electricity_tdy_bill", "electricity_calculation"),
+    "add_tdy_bill": ("electricity_tdy_bill",),
+    "add_meter_reading": ("electricity_meter",),
+    "save_electricity_record": ("electricity_payment",),
+    "update_electricity_payment": ("electricity_payment",),
+    "add_expense": ("expenses",),
+    "bulk_import": ("tenants", "payment_schedule", "electricity_meter", "expenses"),
+    "add_memo": ("memos",),
+    "complete_memo": ("memos",),
+    "save_rooms": ("rooms",),
+}
+
+
+# 輔助函數：生成繳費排程
+def generate_payment_schedule(payment_method: str, start_date, end_date):
+    """生成繳費排程"""
+    try:
+        from dateutil.relativedelta import relativedelta
+        use_relativedelta = True
+    except ImportError:
+        use_relativedelta = False
+
+    if isinstance(start_date, str):
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+    else:
+        start = datetime.combine(start_date, datetime.min.time())
+
+    if isinstance(end_date, str):
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+    else:
+        end = datetime.combine(end_date, datetime.min.time())
+
+    schedule = []
+    current = start
+
+    while current <= end:
+        year = current.year
+        month = current.month
+
+        if payment_method == "月繳":
+            schedule.append((year, month))
+            if use_relativedelta:
+                current = current + relativedelta(months=1)
+            else:
+                if month == 12:
+                    current = datetime(year + 1, 1, 1)
+                else:
+                    current = datetime(year, month + 1, 1)
+
+        elif payment_method == "半年繳":
+            if month in [1, 7]:
+                schedule.append((year, month))
+            if use_relativedelta:
+                current = current + relativedelta(months=6)
+            else:
+                current = current + timedelta(days=180)
+
+        elif payment_method == "年繳":
+            if month == 1:
+                schedule.append((year, month))
+            if use_relativedelta:
+                current = current + relativedelta(years=1)
+            else:
+                current = datetime(year + 1, 1, 1)
+
+    return schedule
+
+
+def clean_paid_rows(rows) -> list:
+    """
+    批次標記繳費的列整理成 [(payment_id, paid_date, paid_amount, notes), ...]
+
+    raises:
+        ValueError: 實收金額空白（None / NaN，例如 data_editor 清空的儲存格）
+    """
+    cleaned = []
+    for i, (pid, paid_date, amount, notes) in enumerate(rows):
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            amount = math.nan
+        if math.isnan(amount):
+            raise ValueError(f"第 {i + 1} 筆選取項目的實收金額空白")
+        cleaned.append((int(pid), paid_date, amount, notes if isinstance(notes, str) else ""))
+    return cleaned
+
+
+def property_filter(property_id, alias: str = None, prefix: str = " AND ") -> str:
+    """
+    限定 property 的 SQL 條件（property_id 為 None 時為空字串）
+
+    以整數常數（不是參數）寫入 SQL，PostgreSQL 在規劃時就能選用 property_id 開頭的索引
+    """
+    if property_id is None:
+        return ""
+    column = f"{alias}.property_id" if alias else "property_id"
+    return f"{prefix}{column} = {int(property_id)}"
+
+
+def pnl_query(granularity: str, param: str = "%s", rollup: str = "monthly_rollup", property_id=None) -> str:
+    """
+    get_pnl 的 SQL（PostgreSQL 與 SQLite 共用，只有參數符號不同）
+
+    以 monthly_rollup 彙總收入（已收租金 + 已收電費）與支出，不讀原始資料列；
+    內層多取前一年供 LAG 計算年增減，外層再濾掉並計算區間內的累計淨利。
+    參數依序為 (year_from - 1, year_to, year_from)
+
+    params:
+        granularity: "month"（每月一列）或 "year"（每年一列，month 為 0）
+        rollup: 彙總表；尚未建立 monthly_rollup 時傳入 schema.rollup_view() 的子查詢
+        property_id: 只彙總這個 property（None 為全部）
+    """
+    if granularity not in PNL_GRANULARITIES:
+        raise ValueError(f"未知的 granularity: {granularity}（可用: {', '.join(PNL_GRANULARITIES)}）")
+    month = "month" if granularity == "month" else "0"
+    return f"""
+        WITH periods AS (
+            SELECT year, {month} AS month,
+                   SUM(rent_paid) AS rent_income,
+                   SUM(electricity_collected) AS electricity_income,
+                   SUM(expense_amount) AS expenses
+            FROM {rollup}
+            WHERE year BETWEEN {param} AND {param}{property_filter(property_id)}
+            GROUP BY 1, 2
+        ),
+        net AS (
+            SELECT *, rent_income + electricity_income - expenses AS net_income
+            FROM periods
+        ),
+        yoy AS (
+            SELECT *,
+                   CASE WHEN LAG(year) OVER same_period = year - 1
+                        THEN net_income - LAG(net_income) OVER same_period END AS net_yoy
+            FROM net
+            WINDOW same_period AS (PARTITION BY month ORDER BY year)
+        )
+        SELECT year, month, rent_income, electricity_income, expenses, net_income,
+               SUM(net_income) OVER (ORDER BY year, month) AS cumulative_net,
+               net_yoy
+        FROM yoy
+        WHERE year >= {param}
+        ORDER BY year, month
+    """
+
+
+# 帳齡區間：欄位名稱 -> (逾期天數下限, 上限)；上限 None 為不設上限
+ARREARS_BUCKETS = {
+    "days_0_30": (0, 30),
+    "days_31_60": (31, 60),
+    "days_61_90": (61, 90),
+    "days_90_plus": (91, None),
+}
+
+# arrears_query 的方言差異：今天、逾期天數、租金記錄的應繳日（與繳費排程相同，次月 5 日）
+_ARREARS_DIALECTS = {
+    "postgres": {
+        "today": "CAST(%s AS date)",
+        "age": "(t.d - {})",
+        "rent_due": "CAST(make_date(r.year, r.month, 5) + INTERVAL '1 month' AS date)",
+    },
+    "sqlite": {
+        "today": "date(?)",
+        "age": "CAST(julianday(t.d) - julianday({}) AS INTEGER)",
+        "rent_due": "date(printf('%04d-%02d-05', r.year, r.month), '+1 month')",
+    },
+}
+
+
+def arrears_query(dialect: str, property_id=None) -> str:
+    """
+    get_arrears 的 SQL：逾期未繳的繳費排程與租金記錄，依房客分帳齡區間加總，最後一列（is_total=1）為合計
+
+    同一房間同月份有繳費排程時以排程為準（不重複計入租金記錄）；參數只有今天的日期。
+    property_id 不為 None 時只計入該 property
+    """
+    d = _ARREARS_DIALECTS[dialect]
+    buckets = []
+    for name, (low, high) in ARREARS_BUCKETS.items():
+        cond = f"age >= {low}" if high is None else f"age BETWEEN {low} AND {high}"
+        buckets.append(f"SUM(CASE WHEN {cond} THEN amount ELSE 0 END) AS {name}")
+    return f"""
+        WITH today AS (SELECT {d["today"]} AS d),
+        arrears AS (
+            SELECT s.room_number, s.tenant_name,
+                   s.amount - COALESCE(s.paid_amount, 0) AS amount, {d["age"].format("s.due_date")} AS age
+            FROM payment_schedule s, today t
+            WHERE s.status = '未繳' AND s.due_date < t.d{property_filter(property_id, "s")}
+            UNION ALL
+            SELECT r.room_number, r.tenant_name,
+                   r.actual_amount - COALESCE(r.paid_amount, 0), {d["age"].format(d["rent_due"])}
+            FROM rent_records r, today t
+            WHERE r.status IN ('未收', '待確認') AND {d["rent_due"]} < t.d{property_filter(property_id, "r")}
+              AND NOT EXISTS (
+                  SELECT 1 FROM payment_schedule s
+                  WHERE s.room_number = r.room_number AND s.payment_year = r.year AND s.payment_month = r.month
+                    {property_filter(property_id, "s", prefix="AND ")}
+              )
+        ),
+        by_tenant AS (
+            SELECT room_number, tenant_name, CAST(COUNT(*) AS INTEGER) AS items, {", ".join(buckets)}, SUM(amount) AS total
+            FROM arrears
+            GROUP BY room_number, tenant_name
+        )
+        SELECT 0 AS is_total, by_tenant.* FROM by_tenant
+        UNION ALL
+        SELECT 1, NULL, NULL, CAST(COALESCE(SUM(items), 0) AS INTEGER),
+               {", ".join(f"COALESCE(SUM({name}), 0)" for name in ARREARS_BUCKETS)}, COALESCE(SUM(total), 0)
+        FROM by_tenant
+        ORDER BY is_total DESC, total DESC
+    """
+
+
+def split_arrears(df) -> dict:
+    """
+    arrears_query 的結果拆成 {"by_tenant": 每位房客一列的 DataFrame, "totals": 合計 dict}
+
+    totals 的 key 為 items（逾期筆數）、各帳齡區間與 total
+    """
+    is_total = df["is_total"] == 1
+    totals = df[is_total].iloc[0]
+    return {
+        "by_tenant": df[~is_total].drop(columns="is_total").reset_index(drop=True),
+        "totals": {
+            "items": int(totals["items"]),
+            **{name: float(totals[name]) for name in ARREARS_BUCKETS},
+            "total": float(totals["total"]),
+        },
+    }
+
+
+def _project(value, columns):
+    """從完整欄位的快取資料（DataFrame 或 list of dict）取出部分欄位"""
+    if hasattr(value, "loc"):
+        return value[list(columns)]
+    return [{c: row[c] for c in columns} for row in value]
+
+
+def open_backend():
+    """
+    依 RENTAL_DB_BACKEND 建立 backend（未設定時為 Supabase）
+
+    Supabase 且設定了 RENTAL_MIRROR_PATH 時，讀取改由本機鏡像提供；
+    設定了 RENTAL_PROPERTY_ID 時只讀寫該 property 的資料（鏡像也只同步該 property）
+    """
+    name = os.environ.get(BACKEND_ENV, "supabase")
+    if name not in BACKENDS:
+        raise ValueError(f"未知的 backend: {name}（可用: {', '.join(BACKENDS)}）")
+    if name == "sqlite":
+        from services.sqlite_db import SQLiteDB
+        return SQLiteDB(os.environ.get(SQLITE_PATH_ENV, "rental.db"))
+    from services.db import SupabaseDB
+    property_id = os.environ.get(PROPERTY_ENV)
+    primary = SupabaseDB(property_id=int(property_id) if property_id else None)
+    if os.environ.get(MIRROR_PATH_ENV):
+        from services.mirror import MirroredDB
+        return MirroredDB(primary, os.environ[MIRROR_PATH_ENV])
+    return primary
+
+
+class RentalBackend(abc.ABC):
+    """
+    租屋系統的資料存取介面
+
+    共用的部分（參考資料快取、欄位驗證、背景暖機）在這裡實作；
+    讀寫方法由各 backend 實作，回傳格式必須一致：
+    讀取回傳有型別的 DataFrame（日期為 datetime64），寫入回傳 (ok, msg)；
+    摘要與損益的金額一律為 float（不回傳 Decimal）。讀寫方法都是 abstractmethod，少實作一個時建立物件就會失敗
+    """
+
+    # 只讀寫這個 property 的資料（None 為不篩選；SQLite 檔案只有一個 property）
+    property_id = None
+
+    def __init__(self):
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._warmup_thread = None
+        self.warmup_status = {"state": "idle", "duration_ms": None, "error": None}
+
+    # ==========================
+    # 快取 (Cache)
+    # ==========================
+
+    def _cached(self, key, loader, ttl=REF_CACHE_TTL):
+        """process 內的參考資料快取；DataFrame 以副本回傳避免被 view 修改"""
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+        if hit is None or now - hit[0] > ttl:
+            hit = (now, loader())
+            with self._cache_lock:
+                self._cache[key] = hit
+        value = hit[1]
+        return value.copy() if hasattr(value, "copy") else value
+
+    def _cached_columns(self, key, columns, loader):
+        """
+        依欄位組合分開快取的參考資料
+
+        已有未過期的完整欄位快取（例如暖機載入的）時直接從中取欄位，不再查詢；
+        否則只向資料庫要這些欄位，快取在 "key:欄位" 下
+        """
+        if not columns:
+            return self._cached(key, lambda: loader(None))
+        with self._cache_lock:
+            full = self._cache.get(key)
+        if full is not None and time.monotonic() - full[0] <= REF_CACHE_TTL:
+            return _project(full[1], columns).copy()
+        return self._cached(f"{key}:{','.join(columns)}", lambda: loader(columns))
+
+    def _invalidate(self, *keys):
+        """清除快取（連同各欄位組合的快取）"""
+        with self._cache_lock:
+            for key in keys:
+                for cached in [k for k in self._cache if k == key or k.startswith(key + ":")]:
+                    del self._cache[cached]
+
+    def _check_columns(self, table, columns):
+        """
+        驗證 columns 都是 table 的欄位（欄位清單由 _load_schema 取得並快取）
+
+        returns:
+            columns 的 list；columns 為 None 時回傳 None（表示全部欄位）
+        """
+        if not columns:
+            return None
+        # 欄位清單每個 process 只載入一次，不計入 view 的查詢預算
+        with untracked():
+            schema = self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+        unknown = [c for c in columns if c not in schema.get(table, ())]
+        if unknown:
+            raise ValueError(f"{table} 沒有欄位: {', '.join(unknown)}")
+        return list(columns)
+
+    @abc.abstractmethod
+    def _load_schema(self) -> dict:
+        """{資料表: 欄位名稱 set}"""
+        raise NotImplementedError
+
+    # ==========================
+    # 暖機 (Warm-up)
+    # ==========================
+
+    def start_warm_up(self, preload_modules=()):
+        """
+        在背景執行緒暖機，不阻塞第一次 rerun
+
+        params:
+            preload_modules: 順便在背景 import 的模組（例如其他 view）
+        """
+        if self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(
+            target=self._warm_up, args=(tuple(preload_modules),), name="db-warmup", daemon=True
+        )
+        self._warmup_thread.start()
+
+    def _warm_up(self, preload_modules):
+        """建立連線、預載欄位清單 / 參考資料 / 今年摘要"""
+        self.warmup_status = {"state": "running", "duration_ms": None, "error": None}
+        t0 = time.perf_counter()
+        try:
+            self._warm_up_connections()
+
+            self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+            self.get_rooms()
+            self.get_tenants()
+            self.get_all_periods()
+            self.get_payment_summary(date.today().year)
+            self.get_rent_summary(date.today().year)
+
+            for name in preload_modules:
+                importlib.import_module(name)
+
+            state, error = "done", None
+        except Exception as e:
+            logger.error(f"Warm-up error: {e}")
+            state, error = "failed", str(e)
+
+        self.warmup_status = {
+            "state": state,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "error": error,
+        }
+
+    def _warm_up_connections(self):
+        """backend 專屬的暖機（例如開滿連線池）"""
+
+    # ==========================
+    # 房間 (Rooms)
+    # ==========================
+
+    def get_rooms(self) -> RoomRegistry:
+        """
+        所有房間（RoomRegistry，含依棟 / 樓層 / 分攤群組的索引）
+
+        每個 process 載入一次，save_rooms 後清除；與欄位清單相同不計入 view 的查詢預算。
+        資料庫還沒有 rooms 資料表、或這個 property 還沒有房間（新的 property）時使用 schema.DEFAULT_ROOMS
+        """
+        with untracked():
+            return self._cached("rooms", self._load_room_registry, ttl=SCHEMA_CACHE_TTL)
+
+    def _load_room_registry(self) -> RoomRegistry:
+        schema = self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+        if "rooms" not in schema:
+            return default_registry()
+        # save_rooms 至少要一間房，沒有列表示這個 property 還沒設定過房間
+        rows = self._load_rooms()
+        return RoomRegistry(rows) if rows else default_registry()
+
+    @abc.abstractmethod
+    def _load_rooms(self) -> list:
+        """rooms 資料表中啟用的列（list of dict）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_rooms(self, rows):
+        """
+        以 rows 取代房間清單（依房號新增或更新，不在 rows 的房間停用）
+
+        params:
+            rows: [{"room_number", "building", "floor", "sharing_group"}, ...]；同一樓層內依 rows 的順序顯示
+        """
+        raise NotImplementedError
+
+    # ==========================
+    # 房客管理 (Tenants)
+    # ==========================
+
+    @abc.abstractmethod
+    def room_exists(self, room: str) -> bool:
+        """檢查房號是否已有房客"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tenants(self, columns=None):
+        """取得所有房客列表（columns: 只取這些欄位）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_tenant_by_id(self, tid: int, columns=None):
+        """根據 ID 取得單一房客（dict，日期為字串）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_tenant(self, room_number, tenant_name, phone, deposit, base_rent, lease_start, lease_end, payment_method="月繳"):
+        """新增房客並產生繳費排程"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def update_tenant(self, room_number, tenant_name=None, phone=None, deposit=None,
+                      base_rent=None, lease_start=None, lease_end=None, payment_method=None):
+        """編輯房客資訊（None 的欄位不變）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_tenant(self, tenant_id: int):
+        """刪除房客（軟刪除）"""
+        raise NotImplementedError
+
+    # ==========================
+    # 繳費排程 (Payment Schedule)
+    # ==========================
+
+    @abc.abstractmethod
+    def get_payment_schedule(self, room=None, status=None, year=None, after=None, limit=None, columns=None):
+        """取得繳費排程（keyset 分頁，依 年 DESC, 月 DESC, 房號 排序）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def estimate_payment_schedule_count(self, room=None, status=None, year=None) -> int:
+        """繳費排程筆數（估計值即可）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def mark_payment_done(self, payment_id: int, paid_date: str, paid_amount: float, notes: str = ""):
+        """標記繳費完成"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def mark_payments_done_bulk(self, rows):
+        """批次標記繳費完成，rows: [(payment_id, paid_date, paid_amount, notes), ...]"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_payment_summary(self, year: int) -> dict:
+        """取得繳費摘要：total_due / total_paid / unpaid_count / collection_rate"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_overdue_payments(self):
+        """取得逾期未繳"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_upcoming_payments(self, days_ahead: int = 7):
+        """取得近期應繳"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_arrears(self, as_of=None) -> dict:
+        """
+        逾期帳齡（單一查詢，見 arrears_query / split_arrears）
+
+        params:
+            as_of: 以這天計算逾期天數（None 為今天）
+        """
+        raise NotImplementedError
+
+    # ==========================
+    # 租金紀錄 (Rent Records)
+    # ==========================
+
+    @abc.abstractmethod
+    def batch_record_rent(self, room, tenant_name, start_year, start_month, months_count,
+                          base_rent, water_fee, discount, payment_method="月繳", notes=""):
+        """批量預填租金"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_pending_rents(self):
+        """取得待確認租金"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def confirm_rent_payment(self, rent_id, paid_date, paid_amount=None):
+        """確認租金已繳"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def confirm_rent_payments(self, rent_ids, paid_date):
+        """批次確認租金已繳（實收金額 = 應收金額）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_rent_summary(self, year: int) -> dict:
+        """取得租金摘要：total_due / total_paid / total_unpaid / collection_rate"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_rent_records(self, year=None, after=None, limit=None, columns=None):
+        """取得租金記錄（keyset 分頁，依 年 DESC, 月 DESC, 房號 排序）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def estimate_rent_records_count(self, year=None) -> int:
+        """租金記錄筆數（估計值即可）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_rent_matrix(self, year: int):
+        """取得租金矩陣（房號 x 月份）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_unpaid_rents(self):
+        """取得未繳租金"""
+        raise NotImplementedError
+
+    # ==========================
+    # 電費管理 (Electricity)
+    # ==========================
+
+    @abc.abstractmethod
+    def add_electricity_period(self, year, ms, me):
+        """新增計費期間，回傳 (ok, msg, period_id)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_all_periods(self, columns=None):
+        """取得所有計費期間（list of dict，新到舊）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_electricity_period(self, period_id: int):
+        """刪除計費期間及相關所有紀錄"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_tdy_bill(self, pid, floor, kwh, fee):
+        """新增台電單據"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_meter_reading(self, pid, room, start, end):
+        """新增電表讀數"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_period_report(self, pid):
+        """取得計費報告"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save_electricity_record(self, period_id, results):
+        """儲存計費記錄（全部房間的應繳金額）"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_electricity_payment_record(self, period_id):
+        """取得某個計費期間的繳費紀錄"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def update_electricity_payment(self, period_id, room_number, status, paid_amount=None, payment_date=None, notes=""):
+        """更新繳費狀態"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_electricity_payment_summary(self, period_id) -> dict:
+        """取得某個計費期間的繳費統計"""
+        raise NotImplementedError
+
+    # ==========================
+    # 支出 (Expenses)
+    # ==========================
+
+    @abc.abstractmethod
+    def add_expense(self, date, cat, amt, desc) -> bool:
+        """新增支出"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_expenses(self, limit=50, columns=None):
+        """取得支出列表"""
+        raise NotImplementedError
+
+    # ==========================
+    # 報表 (Reports)
+    # ==========================
+
+    @abc.abstractmethod
+    def get_monthly_rollup(self, year_from: int, year_to: int = None):
+        """
+        取得每月彙總（monthly_rollup，year_from ~ year_to，year_to 省略時只取 year_from）
+
+        每列為 (year, month, room_number, category) 的應收 / 實收 / 未收、電費與支出；
+        支出列的 room_number 為 ''、category 為支出分類，其餘列的 category 為 ''
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_pnl(self, year_from: int, year_to: int = None, granularity: str = "month"):
+        """
+        損益表（見 pnl_query）：year / month / rent_income / electricity_income / expenses /
+        net_income / cumulative_net（區間內累計）/ net_yoy（與前一年同期的淨利差，無資料為 NaN）；
+        granularity="year" 時沒有 month 欄位
+        """
+        raise NotImplementedError
+
+    # ==========================
+    # 匯出 / 匯入 (Export / Import)
+    # ==========================
+
+    @abc.abstractmethod
+    def copy_to_csv(self, query, fileobj, params=None):
+        """將查詢結果（CSV 含標題列，UTF-8 bytes）串流寫入 fileobj"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def bulk_import(self, files, period_id=None):
+        """批次匯入已驗證的 CSV（無標題列），回傳 (ok, msg, counts)"""
+        raise NotImplementedError
+
+    # ==========================
+    # 備忘錄 (Memos)
+    # ==========================
+
+    @abc.abstractmethod
+    def get_memos(self, completed=False, columns=None):
+        """取得備忘錄"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_memo(self, text, prio="normal") -> bool:
+        """新增備忘錄"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete_memo(self, mid) -> bool:
+        """完成備忘錄"""
+        raise NotImplementedError
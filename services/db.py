@@ -1,95 +1,585 @@
+from __future__ import annotations
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException, StopException, get_script_run_ctx
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import pandas as pd
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime, date, timedelta
+import collections
+import concurrent.futures
+import functools
 import logging
 import contextlib
+import threading
+import time
+
+from services.backend import (
+    RentalBackend, pd, pnl_query, arrears_query, split_arrears, property_filter, SCHEMA_CACHE_TTL, WATER_FEE, CATEGORY_COLUMNS, IMPORT_STAGING, IMPORT_COLUMNS, generate_payment_schedule, clean_paid_rows,
+)
+from services.rooms import clean_rooms
+from services.query_stats import record_connection, record_degraded, record_statement, untracked
+from services.schema import PROPERTY_SETTING, ROLLUP_SOURCES, rollup_view
 
 logger = logging.getLogger(__name__)
 
-# 常數定義
-WATER_FEE = 100
-PAYMENT_METHODS = ["月繳", "半年繳", "年繳"]
-
-# 輔助函數：生成繳費排程
-def generate_payment_schedule(payment_method: str, start_date, end_date):
-    """生成繳費排程"""
-    try:
-        from dateutil.relativedelta import relativedelta
-        use_relativedelta = True
-    except ImportError:
-        use_relativedelta = False
-    
-    if isinstance(start_date, str):
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-    else:
-        start = datetime.combine(start_date, datetime.min.time())
-    
-    if isinstance(end_date, str):
-        end = datetime.strptime(end_date, "%Y-%m-%d")
-    else:
-        end = datetime.combine(end_date, datetime.min.time())
-    
-    schedule = []
-    current = start
-    
-    while current <= end:
-        year = current.year
-        month = current.month
-        
-        if payment_method == "月繳":
-            schedule.append((year, month))
-            if use_relativedelta:
-                current = current + relativedelta(months=1)
-            else:
-                if month == 12:
-                    current = datetime(year + 1, 1, 1)
-                else:
-                    current = datetime(year, month + 1, 1)
+
+# 連線池大小（可在 secrets 的 [pool] 區段覆寫 minconn / maxconn）
+POOL_MINCONN = 2
+POOL_MAXCONN = 10
+# 連線池實作：[pool] backend = "psycopg2"（ThreadedConnectionPool）或 "sqlalchemy"（QueuePool）
+POOL_BACKENDS = ("psycopg2", "sqlalchemy")
+# QueuePool 等不到連線時的秒數，超過就退回單次連線
+POOL_TIMEOUT = 5
+
+# secrets 的連線設定區段：[supabase] 為 primary；有 [supabase_replica] 時唯讀查詢改走副本
+PRIMARY = "supabase"
+REPLICA = "supabase_replica"
+# 寫入後這段秒數內，同一個 session 的讀取仍走 primary（涵蓋寫入後 st.rerun 的下一次 rerun）
+REPLICA_STICKY_SECONDS = 10
+# 副本落後超過這個秒數時改讀 primary
+REPLICA_MAX_LAG = 5
+# 副本延遲的檢查間隔（秒）
+REPLICA_LAG_CHECK_INTERVAL = 5
+
+# 語句逾時（毫秒）：未以 _query_limits 指定的方法都用這個
+STATEMENT_TIMEOUT_MS = 5000
+# 檢查 rerun 是否已被中斷的間隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+# 代替 script 執行緒執行語句的執行緒數（見 _QueryWatchdog）
+QUERY_WORKERS = 32
+# 保留多少組「方法 + 參數」的上次成功結果，供逾時時降級使用
+STALE_RESULTS_MAX = 256
+
+# 目前執行緒正在執行的方法所指定的語句逾時
+_limits = threading.local()
+
+
+def _session_key():
+    """目前的 Streamlit session（不在 script 執行緒時以執行緒區分）"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else threading.get_ident()
+
+
+class _QueryWatchdog:
+    """
+    Streamlit 中斷 rerun（使用者切換頁面或操作其他元件）時，取消那次 rerun 正在執行的查詢
+
+    Streamlit 只在呼叫 st.* 時檢查中斷（ScriptRunContext.yield_check），查詢進行中 script 執行緒卡在網路等待，
+    要等查詢結束才會停；這裡把 rerun 中的語句交給背景執行緒執行，script 執行緒每 interval 秒呼叫一次
+    yield_check，被中斷（StopException / RerunException）時 conn.cancel()，等語句結束後再把例外往上拋
+    """
+
+    def __init__(self, interval=CANCEL_POLL_INTERVAL, workers=QUERY_WORKERS):
+        self.interval = interval
+        self.workers = workers
+        self._active = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @contextlib.contextmanager
+    def watch(self, conn):
+        """區塊內在 script 執行緒對 conn 執行的語句，rerun 被中斷時取消"""
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            yield
+            return
+        # 每次登記一個新的 tuple：取消前以 identity 確認還是同一次登記（見 run）
+        entry = (conn, ctx)
+        with self._lock:
+            self._active[id(conn)] = entry
+        try:
+            yield
+        finally:
+            # 在 _get_connection commit / 歸還連線之前解除登記
+            with self._lock:
+                if self._active.get(id(conn)) is entry:
+                    del self._active[id(conn)]
+
+    def run(self, conn, statement):
+        """
+        執行 statement()（對 conn 送出一個語句）
+
+        conn 不在 watch 中、或不是在登記它的 script 執行緒呼叫時直接執行
+        """
+        with self._lock:
+            entry = self._active.get(id(conn))
+        if entry is None or get_script_run_ctx(suppress_warning=True) is not entry[1]:
+            return statement()
+        future = self._pool().submit(statement)
+        while True:
+            try:
+                return future.result(timeout=self.interval)
+            except concurrent.futures.TimeoutError:
+                pass
+            try:
+                entry[1].yield_check()
+            except (RerunException, StopException):
+                # 檢查與取消都在鎖內：已解除登記（連線已歸還）時不會誤取消
+                with self._lock:
+                    if self._active.get(id(conn)) is entry and not conn.closed:
+                        conn.cancel()
+                # 等語句結束（QueryCanceledError）才讓 _get_connection rollback 並歸還連線
+                concurrent.futures.wait([future])
+                raise
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="db-query")
+            return self._executor
+
+
+_watchdog = _QueryWatchdog()
+
+
+def _query_limits(timeout_ms=None, fallback=False):
+    """
+    方法層級的查詢限制
+
+    params:
+        timeout_ms: 方法內所有語句的 statement_timeout（None 為 STATEMENT_TIMEOUT_MS）
+        fallback: 逾時時改回傳同樣參數上次成功的結果，並記錄降級（main 在頁面上方顯示提示）
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, repr(args), repr(sorted(kwargs.items())))
+            previous = getattr(_limits, "timeout_ms", None)
+            if timeout_ms is not None:
+                _limits.timeout_ms = timeout_ms
+            try:
+                value = method(self, *args, **kwargs)
+            except psycopg2.extensions.QueryCanceledError:
+                with self._stale_lock:
+                    hit = self._stale_results.get(key)
+                if not fallback or hit is None:
+                    raise
+                logger.warning(f"{method.__name__} timed out, serving result from {time.monotonic() - hit[0]:.0f}s ago")
+                record_degraded(method.__name__, time.monotonic() - hit[0])
+                return hit[1].copy() if hasattr(hit[1], "copy") else hit[1]
+            finally:
+                _limits.timeout_ms = previous
+
+            if fallback:
+                with self._stale_lock:
+                    self._stale_results[key] = (time.monotonic(), value.copy() if hasattr(value, "copy") else value)
+                    self._stale_results.move_to_end(key)
+                    while len(self._stale_results) > STALE_RESULTS_MAX:
+                        self._stale_results.popitem(last=False)
+            return value
+        return wrapper
+    return decorate
+
+
+def _select_list(columns, required=()):
+    """SELECT 欄位：columns 為 None 時取全部，否則只取指定欄位（並補上分頁鍵）"""
+    if not columns:
+        return sql.SQL("*")
+    cols = list(columns) + [c for c in required if c not in columns]
+    return sql.SQL(", ").join(sql.Identifier(c) for c in cols)
+
+
+def _keyset_after(year_col: str, month_col: str, after):
+    """
+    (年 DESC, 月 DESC, 房號 ASC) 排序下，取 after 這一列之後的條件
+    
+    params:
+        after: 上一頁最後一列的 (year, month, room)
+    """
+    year, month, room = after
+    clause = (f" AND ({year_col} < %s OR ({year_col} = %s AND ({month_col} < %s"
+              f" OR ({month_col} = %s AND room_number > %s))))")
+    return clause, [year, year, month, month, room]
+
+
+# 查詢結果的欄位型別（pg_type OID）
+_DATE_OIDS = {1082, 1114, 1184}           # date / timestamp / timestamptz
+_FLOAT_OIDS = {700, 701, 1700}            # real / double / numeric
+_INT_OIDS = {20, 21, 23}                  # bigint / smallint / integer
+
+# numeric 直接轉成 float，不先建立 Decimal 物件
+_NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, "NUMERIC_AS_FLOAT",
+    lambda value, cur: float(value) if value is not None else None,
+)
+
+
+def _read_frame(conn, query, params=None):
+    """
+    執行查詢並依欄位型別建立 DataFrame（取代 pd.read_sql）
+    
+    日期 → datetime64、金額 → float64、含 NULL 的整數 → Int64、
+    CATEGORY_COLUMNS → category，view 可直接做向量化的日期與金額運算
+    """
+    with conn.cursor() as cur:
+        psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT, cur)
+        cur.execute(query, params)
+        names = [d.name for d in cur.description]
+        df = pd.DataFrame.from_records(cur.fetchall(), columns=names)
+        oids = [d.type_code for d in cur.description]
+    
+    for name, oid in zip(names, oids):
+        if oid in _DATE_OIDS:
+            df[name] = pd.to_datetime(df[name])
+        elif oid in _FLOAT_OIDS:
+            df[name] = df[name].astype("float64")
+        elif oid in _INT_OIDS and df[name].isna().any():
+            df[name] = df[name].astype("Int64")
+        elif name in CATEGORY_COLUMNS:
+            df[name] = df[name].astype("category")
+    return df
+
+
+@functools.lru_cache(maxsize=None)
+def _counting_cursor(base):
+    """替任意 cursor 類別加上 SQL 計數（RealDictCursor 等也適用）"""
+    class CountingCursor(base):
+        def execute(self, query, vars=None):
+            record_statement(query.as_string(self) if isinstance(query, sql.Composable) else query)
+            return _watchdog.run(self.connection, functools.partial(super().execute, query, vars))
+
+        def executemany(self, query, vars_list):
+            record_statement(query)
+            return _watchdog.run(self.connection, functools.partial(super().executemany, query, vars_list))
+
+        def copy_expert(self, sql, file, size=8192):
+            record_statement(sql)
+            return _watchdog.run(self.connection, functools.partial(super().copy_expert, sql, file, size))
+
+    return CountingCursor
+
+
+class _CountingConnection(psycopg2.extensions.connection):
+    """所有 cursor 都會把執行的語句計入 query_stats"""
+    
+    # 這條連線目前的 statement_timeout（毫秒）與 rental.property_id，由 _get_connection 設定
+    statement_timeout = None
+    property_id = None
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _counting_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+class _EnginePool:
+    """
+    以 SQLAlchemy engine 的 QueuePool 管理連線，介面與 ThreadedConnectionPool 相同
+    
+    getconn 回傳底層的 psycopg2 連線，所以 execute_values、copy_expert、
+    psycopg2.sql 等既有程式不用修改；pool_pre_ping 在取出連線時先確認連線仍存活
+    （Supabase 閒置斷線後不會拿到壞掉的連線）
+    """
+    
+    def __init__(self, minconn, maxconn, connect):
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import QueuePool
         
-        elif payment_method == "半年繳":
-            if month in [1, 7]:
-                schedule.append((year, month))
-            if use_relativedelta:
-                current = current + relativedelta(months=6)
-            else:
-                current = current + timedelta(days=180)
+        self.minconn = minconn
+        self.engine = create_engine(
+            "postgresql+psycopg2://",
+            creator=connect,
+            poolclass=QueuePool,
+            pool_size=minconn,
+            max_overflow=max(maxconn - minconn, 0),
+            pool_timeout=POOL_TIMEOUT,
+            pool_pre_ping=True,
+        )
+        self._checked_out = {}
+        self._lock = threading.Lock()
+    
+    def getconn(self):
+        from sqlalchemy.exc import TimeoutError as QueueTimeout
         
-        elif payment_method == "年繳":
-            if month == 1:
-                schedule.append((year, month))
-            if use_relativedelta:
-                current = current + relativedelta(years=1)
-            else:
-                current = datetime(year + 1, 1, 1)
+        try:
+            with untracked():
+                proxy = self.engine.raw_connection()
+        except QueueTimeout as e:
+            raise psycopg2.pool.PoolError(str(e))
+        conn = proxy.driver_connection
+        with self._lock:
+            self._checked_out[id(conn)] = proxy
+        return conn
     
-    return schedule
+    def putconn(self, conn, close=False):
+        with self._lock:
+            proxy = self._checked_out.pop(id(conn))
+        if close:
+            proxy.invalidate()
+        proxy.close()
 
 
-class SupabaseDB:
+class SupabaseDB(RentalBackend):
     """
-    Supabase (PostgreSQL) 版的 RentalDB
-    完全相容原 SQLite 版本的介面
+    Supabase (PostgreSQL) 版的 RentalBackend
     """
     
-    def __init__(self):
-        self._init_connection()
+    def __init__(self, backend=None, property_id=None):
+        """
+        params:
+            backend: 連線池實作（POOL_BACKENDS），預設讀取 secrets 的 [pool] backend
+            property_id: 只讀寫這個 property 的資料（None 為不篩選，需先執行 python -m services.schema 的輸出）
+        """
+        super().__init__()
+        self._backend = backend
+        self.property_id = property_id
+        self._pools = {}
+        self._pool_lock = threading.Lock()
+        # session -> 這個時間點（monotonic）之前的讀取都走 primary
+        self._sticky = {}
+        self._replica_lag = (float("-inf"), 0.0)
+        # (方法, 參數) -> (時間, 結果)，見 _query_limits
+        self._stale_results = collections.OrderedDict()
+        self._stale_lock = threading.Lock()
+    
+    def _init_connection(self, section=PRIMARY):
+        """
+        建立連線池（第一次取連線或暖機時呼叫）
+        
+        params:
+            section: secrets 中的連線設定區段（PRIMARY 或 REPLICA）
+        """
+        with self._pool_lock:
+            if section not in self._pools:
+                pool_conf = dict(st.secrets.get("pool", {}))
+                minconn = pool_conf.get("minconn", POOL_MINCONN)
+                maxconn = pool_conf.get("maxconn", POOL_MAXCONN)
+                backend = self._backend or pool_conf.get("backend", "psycopg2")
+                if backend not in POOL_BACKENDS:
+                    raise ValueError(f"未知的連線池實作: {backend}")
+                
+                if backend == "sqlalchemy":
+                    self._pools[section] = _EnginePool(minconn, maxconn, functools.partial(self._connect, section))
+                else:
+                    self._pools[section] = psycopg2.pool.ThreadedConnectionPool(
+                        minconn, maxconn,
+                        connection_factory=_CountingConnection,
+                        **st.secrets[section]
+                    )
+        return self._pools[section]
     
-    @st.cache_resource
-    def _init_connection(_self):
-        pass
+    def _connect(self, section=PRIMARY):
+        """開一條新的（會計數 SQL 的）連線"""
+        return psycopg2.connect(connection_factory=_CountingConnection, **st.secrets[section])
     
     @contextlib.contextmanager
-    def _get_connection(self):
+    def _get_connection(self, invalidates=(), readonly=False):
+        """
+        從連線池取得連線，區塊結束時 commit 並歸還
+        
+        params:
+            invalidates: commit 成功後要清除的快取 key
+            readonly: 唯讀查詢，可由副本提供（見 _use_replica）；其餘一律走 primary
+        """
+        if readonly and self._use_replica():
+            section = REPLICA
+        else:
+            section = PRIMARY
+            if not readonly:
+                self._stick()
+        pool = self._pools.get(section) or self._init_connection(section)
         try:
-            conn = psycopg2.connect(**st.secrets["supabase"])
-            yield conn
+            conn = pool.getconn()
+            pooled = True
+        except psycopg2.pool.PoolError:
+            # 連線池用完時退回單次連線，避免尖峰時直接失敗
+            conn = self._connect(section)
+            pooled = False
+        record_connection()
+        committed = False
+        try:
+            self._set_statement_timeout(conn)
+            self._set_property(conn)
+            with _watchdog.watch(conn):
+                yield conn
             conn.commit()
-            conn.close()
+            committed = True
+            if invalidates:
+                self._invalidate(*invalidates)
+        except psycopg2.extensions.QueryCanceledError:
+            # 逾時交給 _query_limits 降級（被 watchdog 取消時拋出的是 Streamlit 的 RerunException / StopException）
+            raise
         except Exception as e:
             logger.error(f"DB Connection Error: {e}")
             raise
+        finally:
+            # 例外（含 Streamlit 的 rerun/stop）時先 rollback，避免把進行中的交易還回連線池
+            if not committed and not conn.closed:
+                conn.rollback()
+            if pooled:
+                pool.putconn(conn, close=bool(conn.closed))
+            else:
+                conn.close()
+    
+    def _set_statement_timeout(self, conn):
+        """套用目前方法的語句逾時（與連線上次的設定不同時才送出 SET）"""
+        timeout = getattr(_limits, "timeout_ms", None) or STATEMENT_TIMEOUT_MS
+        if conn.statement_timeout == timeout:
+            return
+        with untracked():
+            with conn.cursor() as cur:
+                cur.execute("SET statement_timeout = %s", (timeout,))
+        conn.commit()
+        conn.statement_timeout = timeout
+    
+    def _set_property(self, conn):
+        """
+        設定連線的 rental.property_id（新增的列預設屬於這個 property，見 schema.PROPERTY_DEFAULT）
+
+        與連線上次的設定相同、或未限定 property 時不送出
+        """
+        if self.property_id is None or conn.property_id == self.property_id:
+            return
+        with untracked():
+            with conn.cursor() as cur:
+                cur.execute("SELECT set_config(%s, %s, false)", (PROPERTY_SETTING, str(self.property_id)))
+        conn.commit()
+        conn.property_id = self.property_id
+    
+    def _scope(self, alias=None, prefix=" AND ") -> str:
+        """限定這個 property 的 SQL 條件（未限定 property 時為空字串，見 backend.property_filter）"""
+        return property_filter(self.property_id, alias, prefix)
+    
+    # ==========================
+    # 讀寫分離 (Read Replica)
+    # ==========================
+    
+    def _use_replica(self) -> bool:
+        """
+        唯讀查詢是否改走副本
+        
+        需設定 secrets 的 [supabase_replica]；這個 session 剛寫入過（REPLICA_STICKY_SECONDS 內）
+        或副本延遲超過 REPLICA_MAX_LAG 秒時仍走 primary，確保讀得到自己剛寫入的資料
+        """
+        if REPLICA not in st.secrets:
+            return False
+        if self._sticky.get(_session_key(), 0) > time.monotonic():
+            return False
+        return self._check_replica_lag() <= REPLICA_MAX_LAG
+    
+    def _stick(self):
+        """寫入時呼叫：這個 session 接下來的讀取都走 primary"""
+        if REPLICA not in st.secrets:
+            return
+        now = time.monotonic()
+        with self._pool_lock:
+            for key in [k for k, until in self._sticky.items() if until <= now]:
+                del self._sticky[key]
+            self._sticky[_session_key()] = now + REPLICA_STICKY_SECONDS
+    
+    def _check_replica_lag(self) -> float:
+        """副本落後的秒數（每 REPLICA_LAG_CHECK_INTERVAL 秒查一次；連不上時視為無限大）"""
+        checked_at, lag = self._replica_lag
+        now = time.monotonic()
+        if now - checked_at < REPLICA_LAG_CHECK_INTERVAL:
+            return lag
+        
+        pool = self._pools.get(REPLICA)
+        try:
+            with untracked():
+                pool = pool or self._init_connection(REPLICA)
+                conn = pool.getconn()
+                try:
+                    with conn.cursor() as cur:
+                        # 已重播到最新（或根本不是副本）時為 0
+                        cur.execute("""
+                            SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                                   END
+                        """)
+                        lag = float(cur.fetchone()[0] or 0)
+                    conn.rollback()
+                finally:
+                    pool.putconn(conn, close=bool(conn.closed))
+        except Exception as e:
+            logger.warning(f"Replica lag check error: {e}")
+            lag = float("inf")
+        
+        self._replica_lag = (now, lag)
+        if lag > REPLICA_MAX_LAG:
+            logger.warning(f"Replica lag {lag:.1f}s, reading from primary")
+        return lag
+    
+    def _load_schema(self):
+        with self._get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT table_name, column_name FROM information_schema.columns
+                    WHERE table_schema = current_schema()
+                """)
+                schema = {}
+                for table, column in cur.fetchall():
+                    schema.setdefault(table, set()).add(column)
+                return schema
+    
+    # ==========================
+    # 暖機 (Warm-up)
+    # ==========================
+    
+    def _warm_up_connections(self):
+        """開滿最小連線數（有副本時副本也是），在每條連線上先跑一次熱門查詢"""
+        for section in [PRIMARY] + ([REPLICA] if REPLICA in st.secrets else []):
+            pool = self._init_connection(section)
+            
+            # 讓 server 端的 catalog / plan 與 buffer 先熱起來
+            conns = [pool.getconn() for _ in range(pool.minconn)]
+            try:
+                year = date.today().year
+                for conn in conns:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1 FROM tenants WHERE is_active=1 LIMIT 1")
+                        cur.execute("SELECT SUM(amount) FROM payment_schedule WHERE payment_year=%s", (year,))
+                        cur.execute("SELECT SUM(actual_amount) FROM rent_records WHERE year=%s", (year,))
+                    conn.commit()
+            finally:
+                for conn in conns:
+                    pool.putconn(conn, close=bool(conn.closed))
+    
+    # ==========================
+    # 房間 (Rooms)
+    # ==========================
+    
+    def _load_rooms(self):
+        with self._get_connection(readonly=True) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"""
+                    SELECT room_number, building, floor, sharing_group, sort_order
+                    FROM rooms WHERE is_active=1{self._scope()}
+                """)
+                return cur.fetchall()
+    
+    def save_rooms(self, rows):
+        """以 rows 取代房間清單（依房號新增或更新，不在 rows 的房間停用）"""
+        try:
+            rows = clean_rooms(rows)
+        except ValueError as e:
+            return False, f"❌ {e}"
+        with untracked():
+            schema = self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+        if "rooms" not in schema:
+            return False, "❌ 資料庫尚未建立 rooms 資料表，請先執行 python -m services.schema 輸出的 SQL"
+        try:
+            with self._get_connection(invalidates=("rooms",)) as conn:
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        INSERT INTO rooms(room_number, building, floor, sharing_group, sort_order, is_active)
+                        VALUES %s
+                        ON CONFLICT (property_id, room_number) DO UPDATE SET
+                            building=EXCLUDED.building, floor=EXCLUDED.floor, sharing_group=EXCLUDED.sharing_group,
+                            sort_order=EXCLUDED.sort_order, is_active=1
+                    """, [(r["room_number"], r["building"], r["floor"], r["sharing_group"], r["sort_order"], 1)
+                          for r in rows])
+                    cur.execute(
+                        f"UPDATE rooms SET is_active=0 WHERE is_active=1 AND NOT (room_number = ANY(%s)){self._scope()}",
+                        ([r["room_number"] for r in rows],),
+                    )
+            return True, f"✅ 已儲存 {len(rows)} 間房"
+        except Exception as e:
+            logger.error(f"Save rooms error: {e}")
+            return False, f"❌ 儲存失敗: {str(e)}"
     
     # ==========================
     # 房客管理 (Tenants)
@@ -97,25 +587,36 @@ class SupabaseDB:
     
     def room_exists(self, room: str) -> bool:
         """檢查房號是否已存在"""
-        with self._get_connection() as conn:
+        with self._get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT 1 FROM tenants WHERE room_number=%s AND is_active=1", (room,))
+                cur.execute(f"SELECT 1 FROM tenants WHERE room_number=%s AND is_active=1{self._scope()}", (room,))
                 return cur.fetchone() is not None
     
-    def get_tenants(self) -> pd.DataFrame:
-        """取得所有房客列表"""
-        with self._get_connection() as conn:
-            df = pd.read_sql("SELECT * FROM tenants WHERE is_active=1 ORDER BY room_number", conn)
-            for col in ['lease_start', 'lease_end', 'created_at']:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%d')
-            return df
-    
-    def get_tenant_by_id(self, tid: int):
-        """根據 ID 取得單一房客"""
-        with self._get_connection() as conn:
+    @_query_limits(fallback=True)
+    def get_tenants(self, columns=None) -> pd.DataFrame:
+        """
+        取得所有房客列表
+        
+        params:
+            columns: 只取這些欄位（None 為全部）
+        """
+        return self._cached_columns("tenants", self._check_columns("tenants", columns), self._load_tenants)
+    
+    def _load_tenants(self, columns=None) -> pd.DataFrame:
+        q = sql.SQL("SELECT {} FROM tenants WHERE is_active=1" + self._scope() + " ORDER BY room_number").format(
+            _select_list(columns)
+        )
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, q)
+    
+    def get_tenant_by_id(self, tid: int, columns=None):
+        """根據 ID 取得單一房客（columns: 只取這些欄位）"""
+        q = sql.SQL("SELECT {} FROM tenants WHERE id=%s" + self._scope()).format(
+            _select_list(self._check_columns("tenants", columns))
+        )
+        with self._get_connection(readonly=True) as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM tenants WHERE id=%s", (tid,))
+                cur.execute(q, (tid,))
                 row = cur.fetchone()
                 if row:
                     result = dict(row)
@@ -134,7 +635,7 @@ class SupabaseDB:
             if not isinstance(lease_end, str):
                 lease_end = lease_end.strftime('%Y-%m-%d')
             
-            with self._get_connection() as conn:
+            with self._get_connection(invalidates=("tenants",)) as conn:
                 with conn.cursor() as cur:
                     # 檢查房號是否已存在
                     if self.room_exists(room_number):
@@ -171,10 +672,10 @@ class SupabaseDB:
                      base_rent=None, lease_start=None, lease_end=None, payment_method=None):
         """編輯房客資訊"""
         try:
-            with self._get_connection() as conn:
+            with self._get_connection(invalidates=("tenants",)) as conn:
                 with conn.cursor() as cur:
                     # 先取得現有資料
-                    cur.execute("SELECT id FROM tenants WHERE room_number=%s AND is_active=1", (room_number,))
+                    cur.execute(f"SELECT id FROM tenants WHERE room_number=%s AND is_active=1{self._scope()}", (room_number,))
                     result = cur.fetchone()
                     if not result:
                         return False, f"❌ 房號 {room_number} 不存在"
@@ -227,9 +728,9 @@ class SupabaseDB:
     def delete_tenant(self, tenant_id: int):
         """刪除房客（軟刪除）"""
         try:
-            with self._get_connection() as conn:
+            with self._get_connection(invalidates=("tenants",)) as conn:
                 with conn.cursor() as cur:
-                    cur.execute("UPDATE tenants SET is_active=0 WHERE id=%s", (tenant_id,))
+                    cur.execute(f"UPDATE tenants SET is_active=0 WHERE id=%s{self._scope()}", (tenant_id,))
                     return True, "✅ 已刪除"
         except Exception as e:
             return False, str(e)
@@ -242,21 +743,26 @@ class SupabaseDB:
             amount = base_rent + (WATER_FEE if has_water_fee else 0)
             schedule = generate_payment_schedule(payment_method, start_date, end_date)
             
+            rows = []
+            for year, month in schedule:
+                if month == 12:
+                    due_date = f"{year + 1}-01-05"
+                else:
+                    due_date = f"{year}-{month + 1:02d}-05"
+                rows.append((room, tenant_name, year, month, amount, payment_method, due_date))
+            
+            if not rows:
+                return
+            
             with conn.cursor() as cur:
-                for year, month in schedule:
-                    if month == 12:
-                        due_date = f"{year + 1}-01-05"
-                    else:
-                        due_date = f"{year}-{month + 1:02d}-05"
-                    
-                    cur.execute("""
-                        INSERT INTO payment_schedule(
-                            room_number, tenant_name, payment_year, payment_month,
-                            amount, payment_method, due_date, status, created_at, updated_at
-                        )
-                        VALUES(%s, %s, %s, %s, %s, %s, %s, '未繳', NOW(), NOW())
-                        ON CONFLICT (room_number, payment_year, payment_month) DO NOTHING
-                    """, (room, tenant_name, year, month, amount, payment_method, due_date))
+                execute_values(cur, """
+                    INSERT INTO payment_schedule(
+                        room_number, tenant_name, payment_year, payment_month,
+                        amount, payment_method, due_date, status, created_at, updated_at
+                    )
+                    VALUES %s
+                    ON CONFLICT (property_id, room_number, payment_year, payment_month) DO NOTHING
+                """, rows, template="(%s, %s, %s, %s, %s, %s, %s, '未繳', NOW(), NOW())")
         
         except Exception as e:
             logger.error(f"Schedule Gen Error: {e}")
@@ -265,83 +771,172 @@ class SupabaseDB:
     # 繳費排程 (Payment Schedule)
     # ==========================
     
-    def get_payment_schedule(self, room=None, status=None, year=None) -> pd.DataFrame:
-        """取得繳費排程"""
-        with self._get_connection() as conn:
-            q = "SELECT * FROM payment_schedule WHERE 1=1"
-            params = []
-            
-            if room and room != "全部":
-                q += " AND room_number=%s"
-                params.append(room)
-            if status and status != "全部":
-                q += " AND status=%s"
-                params.append(status)
-            if year:
-                q += " AND payment_year=%s"
-                params.append(year)
-            
-            q += " ORDER BY payment_year DESC, payment_month DESC, room_number"
-            df = pd.read_sql(q, conn, params=tuple(params))
-            return df
+    def _payment_schedule_filter(self, room=None, status=None, year=None):
+        q = " WHERE 1=1" + self._scope()
+        params = []
+        
+        if room and room != "全部":
+            q += " AND room_number=%s"
+            params.append(room)
+        if status and status != "全部":
+            q += " AND status=%s"
+            params.append(status)
+        if year:
+            q += " AND payment_year=%s"
+            params.append(year)
+        return q, params
+    
+    @_query_limits(timeout_ms=3000, fallback=True)
+    def get_payment_schedule(self, room=None, status=None, year=None,
+                             after=None, limit=None, columns=None) -> pd.DataFrame:
+        """
+        取得繳費排程
+        
+        params:
+            after: keyset 分頁，上一頁最後一列的 (payment_year, payment_month, room_number)
+            limit: 每頁筆數（None 為全部）
+            columns: 只取這些欄位（分頁鍵欄位會自動補上）
+        """
+        columns = self._check_columns("payment_schedule", columns)
+        where, params = self._payment_schedule_filter(room, status, year)
+        if after:
+            clause, keys = _keyset_after("payment_year", "payment_month", after)
+            where += clause
+            params += keys
+        
+        q = sql.SQL("SELECT {} FROM payment_schedule").format(
+            _select_list(columns, ("payment_year", "payment_month", "room_number"))
+        )
+        tail = where + " ORDER BY payment_year DESC, payment_month DESC, room_number"
+        if limit:
+            tail += " LIMIT %s"
+            params.append(limit)
+        
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, q.as_string(conn) + tail, tuple(params))
+    
+    @_query_limits(fallback=True)
+    def estimate_payment_schedule_count(self, room=None, status=None, year=None) -> int:
+        """繳費排程筆數估計（取自查詢計畫，不掃表）"""
+        where, params = self._payment_schedule_filter(room, status, year)
+        return self._estimate_count("SELECT 1 FROM payment_schedule" + where, params)
+    
+    def _estimate_count(self, q, params=()):
+        with self._get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("EXPLAIN (FORMAT JSON) " + q, tuple(params))
+                plan = cur.fetchone()[0]
+                return int(plan[0]["Plan"]["Plan Rows"])
     
     def mark_payment_done(self, payment_id: int, paid_date: str, paid_amount: float, notes: str = ""):
         """標記繳費完成"""
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
+                    cur.execute(f"""
                         UPDATE payment_schedule
                         SET status='已繳', paid_date=%s, paid_amount=%s, notes=%s, updated_at=NOW()
-                        WHERE id=%s
+                        WHERE id=%s{self._scope()}
                     """, (paid_date, paid_amount, notes, payment_id))
                     return True, "✅ 繳費已標記"
         except Exception as e:
             return False, str(e)
     
+    def mark_payments_done_bulk(self, rows):
+        """
+        批次標記繳費完成（單一 UPDATE ... FROM (VALUES ...)）
+        
+        params:
+            rows: [(payment_id, paid_date, paid_amount, notes), ...]
+        """
+        try:
+            rows = clean_paid_rows(rows)
+        except ValueError as e:
+            return False, f"❌ {e}"
+        if not rows:
+            return False, "❌ 未選擇任何繳費項目"
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    updated = execute_values(cur, f"""
+                        UPDATE payment_schedule AS p
+                        SET status='已繳', paid_date=v.paid_date, paid_amount=v.paid_amount,
+                            notes=v.notes, updated_at=NOW()
+                        FROM (VALUES %s) AS v(id, paid_date, paid_amount, notes)
+                        WHERE p.id = v.id{self._scope("p")}
+                        RETURNING p.id
+                    """, rows, template="(%s::int, %s::date, %s::numeric, %s::text)",
+                        page_size=len(rows), fetch=True)
+                    return True, f"✅ 已標記 {len(updated)} 筆繳費"
+        except Exception as e:
+            return False, str(e)
+    
+    @_query_limits(fallback=True)
     def get_payment_summary(self, year: int):
         """取得繳費摘要"""
-        with self._get_connection() as conn:
+        totals = self._rollup_totals("payment_schedule", year)
+        # 金額一律回傳 float（與 SQLiteDB 相同，不回傳 Decimal）
+        due, paid = float(totals["schedule_due"]), float(totals["schedule_paid"])
+        collection_rate = (paid / due * 100) if due > 0 else 0.0
+        return {
+            'total_due': due,
+            'total_paid': paid,
+            'unpaid_count': int(totals["schedule_unpaid_count"]),
+            'collection_rate': collection_rate
+        }
+    
+    def _rollup_totals(self, source: str, year: int) -> dict:
+        """
+        source 彙總到 monthly_rollup 的欄位在 year 的合計（單一查詢，最多讀 12 × 房間數列）
+        
+        資料庫尚未建立 monthly_rollup（未執行 python -m services.schema 的輸出）時，
+        以相同的運算式直接彙總 source
+        """
+        measures = ROLLUP_SOURCES[source]["measures"]
+        with untracked():
+            schema = self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+        if "monthly_rollup" in schema:
+            q = (f"SELECT {', '.join(f'COALESCE(SUM({col}), 0)' for col in measures)}"
+                 f" FROM monthly_rollup WHERE year=%s{self._scope()}")
+        else:
+            sums = ", ".join(f"COALESCE(SUM({expr.format(r=source)}), 0)" for expr in measures.values())
+            q = f"SELECT {sums} FROM {source} WHERE {ROLLUP_SOURCES[source]['key'][0].format(r=source)}=%s{self._scope()}"
+        with self._get_connection(readonly=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT SUM(amount) FROM payment_schedule WHERE payment_year=%s", (year,))
-                due = cur.fetchone()[0] or 0
-                
-                cur.execute("SELECT SUM(paid_amount) FROM payment_schedule WHERE payment_year=%s AND status='已繳'", (year,))
-                paid = cur.fetchone()[0] or 0
-                
-                cur.execute("SELECT COUNT(*) FROM payment_schedule WHERE payment_year=%s AND status='未繳'", (year,))
-                unpaid = cur.fetchone()[0] or 0
-                
-                collection_rate = (paid / due * 100) if due > 0 else 0
-                return {
-                    'total_due': due,
-                    'total_paid': paid,
-                    'unpaid_count': unpaid,
-                    'collection_rate': collection_rate
-                }
+                cur.execute(q, (year,))
+                return dict(zip(measures, cur.fetchone()))
     
+    @_query_limits(fallback=True)
     def get_overdue_payments(self) -> pd.DataFrame:
         """取得逾期未繳"""
         today = date.today().strftime("%Y-%m-%d")
-        with self._get_connection() as conn:
-            return pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
                 SELECT room_number, tenant_name, payment_month, amount, due_date
                 FROM payment_schedule
-                WHERE status='未繳' AND due_date < %s
+                WHERE status='未繳' AND due_date < %s{self._scope()}
                 ORDER BY due_date ASC
-            """, conn, params=(today,))
+            """, (today,))
     
+    @_query_limits(fallback=True)
     def get_upcoming_payments(self, days_ahead: int = 7) -> pd.DataFrame:
         """取得近期應繳"""
         today = date.today()
         future = today + timedelta(days=days_ahead)
-        with self._get_connection() as conn:
-            return pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
                 SELECT room_number, tenant_name, payment_month, amount, due_date
                 FROM payment_schedule
-                WHERE status='未繳' AND due_date >= %s AND due_date <= %s
+                WHERE status='未繳' AND due_date >= %s AND due_date <= %s{self._scope()}
                 ORDER BY due_date ASC
-            """, conn, params=(today, future))
+            """, (today, future))
+    
+    @_query_limits(fallback=True)
+    def get_arrears(self, as_of=None) -> dict:
+        """逾期帳齡：每位房客的 0-30 / 31-60 / 61-90 / 90+ 天未繳金額與合計（單一查詢）"""
+        with self._get_connection(readonly=True) as conn:
+            df = _read_frame(conn, arrears_query("postgres", self.property_id), (as_of or date.today(),))
+        return split_arrears(df)
     
     # ==========================
     # 租金紀錄 (Rent Records)
@@ -354,50 +949,51 @@ class SupabaseDB:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
                     actual_amount = base_rent + water_fee - discount
-                    current_date = date(start_year, start_month, 1)
+                    rows = []
+                    year, month = start_year, start_month
                     
                     for i in range(months_count):
-                        year = current_date.year
-                        month = current_date.month
-                        
-                        cur.execute("""
-                            INSERT INTO rent_records(
-                                room_number, tenant_name, year, month, base_amount,
-                                water_fee, discount_amount, actual_amount, paid_amount,
-                                payment_method, notes, status, recorded_by, updated_at
-                            )
-                            VALUES(%s, %s, %s, %s, %s, %s, %s, %s, 0, %s, %s, '待確認', 'batch', NOW())
-                            ON CONFLICT (room_number, year, month) DO UPDATE SET
-                            base_amount=EXCLUDED.base_amount, water_fee=EXCLUDED.water_fee,
-                            discount_amount=EXCLUDED.discount_amount, actual_amount=EXCLUDED.actual_amount,
-                            payment_method=EXCLUDED.payment_method, notes=EXCLUDED.notes, updated_at=NOW()
-                        """, (room, tenant_name, year, month, base_rent, water_fee, discount,
-                              actual_amount, payment_method, notes))
-                        
+                        rows.append((room, tenant_name, year, month, base_rent, water_fee, discount,
+                                     actual_amount, payment_method, notes))
                         if month == 12:
-                            current_date = date(year + 1, 1, 1)
+                            year, month = year + 1, 1
                         else:
-                            current_date = date(year, month + 1, 1)
+                            month += 1
+                    
+                    # 一次送出所有月份，避免每月一個 round trip
+                    execute_values(cur, """
+                        INSERT INTO rent_records(
+                            room_number, tenant_name, year, month, base_amount,
+                            water_fee, discount_amount, actual_amount, paid_amount,
+                            payment_method, notes, status, recorded_by, updated_at
+                        )
+                        VALUES %s
+                        ON CONFLICT (property_id, room_number, year, month) DO UPDATE SET
+                        base_amount=EXCLUDED.base_amount, water_fee=EXCLUDED.water_fee,
+                        discount_amount=EXCLUDED.discount_amount, actual_amount=EXCLUDED.actual_amount,
+                        payment_method=EXCLUDED.payment_method, notes=EXCLUDED.notes, updated_at=NOW()
+                    """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s, 0, %s, %s, '待確認', 'batch', NOW())")
                     
                     return True, f"✅ 已預填 {months_count} 個月租金"
         except Exception as e:
             return False, str(e)
     
+    @_query_limits(fallback=True)
     def get_pending_rents(self) -> pd.DataFrame:
         """取得待確認租金"""
-        with self._get_connection() as conn:
-            return pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
                 SELECT id, room_number, tenant_name, year, month, actual_amount, status
-                FROM rent_records WHERE status IN ('待確認', '未收')
+                FROM rent_records WHERE status IN ('待確認', '未收'){self._scope()}
                 ORDER BY year DESC, month DESC, room_number
-            """, conn)
+            """)
     
     def confirm_rent_payment(self, rent_id, paid_date, paid_amount=None):
         """確認租金已繳"""
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("SELECT actual_amount FROM rent_records WHERE id=%s", (rent_id,))
+                    cur.execute(f"SELECT actual_amount FROM rent_records WHERE id=%s{self._scope()}", (rent_id,))
                     row = cur.fetchone()
                     if not row:
                         return False, "❌ 找不到記錄"
@@ -405,68 +1001,112 @@ class SupabaseDB:
                     actual = row[0]
                     paid_amt = paid_amount if paid_amount is not None else actual
                     
-                    cur.execute("""
+                    cur.execute(f"""
                         UPDATE rent_records
                         SET status='已收', paid_date=%s, paid_amount=%s, updated_at=NOW()
-                        WHERE id=%s
+                        WHERE id=%s{self._scope()}
                     """, (paid_date, paid_amt, rent_id))
                     
                     return True, "✅ 租金已確認"
         except Exception as e:
             return False, str(e)
     
+    def confirm_rent_payments(self, rent_ids, paid_date):
+        """
+        批次確認租金已繳（實收金額 = 應收金額）
+        
+        params:
+            rent_ids: rent_records.id 列表
+            paid_date: 繳費日期 (YYYY-MM-DD)
+        """
+        ids = [int(i) for i in rent_ids]
+        if not ids:
+            return False, "❌ 未選擇任何租金單"
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"""
+                        UPDATE rent_records
+                        SET status='已收', paid_date=%s, paid_amount=actual_amount, updated_at=NOW()
+                        WHERE id = ANY(%s) AND status <> '已收'{self._scope()}
+                        RETURNING id
+                    """, (paid_date, ids))
+                    confirmed = len(cur.fetchall())
+                    return True, f"✅ 已確認 {confirmed} 筆租金"
+        except Exception as e:
+            return False, str(e)
+    
+    @_query_limits(fallback=True)
     def get_rent_summary(self, year: int):
         """取得租金摘要"""
-        with self._get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT SUM(actual_amount) FROM rent_records WHERE year=%s", (year,))
-                due = cur.fetchone()[0] or 0
-                
-                cur.execute("SELECT SUM(paid_amount) FROM rent_records WHERE year=%s AND status='已收'", (year,))
-                paid = cur.fetchone()[0] or 0
-                
-                cur.execute("SELECT SUM(actual_amount) FROM rent_records WHERE year=%s AND status IN ('未收', '待確認')", (year,))
-                unpaid = cur.fetchone()[0] or 0
-                
-                collection_rate = (paid / due * 100) if due > 0 else 0
-                return {
-                    'total_due': due,
-                    'total_paid': paid,
-                    'total_unpaid': unpaid,
-                    'collection_rate': collection_rate
-                }
+        totals = self._rollup_totals("rent_records", year)
+        due, paid = float(totals["rent_due"]), float(totals["rent_paid"])
+        collection_rate = (paid / due * 100) if due > 0 else 0.0
+        return {
+            'total_due': due,
+            'total_paid': paid,
+            'total_unpaid': float(totals["rent_unpaid"]),
+            'collection_rate': collection_rate
+        }
     
-    def get_rent_records(self, year=None) -> pd.DataFrame:
-        """取得租金記錄"""
-        with self._get_connection() as conn:
-            q = "SELECT * FROM rent_records"
-            params = []
-            
-            if year:
-                q += " WHERE year=%s"
-                params.append(year)
-            
-            q += " ORDER BY year DESC, month DESC, room_number"
-            return pd.read_sql(q, conn, params=tuple(params))
+    @_query_limits(timeout_ms=3000, fallback=True)
+    def get_rent_records(self, year=None, after=None, limit=None, columns=None) -> pd.DataFrame:
+        """
+        取得租金記錄
+        
+        params:
+            after: keyset 分頁，上一頁最後一列的 (year, month, room_number)
+            limit: 每頁筆數（None 為全部）
+            columns: 只取這些欄位（分頁鍵欄位會自動補上）
+        """
+        columns = self._check_columns("rent_records", columns)
+        where = " WHERE 1=1" + self._scope()
+        params = []
+        
+        if year:
+            where += " AND year=%s"
+            params.append(year)
+        if after:
+            clause, keys = _keyset_after("year", "month", after)
+            where += clause
+            params += keys
+        
+        q = sql.SQL("SELECT {} FROM rent_records").format(
+            _select_list(columns, ("year", "month", "room_number"))
+        )
+        tail = where + " ORDER BY year DESC, month DESC, room_number"
+        if limit:
+            tail += " LIMIT %s"
+            params.append(limit)
+        
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, q.as_string(conn) + tail, tuple(params))
+    
+    @_query_limits(fallback=True)
+    def estimate_rent_records_count(self, year=None) -> int:
+        """租金記錄筆數估計（取自查詢計畫，不掃表）"""
+        if year:
+            return self._estimate_count("SELECT 1 FROM rent_records WHERE year=%s" + self._scope(), [year])
+        return self._estimate_count("SELECT 1 FROM rent_records" + self._scope(prefix=" WHERE "))
     
     # ==========================
     # 租金矩陣 (Rent Matrix)
     # ==========================
     
+    @_query_limits(timeout_ms=3000, fallback=True)
     def get_rent_matrix(self, year: int) -> pd.DataFrame:
         """取得租金矩陣"""
-        with self._get_connection() as conn:
-            df = pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            df = _read_frame(conn, f"""
                 SELECT room_number, month, status, actual_amount
-                FROM rent_records WHERE year = %s
+                FROM rent_records WHERE year = %s{self._scope()}
                 ORDER BY room_number, month
-            """, conn, params=(year,))
+            """, (year,))
             
             if df.empty:
                 return pd.DataFrame()
             
-            ALL_ROOMS = ["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
-            matrix = {r: {m: "" for m in range(1, 13)} for r in ALL_ROOMS}
+            matrix = {r: {m: "" for m in range(1, 13)} for r in self.get_rooms()}
             
             for _, row in df.iterrows():
                 room = row['room_number']
@@ -480,14 +1120,15 @@ class SupabaseDB:
             res.columns = [f"{m}月" for m in range(1, 13)]
             return res
     
+    @_query_limits(fallback=True)
     def get_unpaid_rents(self) -> pd.DataFrame:
         """取得未繳租金"""
-        with self._get_connection() as conn:
-            return pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
                 SELECT room_number as "房號", tenant_name as "房客", year as "年", month as "月", actual_amount as "金額"
-                FROM rent_records WHERE status IN ('未收', '待確認')
+                FROM rent_records WHERE status IN ('未收', '待確認'){self._scope()}
                 ORDER BY year DESC, month DESC
-            """, conn)
+            """)
     
     # ==========================
     # 電費管理 (Electricity)
@@ -496,9 +1137,9 @@ class SupabaseDB:
     def add_electricity_period(self, year, ms, me):
         """新增計費期間"""
         try:
-            with self._get_connection() as conn:
+            with self._get_connection(invalidates=("periods",)) as conn:
                 with conn.cursor() as cur:
-                    cur.execute("SELECT 1 FROM electricity_period WHERE period_year=%s AND period_month_start=%s AND period_month_end=%s", (year, ms, me))
+                    cur.execute(f"SELECT 1 FROM electricity_period WHERE period_year=%s AND period_month_start=%s AND period_month_end=%s{self._scope()}", (year, ms, me))
                     if cur.fetchone():
                         return True, "✅ 期間已存在", 0
                     
@@ -508,11 +1149,18 @@ class SupabaseDB:
         except Exception as e:
             return False, str(e), 0
     
-    def get_all_periods(self):
-        """取得所有計費期間"""
-        with self._get_connection() as conn:
+    @_query_limits(fallback=True)
+    def get_all_periods(self, columns=None):
+        """取得所有計費期間（columns: 只取這些欄位）"""
+        return self._cached_columns("periods", self._check_columns("electricity_period", columns), self._load_periods)
+    
+    def _load_periods(self, columns=None):
+        q = sql.SQL("SELECT {} FROM electricity_period" + self._scope(prefix=" WHERE ") + " ORDER BY id DESC").format(
+            _select_list(columns)
+        )
+        with self._get_connection(readonly=True) as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM electricity_period ORDER BY id DESC")
+                cur.execute(q)
                 return cur.fetchall()
     
     def delete_electricity_period(self, period_id: int):
@@ -523,10 +1171,10 @@ class SupabaseDB:
             period_id: 計費期間 ID
         """
         try:
-            with self._get_connection() as conn:
+            with self._get_connection(invalidates=("periods",)) as conn:
                 with conn.cursor() as cur:
                     # 先檢查該期間是否存在
-                    cur.execute("SELECT id FROM electricity_period WHERE id=%s", (period_id,))
+                    cur.execute(f"SELECT id FROM electricity_period WHERE id=%s{self._scope()}", (period_id,))
                     if not cur.fetchone():
                         return False, f"❌ 期間 ID {period_id} 不存在"
                     
@@ -546,7 +1194,7 @@ class SupabaseDB:
                     cur.execute("DELETE FROM electricity_period WHERE id=%s", (period_id,))
                     
                     logger.info(f"Period {period_id} and all related records deleted")
-                    return True, f"✅ 計費期間已刪除"
+                    return True, "✅ 計費期間已刪除"
         
         except Exception as e:
             logger.error(f"Delete electricity period error: {e}")
@@ -559,7 +1207,7 @@ class SupabaseDB:
                 cur.execute("""
                     INSERT INTO electricity_tdy_bill(period_id, floor_name, tdy_total_kwh, tdy_total_fee)
                     VALUES(%s, %s, %s, %s)
-                    ON CONFLICT (period_id, floor_name) DO UPDATE SET
+                    ON CONFLICT (property_id, period_id, floor_name) DO UPDATE SET
                     tdy_total_kwh=EXCLUDED.tdy_total_kwh, tdy_total_fee=EXCLUDED.tdy_total_fee
                 """, (pid, floor, kwh, fee))
     
@@ -571,18 +1219,19 @@ class SupabaseDB:
                 cur.execute("""
                     INSERT INTO electricity_meter(period_id, room_number, meter_start_reading, meter_end_reading, meter_kwh_usage)
                     VALUES(%s, %s, %s, %s, %s)
-                    ON CONFLICT (period_id, room_number) DO UPDATE SET
+                    ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
                     meter_start_reading=EXCLUDED.meter_start_reading, meter_end_reading=EXCLUDED.meter_end_reading, meter_kwh_usage=EXCLUDED.meter_kwh_usage
                 """, (pid, room, start, end, usage))
     
+    @_query_limits(fallback=True)
     def get_period_report(self, pid):
         """取得計費報告"""
-        with self._get_connection() as conn:
-            return pd.read_sql("""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
                 SELECT room_number as "房號", private_kwh as "房間度數", public_kwh as "公用分攤",
                 total_kwh as "總度數", unit_price as "單價", calculated_fee as "應繳電費"
-                FROM electricity_calculation WHERE period_id = %s ORDER BY room_number
-            """, conn, params=(pid,))
+                FROM electricity_calculation WHERE period_id = %s{self._scope()} ORDER BY room_number
+            """, (pid,))
     
     def save_electricity_record(self, period_id, results):
         """
@@ -599,16 +1248,17 @@ class SupabaseDB:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    for result in results:
-                        room = result.get('房號')
-                        fee = int(result.get('應繳金額', 0))
-                        
-                        cur.execute("""
+                    rows = [
+                        (period_id, result.get('房號'), int(result.get('應繳金額', 0)))
+                        for result in results
+                    ]
+                    if rows:
+                        execute_values(cur, """
                             INSERT INTO electricity_payment(period_id, room_number, calculated_fee, status)
-                            VALUES(%s, %s, %s, '未繳')
-                            ON CONFLICT (period_id, room_number) DO UPDATE SET
+                            VALUES %s
+                            ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
                             calculated_fee=EXCLUDED.calculated_fee, updated_at=NOW()
-                        """, (period_id, room, fee))
+                        """, rows, template="(%s, %s, %s, '未繳')")
             
             return True, "✅ 計費記錄已儲存到資料庫"
         except Exception as e:
@@ -620,20 +1270,20 @@ class SupabaseDB:
         取得某個計費期間的繳費紀錄（用於「計費結果」Tab）
         """
         try:
-            with self._get_connection() as conn:
-                df = pd.read_sql("""
+            with self._get_connection(readonly=True) as conn:
+                df = _read_frame(conn, f"""
                     SELECT 
-                        room_number as '房號',
-                        calculated_fee as '應繳金額',
-                        paid_amount as '已繳金額',
-                        status as '繳費狀態',
-                        payment_date as '繳款日期',
-                        notes as '備註',
-                        updated_at as '更新時間'
+                        room_number as "房號",
+                        calculated_fee as "應繳金額",
+                        paid_amount as "已繳金額",
+                        status as "繳費狀態",
+                        payment_date as "繳款日期",
+                        notes as "備註",
+                        updated_at as "更新時間"
                     FROM electricity_payment 
-                    WHERE period_id = %s 
+                    WHERE period_id = %s{self._scope()}
                     ORDER BY room_number
-                """, conn, params=(period_id,))
+                """, (period_id,))
                 return df
         except Exception as e:
             logger.error(f"Get electricity payment record error: {e}")
@@ -654,10 +1304,10 @@ class SupabaseDB:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
+                    cur.execute(f"""
                         UPDATE electricity_payment 
                         SET status=%s, paid_amount=%s, payment_date=%s, notes=%s, updated_at=NOW()
-                        WHERE period_id=%s AND room_number=%s
+                        WHERE period_id=%s AND room_number=%s{self._scope()}
                     """, (status, paid_amount or 0, payment_date, notes, period_id, room_number))
             
             return True, "✅ 繳費狀態已更新"
@@ -665,43 +1315,45 @@ class SupabaseDB:
             logger.error(f"Update electricity payment error: {e}")
             return False, f"❌ 更新失敗: {str(e)}"
     
+    @_query_limits(fallback=True)
     def get_electricity_payment_summary(self, period_id):
         """
         取得某個計費期間的繳費統計
         """
         try:
-            with self._get_connection() as conn:
+            with self._get_connection(readonly=True) as conn:
                 with conn.cursor() as cur:
                     # 應收總額
-                    cur.execute("""
-                        SELECT SUM(calculated_fee) FROM electricity_payment WHERE period_id=%s
+                    cur.execute(f"""
+                        SELECT SUM(calculated_fee) FROM electricity_payment WHERE period_id=%s{self._scope()}
                     """, (period_id,))
                     total_due = cur.fetchone()[0] or 0
                     
                     # 已繳總額
-                    cur.execute("""
-                        SELECT SUM(paid_amount) FROM electricity_payment WHERE period_id=%s
+                    cur.execute(f"""
+                        SELECT SUM(paid_amount) FROM electricity_payment WHERE period_id=%s{self._scope()}
                     """, (period_id,))
                     total_paid = cur.fetchone()[0] or 0
                     
                     # 未繳房間數
-                    cur.execute("""
-                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='未繳'
+                    cur.execute(f"""
+                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='未繳'{self._scope()}
                     """, (period_id,))
                     unpaid_rooms = cur.fetchone()[0] or 0
                     
                     # 已繳房間數
-                    cur.execute("""
-                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='已繳'
+                    cur.execute(f"""
+                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='已繳'{self._scope()}
                     """, (period_id,))
                     paid_rooms = cur.fetchone()[0] or 0
                     
                     # 部分繳房間數
-                    cur.execute("""
-                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='部分繳'
+                    cur.execute(f"""
+                        SELECT COUNT(*) FROM electricity_payment WHERE period_id=%s AND status='部分繳'{self._scope()}
                     """, (period_id,))
                     partial_rooms = cur.fetchone()[0] or 0
                 
+                total_due, total_paid = float(total_due), float(total_paid)
                 return {
                     'total_due': total_due,
                     'total_paid': total_paid,
@@ -709,7 +1361,7 @@ class SupabaseDB:
                     'paid_rooms': paid_rooms,
                     'unpaid_rooms': unpaid_rooms,
                     'partial_rooms': partial_rooms,
-                    'collection_rate': (total_paid / total_due * 100) if total_due > 0 else 0
+                    'collection_rate': (total_paid / total_due * 100) if total_due > 0 else 0.0
                 }
         except Exception as e:
             logger.error(f"Get electricity payment summary error: {e}")
@@ -733,25 +1385,177 @@ class SupabaseDB:
             logger.error(f"Add expense error: {e}")
             return False
     
-    def get_expenses(self, limit=50):
-        """取得支出列表"""
-        with self._get_connection() as conn:
-            return pd.read_sql("""
-                SELECT * FROM expenses ORDER BY expense_date DESC LIMIT %s
-            """, conn, params=(limit,))
+    @_query_limits(fallback=True)
+    def get_expenses(self, limit=50, columns=None):
+        """取得支出列表（columns: 只取這些欄位）"""
+        q = sql.SQL("SELECT {} FROM expenses" + self._scope(prefix=" WHERE ") + " ORDER BY expense_date DESC LIMIT %s").format(
+            _select_list(self._check_columns("expenses", columns))
+        )
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, q, (limit,))
+    
+    # ==========================
+    # 報表 (Reports)
+    # ==========================
+    
+    @_query_limits(fallback=True)
+    def get_monthly_rollup(self, year_from: int, year_to: int = None):
+        """取得每月彙總（需先建立 monthly_rollup，見 services/schema.py）"""
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, f"""
+                SELECT * FROM monthly_rollup WHERE year BETWEEN %s AND %s{self._scope()}
+                ORDER BY year, month, room_number, category
+            """, (year_from, year_to or year_from))
+    
+    @_query_limits(fallback=True)
+    def get_pnl(self, year_from: int, year_to: int = None, granularity: str = "month"):
+        """損益表（單一查詢，讀 monthly_rollup；尚未建立時直接彙總來源資料表）"""
+        with untracked():
+            schema = self._cached("schema", self._load_schema, ttl=SCHEMA_CACHE_TTL)
+        q = pnl_query(granularity, rollup="monthly_rollup" if "monthly_rollup" in schema else rollup_view("postgres"),
+                      property_id=self.property_id)
+        with self._get_connection(readonly=True) as conn:
+            df = _read_frame(conn, q, (year_from - 1, year_to or year_from, year_from))
+        return df if granularity == "month" else df.drop(columns="month")
+    
+    # ==========================
+    # 匯出 (Export)
+    # ==========================
+    
+    @_query_limits(timeout_ms=60000)
+    def copy_to_csv(self, query, fileobj, params=None):
+        """
+        以 COPY (query) TO STDOUT 串流查詢結果（CSV 含標題列）寫入 fileobj
+        
+        資料由 server 分段送出並直接寫入 fileobj，不會整批載入記憶體；
+        query 須自行限定 property（匯出項目見 export.export_query）
+        """
+        with self._get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                if params:
+                    query = cur.mogrify(query, params).decode("utf-8")
+                cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", fileobj)
+    
+    # ==========================
+    # 批次匯入 (Import)
+    # ==========================
+    
+    @_query_limits(timeout_ms=60000)
+    def bulk_import(self, files, period_id=None):
+        """
+        批次匯入（已驗證的 CSV，不含標題列）
+        
+        每個檔案先以 COPY 載入暫存表，再在同一個交易內合併到正式表格；
+        任何一步失敗整批 rollback。新房客的繳費排程以一條 SQL 一次產生。
+        
+        params:
+            files: {"tenants" / "meters" / "expenses": 檔案物件}，欄位順序見 IMPORT_COLUMNS
+            period_id: 電表讀數所屬的計費期間
+        
+        returns:
+            (ok, msg, counts)
+        """
+        counts = {}
+        try:
+            with self._get_connection(invalidates=("tenants",)) as conn:
+                with conn.cursor() as cur:
+                    if "tenants" in files:
+                        self._copy_staging(cur, "tenants", files["tenants"])
+                        cur.execute(f"""
+                            WITH new AS (
+                                INSERT INTO tenants(
+                                    room_number, tenant_name, phone, deposit, base_rent,
+                                    lease_start, lease_end, payment_method, has_water_fee
+                                )
+                                SELECT s.room_number, s.tenant_name, COALESCE(s.phone, ''), s.deposit, s.base_rent,
+                                       s.lease_start, s.lease_end, s.payment_method, s.has_water_fee
+                                FROM import_tenants s
+                                WHERE NOT EXISTS (
+                                    SELECT 1 FROM tenants t
+                                    WHERE t.room_number = s.room_number AND t.is_active = 1{self._scope("t")}
+                                )
+                                RETURNING room_number, tenant_name, base_rent, has_water_fee,
+                                          payment_method, lease_start, lease_end
+                            ),
+                            sched AS (
+                                -- 與 generate_payment_schedule 相同：從起租日逐期累加，
+                                -- 半年繳只取 1、7 月，年繳只取 1 月，每期 5 號前繳下個月
+                                INSERT INTO payment_schedule(
+                                    room_number, tenant_name, payment_year, payment_month,
+                                    amount, payment_method, due_date, status, created_at, updated_at
+                                )
+                                SELECT n.room_number, n.tenant_name,
+                                       EXTRACT(YEAR FROM d)::int, EXTRACT(MONTH FROM d)::int,
+                                       n.base_rent + CASE WHEN n.has_water_fee THEN %s ELSE 0 END,
+                                       n.payment_method,
+                                       (date_trunc('month', d) + interval '1 month 4 days')::date,
+                                       '未繳', NOW(), NOW()
+                                FROM new n
+                                CROSS JOIN LATERAL generate_series(
+                                    n.lease_start::timestamp, n.lease_end::timestamp,
+                                    CASE n.payment_method
+                                        WHEN '半年繳' THEN interval '6 months'
+                                        WHEN '年繳' THEN interval '1 year'
+                                        ELSE interval '1 month'
+                                    END
+                                ) AS d
+                                WHERE n.payment_method = '月繳'
+                                   OR (n.payment_method = '半年繳' AND EXTRACT(MONTH FROM d) IN (1, 7))
+                                   OR (n.payment_method = '年繳' AND EXTRACT(MONTH FROM d) = 1)
+                                ON CONFLICT (property_id, room_number, payment_year, payment_month) DO NOTHING
+                                RETURNING 1
+                            )
+                            SELECT (SELECT COUNT(*) FROM new), (SELECT COUNT(*) FROM sched)
+                        """, (WATER_FEE,))
+                        counts["tenants"], counts["schedule"] = cur.fetchone()
+                    
+                    if "meters" in files:
+                        self._copy_staging(cur, "meters", files["meters"])
+                        cur.execute("""
+                            INSERT INTO electricity_meter(period_id, room_number, meter_start_reading, meter_end_reading, meter_kwh_usage)
+                            SELECT %s, room_number, meter_start_reading, meter_end_reading,
+                                   ROUND(meter_end_reading - meter_start_reading, 2)
+                            FROM import_meters
+                            ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
+                            meter_start_reading=EXCLUDED.meter_start_reading, meter_end_reading=EXCLUDED.meter_end_reading, meter_kwh_usage=EXCLUDED.meter_kwh_usage
+                        """, (period_id,))
+                        counts["meters"] = cur.rowcount
+                    
+                    if "expenses" in files:
+                        self._copy_staging(cur, "expenses", files["expenses"])
+                        cur.execute("""
+                            INSERT INTO expenses(expense_date, category, amount, description)
+                            SELECT expense_date, category, amount, COALESCE(description, '') FROM import_expenses
+                        """)
+                        counts["expenses"] = cur.rowcount
+            
+            return True, "✅ 匯入完成", counts
+        except Exception as e:
+            logger.error(f"Bulk import error: {e}")
+            return False, f"❌ 匯入失敗: {str(e)}", {}
+    
+    def _copy_staging(self, cur, name, fileobj):
+        """建立交易結束即刪除的暫存表，並以 COPY FROM STDIN 載入"""
+        cur.execute(f"CREATE TEMP TABLE import_{name} ({IMPORT_STAGING[name]}) ON COMMIT DROP")
+        cur.copy_expert(
+            f"COPY import_{name}({', '.join(IMPORT_COLUMNS[name])}) FROM STDIN WITH (FORMAT csv)",
+            fileobj,
+        )
     
     # ==========================
     # 備忘錄 (Memos)
     # ==========================
     
-    def get_memos(self, completed=False):
-        """取得備忘錄"""
-        with self._get_connection() as conn:
-            return pd.read_sql("""
-                SELECT * FROM memos
-                WHERE is_completed=%s
-                ORDER BY priority DESC, created_at DESC
-            """, conn, params=(1 if completed else 0,))
+    @_query_limits(fallback=True)
+    def get_memos(self, completed=False, columns=None):
+        """取得備忘錄（columns: 只取這些欄位）"""
+        q = sql.SQL("""
+            SELECT {} FROM memos
+            WHERE is_completed=%s
+            ORDER BY priority DESC, created_at DESC
+        """).format(_select_list(self._check_columns("memos", columns)))
+        with self._get_connection(readonly=True) as conn:
+            return _read_frame(conn, q, (1 if completed else 0,))
     
     def add_memo(self, text, prio="normal"):
         """新增備忘錄"""
@@ -0,0 +1,70 @@
+# services/export.py
+import codecs
+import gzip
+import tempfile
+from datetime import date
+
+from services.backend import property_filter
+
+# 超過這個大小就改寫到磁碟暫存檔，記憶體用量與資料量無關
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# 匯出項目: key -> (顯示名稱, 查詢, property_id 所在的資料表別名)
+# {scope} / {where} 代入限定 property 的條件（" AND ..." / " WHERE ..."，見 export_query）
+EXPORTS = {
+    "tenants": ("房客資料", """
+        SELECT * FROM tenants WHERE is_active=1{scope} ORDER BY room_number
+    """, None),
+    "payment_schedule": ("繳費排程", """
+        SELECT * FROM payment_schedule{where} ORDER BY payment_year, payment_month, room_number
+    """, None),
+    "rent_records": ("租金紀錄", """
+        SELECT * FROM rent_records{where} ORDER BY year, month, room_number
+    """, None),
+    "electricity": ("電費繳費歷史", """
+        SELECT p.period_year, p.period_month_start, p.period_month_end,
+               e.room_number, e.calculated_fee, e.paid_amount, e.status,
+               e.payment_date, e.notes, e.updated_at
+        FROM electricity_payment e
+        JOIN electricity_period p ON p.id = e.period_id{where}
+        ORDER BY p.period_year, p.period_month_start, e.room_number
+    """, "e"),
+    "expenses": ("支出紀錄", """
+        SELECT * FROM expenses{where} ORDER BY expense_date, id
+    """, None),
+}
+
+
+def export_query(name: str, property_id=None) -> str:
+    """匯出項目的查詢；property_id 不為 None 時只匯出該 property 的列"""
+    _, query, alias = EXPORTS[name]
+    return query.format(
+        scope=property_filter(property_id, alias),
+        where=property_filter(property_id, alias, prefix=" WHERE "),
+    ).strip()
+
+
+def export_filename(name: str, compress: bool = False) -> str:
+    filename = f"{name}_{date.today():%Y%m%d}.csv"
+    return filename + ".gz" if compress else filename
+
+
+def export_csv(db, name: str, compress: bool = False):
+    """
+    串流匯出一個表格 / 報表為 CSV
+
+    以 COPY ... TO STDOUT 分段寫入暫存檔（可選 gzip），
+    不經過 DataFrame，也沒有筆數上限。
+
+    returns:
+        已回到開頭、可直接讀取的暫存檔物件
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    target = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+    # 加上 BOM，Excel 開啟中文才不會亂碼（與原本 utf-8-sig 相同）
+    target.write(codecs.BOM_UTF8)
+    db.copy_to_csv(export_query(name, db.property_id), target)
+    if compress:
+        target.close()
+    spool.seek(0)
+    return spool
@@ -0,0 +1,190 @@
+# services/importer.py
+import tempfile
+
+from services.backend import pd, IMPORT_COLUMNS, PAYMENT_METHODS
+from services.rooms import default_registry
+
+# 每次讀取的列數：大檔案分段解析，記憶體用量與檔案大小無關
+CHUNK_ROWS = 5000
+# 驗證後的資料先寫入暫存檔，超過這個大小改寫到磁碟
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# 匯入項目: key -> (顯示名稱, 必填欄位, 選填欄位與預設值)
+IMPORTS = {
+    "tenants": ("房客資料", ["room_number", "tenant_name", "base_rent", "lease_start", "lease_end"],
+                {"phone": "", "deposit": "0", "payment_method": "月繳", "has_water_fee": ""}),
+    "meters": ("電表讀數", ["room_number", "meter_start_reading", "meter_end_reading"], {}),
+    "expenses": ("支出紀錄", ["expense_date", "category", "amount"], {"description": ""}),
+}
+
+TRUE_VALUES = ["1", "true", "TRUE", "True", "y", "Y", "yes", "是"]
+
+
+def _dates(s):
+    return pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+
+
+def _numbers(s):
+    return pd.to_numeric(s, errors="coerce")
+
+
+def _check_tenants(df, ctx):
+    start, end = _dates(df["lease_start"]), _dates(df["lease_end"])
+    rent, deposit = _numbers(df["base_rent"]), _numbers(df["deposit"].replace("", "0"))
+    method = df["payment_method"].replace("", "月繳")
+    checks = [
+        (~df["room_number"].isin(ctx["rooms"]), "未知的房號"),
+        (df["room_number"].isin(ctx["occupied"]), "房號已有房客"),
+        (df["room_number"].isin(ctx["seen"]) | df["room_number"].duplicated(), "房號在檔案中重複"),
+        (start.isna() | end.isna(), "租約日期格式錯誤（YYYY-MM-DD）"),
+        (start >= end, "租約起日需早於迄日"),
+        (rent.isna() | (rent <= 0), "租金需為正數"),
+        (deposit.isna() | (deposit < 0), "押金需為非負數"),
+        (~method.isin(PAYMENT_METHODS), f"繳費方式需為 {'/'.join(PAYMENT_METHODS)}"),
+    ]
+    clean = pd.DataFrame({
+        "room_number": df["room_number"],
+        "tenant_name": df["tenant_name"],
+        "phone": df["phone"],
+        "deposit": deposit,
+        "base_rent": rent,
+        "lease_start": start.dt.strftime("%Y-%m-%d"),
+        "lease_end": end.dt.strftime("%Y-%m-%d"),
+        "payment_method": method,
+        "has_water_fee": df["has_water_fee"].isin(TRUE_VALUES),
+    })
+    return clean, checks
+
+
+def _check_meters(df, ctx):
+    start, end = _numbers(df["meter_start_reading"]), _numbers(df["meter_end_reading"])
+    checks = [
+        (~df["room_number"].isin(ctx["rooms"]), "未知的房號"),
+        (df["room_number"].isin(ctx["seen"]) | df["room_number"].duplicated(), "房號在檔案中重複"),
+        (start.isna() | end.isna() | (start < 0), "讀數需為非負數"),
+        (end < start, "本期讀數不可小於上期讀數"),
+    ]
+    clean = pd.DataFrame({
+        "room_number": df["room_number"],
+        "meter_start_reading": start,
+        "meter_end_reading": end,
+    })
+    return clean, checks
+
+
+def _check_expenses(df, ctx):
+    expense_date, amount = _dates(df["expense_date"]), _numbers(df["amount"])
+    checks = [
+        (expense_date.isna(), "日期格式錯誤（YYYY-MM-DD）"),
+        (amount.isna() | (amount < 0), "金額需為非負數"),
+    ]
+    clean = pd.DataFrame({
+        "expense_date": expense_date.dt.strftime("%Y-%m-%d"),
+        "category": df["category"],
+        "amount": amount,
+        "description": df["description"],
+    })
+    return clean, checks
+
+
+_CHECKS = {"tenants": _check_tenants, "meters": _check_meters, "expenses": _check_expenses}
+
+
+def validate_csv(name, fileobj, ctx=None):
+    """
+    分段讀取並驗證一個 CSV 檔
+
+    每段以向量化的 pandas 條件檢查（不逐列迴圈），
+    通過的列以 CSV（無標題列、欄位依 IMPORT_COLUMNS）寫入暫存檔。
+
+    params:
+        name: IMPORTS 的 key
+        fileobj: 上傳的 CSV（第一列為欄位名稱，可含 BOM）
+        ctx: {"rooms": 可用房號, "occupied": 已有房客的房號}
+
+    returns:
+        (暫存檔, 錯誤 DataFrame[列, 錯誤], 通過筆數)
+    """
+    _, required, optional = IMPORTS[name]
+    ctx = {"rooms": default_registry().numbers, "occupied": [], **(ctx or {}), "seen": set()}
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+", newline="", encoding="utf-8")
+    errors, passed = [], 0
+
+    try:
+        reader = pd.read_csv(fileobj, chunksize=CHUNK_ROWS, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    except pd.errors.EmptyDataError:
+        reader = []
+        errors.append(pd.DataFrame({"列": [1], "錯誤": ["檔案沒有內容"]}))
+    for chunk in reader:
+        missing = [c for c in required if c not in chunk.columns]
+        if missing:
+            errors.append(pd.DataFrame({"列": [1], "錯誤": [f"缺少欄位: {', '.join(missing)}"]}))
+            break
+        chunk = chunk.apply(lambda s: s.str.strip())
+        for col, default in optional.items():
+            if col not in chunk.columns:
+                chunk[col] = default
+
+        clean, checks = _CHECKS[name](chunk, ctx)
+        checks = [(chunk[col] == "", f"{col} 為必填") for col in required] + checks
+
+        bad = pd.Series(False, index=chunk.index)
+        for mask, message in checks:
+            mask = mask.fillna(False)
+            if mask.any():
+                # 第 1 列是標題，資料從第 2 列開始
+                errors.append(pd.DataFrame({"列": chunk.index[mask] + 2, "錯誤": message}))
+                bad |= mask
+
+        if "room_number" in chunk.columns:
+            ctx["seen"].update(chunk.loc[~bad, "room_number"])
+        clean = clean.loc[~bad, IMPORT_COLUMNS[name]]
+        clean.to_csv(spool, header=False, index=False)
+        passed += len(clean)
+
+    spool.seek(0)
+    errors = pd.concat(errors, ignore_index=True).sort_values("列", kind="stable") if errors else pd.DataFrame(columns=["列", "錯誤"])
+    return spool, errors, passed
+
+
+def import_csv_files(db, uploads, period_id=None):
+    """
+    驗證並匯入多個 CSV
+
+    所有檔案都沒有錯誤才寫入資料庫，且全部在同一個交易內完成；
+    有任何錯誤時不寫入，回傳逐列的錯誤報告。
+
+    params:
+        uploads: {IMPORTS 的 key: 檔案物件}
+        period_id: 匯入電表讀數時的計費期間
+
+    returns:
+        (ok, msg, 錯誤 DataFrame[項目, 列, 錯誤])
+    """
+    ctx = {"rooms": db.get_rooms().numbers}
+    if "tenants" in uploads:
+        ctx["occupied"] = db.get_tenants(columns=["room_number"])["room_number"].tolist()
+    if "meters" in uploads and period_id is None:
+        return False, "❌ 請選擇電表讀數的計費期間", pd.DataFrame(columns=["項目", "列", "錯誤"])
+
+    staged, reports = {}, []
+    for name, fileobj in uploads.items():
+        staged[name], errors, _ = validate_csv(name, fileobj, ctx)
+        if not errors.empty:
+            reports.append(errors.assign(項目=IMPORTS[name][0]))
+
+    try:
+        if reports:
+            report = pd.concat(reports, ignore_index=True)[["項目", "列", "錯誤"]]
+            return False, f"❌ {len(report)} 個錯誤，未匯入任何資料", report
+
+        ok, msg, counts = db.bulk_import(staged, period_id=period_id)
+        if ok:
+            parts = [f"{IMPORTS[name][0]} {counts[name]} 筆" for name in IMPORTS if name in counts]
+            if counts.get("schedule"):
+                parts.append(f"繳費排程 {counts['schedule']} 期")
+            msg = f"{msg}: {'、'.join(parts)}"
+        return ok, msg, pd.DataFrame(columns=["項目", "列", "錯誤"])
+    finally:
+        for spool in staged.values():
+            spool.close()
@@ -0,0 +1,68 @@
+# services/leases.py
+"""
+租約狀態：所有房間一次算完（不逐列 iterrows / strptime）
+
+儀表板的到期警示與房間卡片共用 lease_status 的結果
+"""
+from datetime import date, datetime
+
+import numpy as np
+
+from services.backend import pd
+
+# 租約在這個天數內到期視為即將到期
+EXPIRING_DAYS = 45
+
+# 狀態 -> 房間卡片顏色
+STATUS_COLORS = {"expired": "red", "expiring": "orange", "ok": "green", "vacant": "gray"}
+
+
+def lease_status(tenants, rooms=(), today=None):
+    """
+    計算每個房間的租約狀態
+
+    params:
+        tenants: get_tenants() 的 DataFrame（需 room_number / tenant_name / lease_end，
+                 lease_end 為 datetime64；payment_method 可省略）
+        rooms: 要顯示的所有房間；沒有房客的房間列為空房
+        today: 計算剩餘天數的基準日（None 為今天）
+
+    returns:
+        每位房客一列、每間空房一列的 DataFrame：
+        room_number / tenant_name / lease_end / days_left（Int64，無租約結束日為 NA）/
+        status（expired / expiring / ok / vacant）/ color / status_text / detail_text
+    """
+    today = datetime.combine(today or date.today(), datetime.min.time())
+    lease_end = tenants["lease_end"]
+    if not pd.api.types.is_datetime64_any_dtype(lease_end):
+        lease_end = pd.to_datetime(lease_end)
+
+    rooms = pd.Index(rooms, dtype=object)
+    vacant = rooms[~rooms.isin(tenants["room_number"])]
+    n_tenants, n_vacant = len(tenants), len(vacant)
+    is_vacant = np.r_[np.zeros(n_tenants, bool), np.ones(n_vacant, bool)]
+
+    # 空房與沒有租約結束日的房客 days 為 NaN，比較結果都是 False
+    days = np.r_[(lease_end - today).dt.days.to_numpy(float), np.full(n_vacant, np.nan)]
+    status = np.select(
+        [is_vacant, days < 0, days < EXPIRING_DAYS],
+        ["vacant", "expired", "expiring"],
+        "ok",
+    ).astype(object)
+
+    names = np.r_[tenants["tenant_name"].to_numpy(object), np.full(n_vacant, "", object)]
+    status_text = np.where(is_vacant, "空房", pd.Series(names).fillna("").to_numpy(object))
+    expired = status == "expired"
+    status_text[expired] = [f"{int(-d)} 天已逾期" for d in days[expired]]
+
+    detail = tenants["payment_method"].to_numpy(object) if "payment_method" in tenants else np.full(n_tenants, None, object)
+    return pd.DataFrame({
+        "room_number": np.r_[tenants["room_number"].to_numpy(object), vacant.to_numpy(object)],
+        "tenant_name": np.r_[tenants["tenant_name"].to_numpy(object), np.full(n_vacant, None, object)],
+        "lease_end": np.r_[lease_end.to_numpy("datetime64[ns]"), np.full(n_vacant, "NaT", "datetime64[ns]")],
+        "days_left": pd.array(days, dtype="Int64"),
+        "status": status,
+        "color": pd.Series(status).map(STATUS_COLORS).to_numpy(object),
+        "status_text": status_text,
+        "detail_text": pd.Series(np.r_[detail, np.full(n_vacant, None, object)]).fillna("").to_numpy(object),
+    })
@@ -0,0 +1,247 @@
+# services/mirror.py
+"""
+Supabase 的本機唯讀鏡像
+
+所有資料表同步到本機 SQLite 檔案（SQLiteDB），讀取方法直接查詢本機檔案；
+寫入仍送到 Supabase，成功後立即把受影響的資料表同步回本機（同一個 process 讀得到剛寫入的資料）。
+背景執行緒每 SYNC_INTERVAL 秒只拉取 updated_at 超過上次水位的列與之後的刪除紀錄（deleted_rows），
+Supabase 暫時連不上時讀取照常由鏡像提供。monthly_rollup 不同步，由本機的 trigger 依同步進來的列維護。
+
+以環境變數 RENTAL_MIRROR_PATH 啟用；既有資料庫需先執行
+services.schema.sync_migrations()（補 updated_at 欄位、deleted_rows 與 trigger），沒有 updated_at 的表每次整表同步。
+"""
+import abc
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from services.backend import RentalBackend, WRITE_TABLES, SCHEMA_CACHE_TTL
+from services.query_stats import untracked
+from services.schema import TABLES, SOURCE_TABLES, TOMBSTONE_TABLE
+from services.sqlite_db import SQLiteDB
+
+logger = logging.getLogger(__name__)
+
+# 背景同步的間隔秒數
+SYNC_INTERVAL = 30
+# 增量同步時水位往回重疊的秒數：updated_at 早於 commit 時間的列不會被漏掉（重複拉取的列直接覆蓋）
+SYNC_OVERLAP = 60
+
+# 資料表 -> 依賴它的參考資料快取 key
+CACHE_KEYS = {"tenants": "tenants", "electricity_period": "periods", "rooms": "rooms"}
+
+# 由鏡像提供的讀取方法；匯出（copy_to_csv）仍直接查詢 Supabase
+MIRROR_READS = [
+    "get_rooms", "room_exists", "get_tenants", "get_tenant_by_id",
+    "get_payment_schedule", "estimate_payment_schedule_count", "get_payment_summary",
+    "get_overdue_payments", "get_upcoming_payments", "get_arrears",
+    "get_pending_rents", "get_rent_summary", "get_rent_records", "estimate_rent_records_count",
+    "get_rent_matrix", "get_unpaid_rents",
+    "get_all_periods", "get_period_report", "get_electricity_payment_record", "get_electricity_payment_summary",
+    "get_expenses", "get_memos", "get_monthly_rollup", "get_pnl",
+]
+
+sqlite3.register_adapter(Decimal, float)
+
+
+class ReplicaSync:
+    """把 primary（SupabaseDB）的資料表增量同步到 mirror（SQLiteDB）"""
+
+    def __init__(self, primary, mirror, interval=SYNC_INTERVAL):
+        self.primary = primary
+        self.mirror = mirror
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.status = {"state": "idle", "synced_at": None, "error": None}
+        with mirror._get_connection() as conn:
+            conn.cursor().execute("CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, watermark TEXT)")
+
+    @property
+    def ready(self) -> bool:
+        """最近一次完整同步之後，沒有發生寫入後同步失敗"""
+        return self.status["synced_at"] is not None
+
+    def start(self):
+        """啟動背景同步執行緒"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-mirror-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.pull(SOURCE_TABLES)
+            except Exception as e:
+                # 連不上 Supabase 時保留鏡像繼續提供讀取，下一輪再試
+                logger.warning(f"Mirror sync error: {e}")
+                self.status = {**self.status, "state": "error", "error": str(e)}
+
+    def pull(self, tables):
+        """同步指定的資料表；全部資料表都同步成功後鏡像才開始提供讀取"""
+        with untracked(), self._lock:
+            for table in tables:
+                self._pull_table(table)
+        if set(tables) >= set(SOURCE_TABLES):
+            self.status = {"state": "synced", "synced_at": time.time(), "error": None}
+
+    def after_write(self, tables):
+        """
+        寫入成功後同步受影響的資料表
+
+        同步失敗時暫停鏡像讀取（改讀 Supabase），直到下一次同步成功，避免讀到寫入前的資料
+        """
+        try:
+            self.pull(tables)
+        except Exception as e:
+            logger.warning(f"Mirror sync after write error: {e}")
+            self.status = {"state": "stale", "synced_at": None, "error": str(e)}
+
+    def _columns(self, table):
+        """兩邊都有的欄位（依 schema.TABLES 的順序）"""
+        upstream = self.primary._cached("schema", self.primary._load_schema, ttl=SCHEMA_CACHE_TTL)
+        local = self.mirror._cached("schema", self.mirror._load_schema, ttl=SCHEMA_CACHE_TTL)
+        return [c for c in TABLES[table] if c in upstream.get(table, ()) and c in local.get(table, ())]
+
+    def _pull_table(self, table):
+        columns = self._columns(table)
+        if not columns:
+            # 上游還沒有這個資料表（例如未建立 rooms 的既有資料庫）：鏡像保留本機的預設資料
+            return
+        incremental = "updated_at" in columns
+        watermark = self._watermark(table) if incremental else None
+
+        # primary 限定 property 時只同步該 property 的列
+        scope = self.primary._scope(prefix=" WHERE ") if "property_id" in columns else ""
+        q = f"SELECT {', '.join(columns)} FROM {table}{scope}"
+        params = ()
+        if watermark:
+            q += (" AND" if scope else " WHERE") + " updated_at >= %s"
+            params = (watermark - timedelta(seconds=SYNC_OVERLAP),)
+        with self.primary._get_connection(readonly=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute(q, params)
+                rows = cur.fetchall()
+                deleted = ids = None
+                if not incremental:
+                    # 整表同步：拉回來的列就是目前所有的列
+                    ids = [row[columns.index("id")] for row in rows]
+                elif watermark and self._has_tombstones():
+                    # 上次同步之後被刪除的 id（sync_migrations 的 DELETE trigger 記錄）
+                    cur.execute(
+                        f"SELECT row_id FROM {TOMBSTONE_TABLE} WHERE table_name = %s AND deleted_at >= %s",
+                        (table, *params),
+                    )
+                    deleted = [row[0] for row in cur.fetchall()]
+                else:
+                    # 還沒有水位（第一次同步或資料表仍是空的）或上游沒有刪除紀錄：比對目前所有 id
+                    cur.execute(f"SELECT id FROM {table}{scope}")
+                    ids = [row[0] for row in cur.fetchall()]
+
+        with self.mirror._get_connection() as conn:
+            cur = conn.cursor()
+            if rows:
+                cur.executemany(
+                    f"INSERT OR REPLACE INTO {table}({', '.join(columns)}) VALUES({', '.join('?' * len(columns))})",
+                    rows,
+                )
+            removed = 0
+            if ids is not None:
+                cur.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+                removed = cur.rowcount
+            elif deleted:
+                cur.execute(f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(deleted),))
+                removed = cur.rowcount
+            changed = bool(rows) or removed > 0
+
+            if incremental and rows:
+                at = columns.index("updated_at")
+                newest = max((row[at] for row in rows if row[at] is not None), default=None)
+                if newest is not None and (watermark is None or newest > watermark):
+                    cur.execute("INSERT OR REPLACE INTO sync_state VALUES(?, ?)", (table, newest))
+
+        if changed and table in CACHE_KEYS:
+            self.mirror._invalidate(CACHE_KEYS[table])
+
+    def _has_tombstones(self):
+        """上游已執行 sync_migrations（有 deleted_rows 與 DELETE trigger）"""
+        upstream = self.primary._cached("schema", self.primary._load_schema, ttl=SCHEMA_CACHE_TTL)
+        return TOMBSTONE_TABLE in upstream
+
+    def _watermark(self, table):
+        with self.mirror._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT watermark FROM sync_state WHERE table_name=?", (table,))
+            row = cur.fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+
+def _read(name):
+    # updated=()：不複製 __dict__（其中的 __isabstractmethod__ 會讓實作仍被視為抽象方法）
+    @functools.wraps(getattr(RentalBackend, name), updated=())
+    def method(self, *args, **kwargs):
+        return getattr(self.mirror if self.sync.ready else self.primary, name)(*args, **kwargs)
+    return method
+
+
+def _write(name, tables):
+    # updated=()：不複製 __dict__（其中的 __isabstractmethod__ 會讓實作仍被視為抽象方法）
+    @functools.wraps(getattr(RentalBackend, name), updated=())
+    def method(self, *args, **kwargs):
+        result = getattr(self.primary, name)(*args, **kwargs)
+        self.sync.after_write(tables)
+        return result
+    return method
+
+
+class MirroredDB(RentalBackend):
+    """
+    讀取走本機鏡像、寫入走 Supabase 的 RentalBackend
+
+    暖機時先完整同步一次，之後才改由鏡像提供讀取（在那之前讀取仍查詢 Supabase）
+    """
+
+    def __init__(self, primary, path, interval=SYNC_INTERVAL):
+        super().__init__()
+        self.primary = primary
+        self.mirror = SQLiteDB(path)
+        self.sync = ReplicaSync(primary, self.mirror, interval)
+
+    @property
+    def property_id(self):
+        return self.primary.property_id
+
+    def _load_schema(self):
+        return self.primary._load_schema()
+
+    def _load_rooms(self):
+        # get_rooms 由鏡像 / Supabase 提供（MIRROR_READS），這裡只在直接呼叫時使用
+        return self.primary._load_rooms()
+
+    def _warm_up_connections(self):
+        self.primary._warm_up_connections()
+        # 第一次同步失敗時由背景執行緒重試
+        self.sync.start()
+        self.sync.pull(SOURCE_TABLES)
+
+    def copy_to_csv(self, query, fileobj, params=None):
+        """匯出直接查詢 Supabase（不受同步間隔影響）"""
+        return self.primary.copy_to_csv(query, fileobj, params)
+
+
+for _name in MIRROR_READS:
+    setattr(MirroredDB, _name, _read(_name))
+for _name, _tables in WRITE_TABLES.items():
+    setattr(MirroredDB, _name, _write(_name, _tables))
+# 類別建立之後才補上的方法：重新計算還沒實作的抽象方法
+abc.update_abstractmethods(MirroredDB)
@@ -0,0 +1,142 @@
+# services/profiling.py
+import os
+import re
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+import logging
+from datetime import datetime
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# RENTAL_PROFILE=1 全域開啟；或在網址加上 ?profile=1 只針對該 session
+PROFILE_ENV = "RENTAL_PROFILE"
+PROFILE_DIR = os.environ.get("RENTAL_PROFILE_DIR", ".profiles")
+MAX_PROFILES = 50
+TOP_ALLOCATIONS = 25
+
+
+def profiling_enabled() -> bool:
+    """是否要對這次 rerun 做效能分析"""
+    if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+def _slug(tag: str) -> str:
+    return re.sub(r"[^\w]+", "_", tag or "").strip("_") or "app"
+
+
+@contextlib.contextmanager
+def profile_rerun(tag_key: str = "menu"):
+    """
+    以 cProfile + tracemalloc 包住一次 rerun，結束後存檔
+
+    params:
+        tag_key: session_state 中代表目前頁面的 key，用來標記檔名
+
+    每次 rerun 產生兩個檔案：
+        {時間}_{頁面}.prof      cProfile 原始檔（可給 snakeviz / flameprof 使用）
+        {時間}_{頁面}.mem.json  tracemalloc 前幾名配置位置與牆鐘時間
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(5)
+
+    profiler = cProfile.Profile()
+    t0 = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall_ms = (time.perf_counter() - t0) * 1000
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+
+        tag = st.session_state.get(tag_key, "")
+        base = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}_{_slug(tag)}")
+        try:
+            profiler.dump_stats(base + ".prof")
+            allocations = [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            ]
+            with open(base + ".mem.json", "w", encoding="utf-8") as f:
+                json.dump({"tag": tag, "wall_ms": round(wall_ms, 1), "allocations": allocations},
+                          f, ensure_ascii=False)
+            _prune()
+        except OSError as e:
+            logger.error(f"Save profile error: {e}")
+
+
+def _prune():
+    """只保留最近 MAX_PROFILES 次的分析結果"""
+    for old in list_profiles()[MAX_PROFILES:]:
+        for path in (old["path"], old["path"][:-len(".prof")] + ".mem.json"):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+
+def list_profiles():
+    """列出已儲存的分析結果（新到舊）"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".prof"):
+            continue
+        path = os.path.join(PROFILE_DIR, name)
+        meta = load_allocations(path)
+        profiles.append({
+            "path": path,
+            "name": name,
+            "tag": meta.get("tag", ""),
+            "wall_ms": meta.get("wall_ms"),
+        })
+    return profiles
+
+
+def load_allocations(prof_path: str) -> dict:
+    """讀取與 .prof 對應的 tracemalloc 結果"""
+    try:
+        with open(prof_path[:-len(".prof")] + ".mem.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def top_functions(prof_path: str, limit: int = 25, sort: str = "cumulative"):
+    """
+    取得耗時最多的函式
+
+    returns:
+        list of dict: function / ncalls / tottime_ms / cumtime_ms
+    """
+    stats = pstats.Stats(prof_path)
+    rows = []
+    for (filename, lineno, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            "function": f"{func} ({os.path.basename(filename)}:{lineno})",
+            "ncalls": nc,
+            "tottime_ms": round(tt * 1000, 2),
+            "cumtime_ms": round(ct * 1000, 2),
+        })
+    key = "cumtime_ms" if sort == "cumulative" else "tottime_ms"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:limit]
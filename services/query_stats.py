@@ -0,0 +1,122 @@
+# services/query_stats.py
+import os
+import threading
+import contextlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# RENTAL_QUERY_BUDGET=warn 只記錄警告；=strict 超過預算直接拋錯（AppTest / CI 用）
+BUDGET_MODE_ENV = "RENTAL_QUERY_BUDGET"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """單次 rerun 的 SQL 數量超過 view 宣告的預算"""
+
+
+class QueryStats:
+    """單次 rerun 內開啟的連線數與執行的 SQL 語句數"""
+
+    def __init__(self):
+        self.connections = 0
+        self.statements = 0
+        self.queries = []
+        # 查詢逾時而改用舊結果的方法: [(方法名稱, 資料已經過的秒數)]
+        self.degraded = []
+
+    def to_dict(self):
+        return {
+            "connections": self.connections,
+            "statements": self.statements,
+            "queries": list(self.queries),
+            "degraded": list(self.degraded),
+        }
+
+
+_local = threading.local()
+
+
+def current_stats():
+    """取得目前執行緒正在累計的 QueryStats（未追蹤時為 None）"""
+    return getattr(_local, "stats", None)
+
+
+@contextlib.contextmanager
+def track_queries():
+    """在 with 區塊內累計連線與 SQL 語句數"""
+    previous = current_stats()
+    stats = QueryStats()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+@contextlib.contextmanager
+def untracked():
+    """暫停累計（例如連線池檢查連線是否存活的 SELECT 1，不算 view 的查詢）"""
+    previous = current_stats()
+    _local.stats = None
+    try:
+        yield
+    finally:
+        _local.stats = previous
+
+
+def record_connection():
+    stats = current_stats()
+    if stats is not None:
+        stats.connections += 1
+
+
+def record_degraded(name, age):
+    stats = current_stats()
+    if stats is not None:
+        stats.degraded.append((name, age))
+
+
+def record_statement(sql):
+    stats = current_stats()
+    if stats is None:
+        return
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", errors="replace")
+    stats.statements += 1
+    # 只保留第一行有內容的 SQL，足以辨識是哪個查詢造成 N+1
+    first_line = next((line.strip() for line in str(sql).splitlines() if line.strip()), "")
+    stats.queries.append(first_line[:120])
+
+
+def check_budget(view_name: str, stats: QueryStats, budget: dict, mode: str = None):
+    """
+    比對 QueryStats 與 view 宣告的 QUERY_BUDGET
+
+    params:
+        view_name: 顯示用名稱
+        stats: track_queries() 取得的統計
+        budget: {"connections": int, "statements": int}
+        mode: "strict" 拋出 QueryBudgetExceeded，其他值只記錄警告；
+              預設讀取環境變數 RENTAL_QUERY_BUDGET，未設定時不檢查
+
+    returns:
+        超出預算的項目列表，例如 ["statements 14 > 9"]
+    """
+    if mode is None:
+        mode = os.environ.get(BUDGET_MODE_ENV, "")
+    if not mode or not budget:
+        return []
+
+    over = []
+    for key in ("connections", "statements"):
+        limit = budget.get(key)
+        actual = getattr(stats, key)
+        if limit is not None and actual > limit:
+            over.append(f"{key} {actual} > {limit}")
+
+    if over:
+        msg = f"Query budget exceeded in {view_name}: {', '.join(over)}"
+        if mode == "strict":
+            raise QueryBudgetExceeded(msg + "\n" + "\n".join(stats.queries))
+        logger.warning(msg)
+    return over
@@ -0,0 +1,111 @@
+# services/rooms.py
+"""
+房間清單（rooms 資料表）與依棟 / 樓層 / 分攤群組的索引
+
+RentalBackend.get_rooms() 每個 process 載入一次 RoomRegistry，房間異動（save_rooms）時清除快取；
+views 與電費計算都從這裡取房號，不再各自寫死房間清單。
+"""
+from services.schema import DEFAULT_ROOMS
+
+
+class RoomRegistry:
+    """
+    不可變的房間清單；依 (building, floor, sort_order, room_number) 排序
+
+    params:
+        rows: rooms 資料表的列（dict，需 room_number / building / floor / sharing_group，sort_order 可省略）
+    """
+
+    def __init__(self, rows):
+        rows = sorted(
+            ({**row, "building": row.get("building") or "", "sharing_group": row.get("sharing_group") or None}
+             for row in rows),
+            key=lambda r: (r["building"], r["floor"] if r["floor"] is not None else -1,
+                           r.get("sort_order") or 0, r["room_number"]),
+        )
+        self.rooms = tuple(rows)
+        self.numbers = [r["room_number"] for r in rows]
+        self.by_number = {r["room_number"]: r for r in rows}
+        self.by_building = {}
+        self.by_floor = {}
+        self.sharing_groups = {}
+        for r in rows:
+            self.by_building.setdefault(r["building"], []).append(r["room_number"])
+            self.by_floor.setdefault((r["building"], r["floor"]), []).append(r["room_number"])
+            if r["sharing_group"]:
+                self.sharing_groups.setdefault(r["sharing_group"], []).append(r["room_number"])
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __iter__(self):
+        return iter(self.numbers)
+
+    def __contains__(self, room):
+        return room in self.by_number
+
+    @property
+    def buildings(self) -> list:
+        return list(self.by_building)
+
+    def floor_key(self, building, floor) -> str:
+        """台電單據的樓層名稱（electricity_tdy_bill.floor_name）：未分棟為 "2F"，其餘加上棟名"""
+        return f"{building}-{floor}F" if building else f"{floor}F"
+
+    def floor_label(self, building, floor) -> str:
+        return f"{building} {floor}樓" if building else f"{floor}樓"
+
+    def group_floors(self, group) -> list:
+        """分攤群組的房間所在的 (building, floor)，依序排列；這些樓層的台電單據由群組分攤"""
+        floors = []
+        for room in self.sharing_groups.get(group, ()):
+            r = self.by_number[room]
+            if (r["building"], r["floor"]) not in floors:
+                floors.append((r["building"], r["floor"]))
+        return floors
+
+    def sharing_group(self, room):
+        """房間的分攤群組（獨享電表為 None）"""
+        return self.by_number[room]["sharing_group"]
+
+
+def _text(value) -> str:
+    """字串欄位去除空白；None / NaN（data_editor 的空白格）為空字串"""
+    return value.strip() if isinstance(value, str) else ""
+
+
+def clean_rooms(rows) -> list:
+    """
+    整理 save_rooms 的輸入：去除空白、空字串的棟名 / 分攤群組、依順序編 sort_order
+
+    raises:
+        ValueError: 沒有房間、房號空白或重複、樓層不是整數
+    """
+    cleaned = []
+    for i, row in enumerate(rows):
+        room = _text(row.get("room_number"))
+        if not room:
+            raise ValueError(f"第 {i + 1} 列房號空白")
+        try:
+            floor = int(row["floor"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"{room} 的樓層必須是整數") from None
+        cleaned.append({
+            "room_number": room,
+            "building": _text(row.get("building")),
+            "floor": floor,
+            "sharing_group": _text(row.get("sharing_group")) or None,
+            "sort_order": i,
+        })
+    if not cleaned:
+        raise ValueError("至少需要一間房")
+    numbers = [r["room_number"] for r in cleaned]
+    duplicated = sorted({room for room in numbers if numbers.count(room) > 1})
+    if duplicated:
+        raise ValueError(f"房號重複: {', '.join(duplicated)}")
+    return cleaned
+
+
+def default_registry() -> RoomRegistry:
+    """rooms 資料表還沒建立時（既有資料庫未執行 python -m services.schema 的輸出）使用的房間"""
+    return RoomRegistry(DEFAULT_ROOMS)
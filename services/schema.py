@@ -0,0 +1,651 @@
+# services/schema.py
+"""
+資料表結構（PostgreSQL 與 SQLite 共用的定義）
+
+欄位型別使用可攜式名稱（serial / text / int / numeric / bool / date / timestamp），
+由 ddl() 依 backend 轉成實際型別。
+
+多個 property（棟）共用一個資料庫時以 property_id 區分（見 PROPERTY_TABLES）；
+大資料表可選擇依年份分割（見 partition_migrations）。
+"""
+
+# 資料表: 欄位 -> "型別 [DEFAULT ...]"
+TABLES = {
+    "tenants": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "room_number": "text",
+        "tenant_name": "text",
+        "phone": "text",
+        "deposit": "numeric DEFAULT 0",
+        "base_rent": "numeric",
+        "lease_start": "date",
+        "lease_end": "date",
+        "payment_method": "text DEFAULT '月繳'",
+        "has_discount": "bool DEFAULT FALSE",
+        "has_water_fee": "bool DEFAULT FALSE",
+        "discount_notes": "text DEFAULT ''",
+        "annual_discount_months": "int DEFAULT 0",
+        "annual_discount_amount": "numeric DEFAULT 0",
+        "last_ac_cleaning_date": "date",
+        "is_active": "int DEFAULT 1",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "payment_schedule": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "room_number": "text",
+        "tenant_name": "text",
+        "payment_year": "int",
+        "payment_month": "int",
+        "amount": "numeric",
+        "paid_amount": "numeric DEFAULT 0",
+        "payment_method": "text",
+        "due_date": "date",
+        "status": "text DEFAULT '未繳'",
+        "paid_date": "date",
+        "notes": "text",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "rent_records": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "room_number": "text",
+        "tenant_name": "text",
+        "year": "int",
+        "month": "int",
+        "base_amount": "numeric",
+        "water_fee": "numeric",
+        "discount_amount": "numeric",
+        "actual_amount": "numeric",
+        "paid_amount": "numeric DEFAULT 0",
+        "payment_method": "text",
+        "notes": "text",
+        "status": "text",
+        "recorded_by": "text",
+        "paid_date": "date",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "electricity_period": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "period_year": "int",
+        "period_month_start": "int",
+        "period_month_end": "int",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "electricity_tdy_bill": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "period_id": "int",
+        "floor_name": "text",
+        "tdy_total_kwh": "numeric",
+        "tdy_total_fee": "numeric",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "electricity_meter": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "period_id": "int",
+        "room_number": "text",
+        "meter_start_reading": "numeric",
+        "meter_end_reading": "numeric",
+        "meter_kwh_usage": "numeric",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "electricity_calculation": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "period_id": "int",
+        "room_number": "text",
+        "private_kwh": "numeric",
+        "public_kwh": "numeric",
+        "total_kwh": "numeric",
+        "unit_price": "numeric",
+        "calculated_fee": "numeric",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "electricity_payment": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "period_id": "int",
+        "room_number": "text",
+        "calculated_fee": "numeric",
+        "paid_amount": "numeric DEFAULT 0",
+        "status": "text DEFAULT '未繳'",
+        "payment_date": "date",
+        "notes": "text",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "expenses": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "expense_date": "date",
+        "category": "text",
+        "amount": "numeric",
+        "description": "text",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    # 房間清單（services.rooms.RoomRegistry）；sharing_group 相同的房間分攤同一組台電單據的公用電，NULL 為獨享電表
+    "rooms": {
+        "id": "serial",
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "room_number": "text NOT NULL",
+        "building": "text DEFAULT ''",
+        "floor": "int",
+        "sharing_group": "text",
+        "sort_order": "int DEFAULT 0",
+        "is_active": "int DEFAULT 1",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    "memos": {
+        "id": "serial",
+        "memo_text": "text",
+        "priority": "text DEFAULT 'normal'",
+        "is_completed": "int DEFAULT 0",
+        "created_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+        "updated_at": "timestamp DEFAULT CURRENT_TIMESTAMP",
+    },
+    # 每月彙總（由 trigger 維護，見 ROLLUP_SOURCES）：房間列的 category 為 ''，支出列的 room_number 為 ''；每個 property 分開彙總
+    "monthly_rollup": {
+        "property_id": "int NOT NULL DEFAULT {property}",
+        "year": "int",
+        "month": "int",
+        "room_number": "text DEFAULT ''",
+        "category": "text DEFAULT ''",
+        "schedule_due": "numeric DEFAULT 0",
+        "schedule_paid": "numeric DEFAULT 0",
+        "schedule_unpaid_count": "int DEFAULT 0",
+        "rent_due": "numeric DEFAULT 0",
+        "rent_paid": "numeric DEFAULT 0",
+        "rent_unpaid": "numeric DEFAULT 0",
+        "electricity_billed": "numeric DEFAULT 0",
+        "electricity_collected": "numeric DEFAULT 0",
+        "expense_amount": "numeric DEFAULT 0",
+    },
+}
+
+# 有 property_id 的資料表：一個資料庫可放多個 property（棟），SupabaseDB 依所屬 property 篩選
+# 不同 property 可以有相同房號：每個 UNIQUE 都以 property_id 開頭（ON CONFLICT 的目標也是）
+PROPERTY_TABLES = [table for table, columns in TABLES.items() if "property_id" in columns]
+PROPERTY_SETTING = "rental.property_id"
+# property_id 的預設值：PostgreSQL 取連線的 rental.property_id（SupabaseDB 依所屬 property 設定），未設定時為 1
+PROPERTY_DEFAULT = {
+    "sqlite": "1",
+    "postgres": f"COALESCE(NULLIF(current_setting('{PROPERTY_SETTING}', true), '')::int, 1)",
+}
+
+# 由其他資料表推導、不直接寫入的資料表（鏡像不同步，由本機 trigger 重算）
+DERIVED_TABLES = ["monthly_rollup"]
+SOURCE_TABLES = [table for table in TABLES if table not in DERIVED_TABLES]
+
+# ON CONFLICT 用到的唯一鍵
+UNIQUE = {
+    "payment_schedule": [("property_id", "room_number", "payment_year", "payment_month")],
+    "rent_records": [("property_id", "room_number", "year", "month")],
+    "electricity_tdy_bill": [("property_id", "period_id", "floor_name")],
+    "electricity_meter": [("property_id", "period_id", "room_number")],
+    "electricity_payment": [("property_id", "period_id", "room_number")],
+    "monthly_rollup": [("property_id", "year", "month", "room_number", "category")],
+    "rooms": [("property_id", "room_number")],
+}
+
+# rooms 資料表是空的（新資料庫）或還沒建立時使用的房間：單棟 1-4 樓，2 樓以上分攤公用電
+DEFAULT_ROOMS = [
+    {"room_number": room, "building": "", "floor": int(room[0]), "sharing_group": None if room[0] == "1" else "公用",
+     "sort_order": i}
+    for i, room in enumerate(["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"])
+]
+
+# 索引名稱 -> (資料表, 欄位)；對應各 view 的篩選與排序
+INDEXES = {
+    "idx_tenants_active_room": ("tenants", ("is_active", "room_number")),
+    "idx_schedule_year_month": ("payment_schedule", ("payment_year", "payment_month", "room_number")),
+    "idx_schedule_status_due": ("payment_schedule", ("status", "due_date")),
+    "idx_rent_status": ("rent_records", ("status", "year", "month")),
+    "idx_electricity_calc_period": ("electricity_calculation", ("period_id", "room_number")),
+    "idx_expenses_date": ("expenses", ("expense_date",)),
+    "idx_memos_open": ("memos", ("is_completed", "created_at")),
+}
+
+# property_id 開頭的索引（只在 PostgreSQL 建立）：限定 property 的查詢只讀該 property 的索引範圍
+PROPERTY_INDEXES = {
+    "idx_tenants_property": ("tenants", ("property_id", "is_active", "room_number")),
+    "idx_schedule_property_year": ("payment_schedule", ("property_id", "payment_year", "payment_month", "room_number")),
+    "idx_schedule_property_status": ("payment_schedule", ("property_id", "status", "due_date")),
+    "idx_rent_property_year": ("rent_records", ("property_id", "year", "month", "room_number")),
+    "idx_rent_property_status": ("rent_records", ("property_id", "status", "year", "month")),
+    "idx_electricity_period_property": ("electricity_period", ("property_id", "id")),
+    "idx_expenses_property_date": ("expenses", ("property_id", "expense_date")),
+    "idx_rooms_property": ("rooms", ("property_id", "is_active")),
+}
+
+# 部分索引：名稱 -> (資料表, 欄位, WHERE)；只索引未繳的列，帳齡（get_arrears）與逾期查詢不必掃過已繳的歷史
+PARTIAL_INDEXES = {
+    "idx_schedule_unpaid_due": ("payment_schedule", ("due_date",), "status = '未繳'"),
+    "idx_rent_unpaid": ("rent_records", ("year", "month", "room_number"), "status IN ('未收', '待確認')"),
+}
+
+# 來源資料表 -> 彙總到 monthly_rollup 的方式
+#   key: (year, month, room_number, category, property_id)；("year"/"month", 欄位) 取日期欄位的年/月
+#   measures: 彙總欄位 -> 每一列的貢獻
+# 運算式中的 {r} 代換成 NEW / OLD（trigger）或資料表別名（重算）
+ROLLUP_SOURCES = {
+    "payment_schedule": {
+        "key": ("{r}.payment_year", "{r}.payment_month", "COALESCE({r}.room_number, '')", "''", "{r}.property_id"),
+        "measures": {
+            "schedule_due": "COALESCE({r}.amount, 0)",
+            "schedule_paid": "CASE WHEN {r}.status = '已繳' THEN COALESCE({r}.paid_amount, 0) ELSE 0 END",
+            "schedule_unpaid_count": "CASE WHEN {r}.status = '未繳' THEN 1 ELSE 0 END",
+        },
+    },
+    "rent_records": {
+        "key": ("{r}.year", "{r}.month", "COALESCE({r}.room_number, '')", "''", "{r}.property_id"),
+        "measures": {
+            "rent_due": "COALESCE({r}.actual_amount, 0)",
+            "rent_paid": "CASE WHEN {r}.status = '已收' THEN COALESCE({r}.paid_amount, 0) ELSE 0 END",
+            "rent_unpaid": "CASE WHEN {r}.status IN ('未收', '待確認') THEN COALESCE({r}.actual_amount, 0) ELSE 0 END",
+        },
+    },
+    # 電費歸到計費期間的結束月份
+    "electricity_payment": {
+        "key": (
+            "(SELECT period_year FROM electricity_period WHERE id = {r}.period_id)",
+            "(SELECT period_month_end FROM electricity_period WHERE id = {r}.period_id)",
+            "COALESCE({r}.room_number, '')", "''", "{r}.property_id",
+        ),
+        "measures": {
+            "electricity_billed": "COALESCE({r}.calculated_fee, 0)",
+            "electricity_collected": "COALESCE({r}.paid_amount, 0)",
+        },
+    },
+    "expenses": {
+        "key": (
+            ("year", "{r}.expense_date"), ("month", "{r}.expense_date"), "''", "COALESCE({r}.category, '')", "{r}.property_id",
+        ),
+        "measures": {"expense_amount": "COALESCE({r}.amount, 0)"},
+    },
+}
+ROLLUP_KEY = ("year", "month", "room_number", "category", "property_id")
+
+# 日期欄位取年 / 月
+DATE_PARTS = {
+    "sqlite": {"year": "CAST(strftime('%Y', {}) AS INTEGER)", "month": "CAST(strftime('%m', {}) AS INTEGER)"},
+    "postgres": {"year": "CAST(EXTRACT(YEAR FROM {}) AS INTEGER)", "month": "CAST(EXTRACT(MONTH FROM {}) AS INTEGER)"},
+}
+
+# 有 updated_at 的資料表都可增量同步（services/mirror.py）
+SYNC_TABLES = [table for table, columns in TABLES.items() if "updated_at" in columns]
+# 增量同步看不到刪除：SYNC_TABLES 的 DELETE trigger 把被刪除的 id 記在這個表
+TOMBSTONE_TABLE = "deleted_rows"
+
+TYPES = {
+    "sqlite": {
+        "serial": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "text": "TEXT",
+        "int": "INTEGER",
+        # 金額用 REAL：SQLite 的 NUMERIC 會把整數金額存成 INTEGER
+        "numeric": "REAL",
+        "bool": "BOOLEAN",
+        "date": "DATE",
+        "timestamp": "TIMESTAMP",
+    },
+    "postgres": {
+        "serial": "SERIAL PRIMARY KEY",
+        "text": "TEXT",
+        "int": "INTEGER",
+        "numeric": "NUMERIC",
+        "bool": "BOOLEAN",
+        "date": "DATE",
+        "timestamp": "TIMESTAMP",
+    },
+}
+
+
+def column_types(table: str) -> dict:
+    """欄位 -> 可攜式型別（不含 DEFAULT）"""
+    return {col: spec.split()[0] for col, spec in TABLES[table].items()}
+
+
+def column_ddl(col: str, spec: str, dialect: str) -> str:
+    """一個欄位的定義（"名稱 型別 [DEFAULT ...]"）"""
+    kind, _, rest = spec.partition(" ")
+    rest = rest.replace("{property}", PROPERTY_DEFAULT[dialect])
+    return f"{col} {TYPES[dialect][kind]}" + (f" {rest}" if rest else "")
+
+
+def ddl(dialect: str) -> list:
+    """
+    建立所有資料表與索引的 SQL（皆為 IF NOT EXISTS，可重複執行）
+
+    params:
+        dialect: "sqlite" 或 "postgres"
+    """
+    statements = [create_table(table, dialect) for table in TABLES]
+    for name, (table, cols) in INDEXES.items():
+        statements.append(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})")
+    for name, (table, cols, where) in PARTIAL_INDEXES.items():
+        statements.append(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)}) WHERE {where}")
+    if dialect == "postgres":
+        for name, (table, cols) in PROPERTY_INDEXES.items():
+            statements.append(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)})")
+    return statements + rollup_triggers(dialect) + [rooms_seed(dialect)]
+
+
+def create_table(table: str, dialect: str) -> str:
+    """一個資料表的 CREATE TABLE IF NOT EXISTS（含 UNIQUE）"""
+    defs = [column_ddl(col, spec, dialect) for col, spec in TABLES[table].items()]
+    for cols in UNIQUE.get(table, ()):
+        defs.append(f"UNIQUE ({', '.join(cols)})")
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(defs) + "\n)"
+
+
+def rooms_seed(dialect: str) -> str:
+    """目前的 property 還沒有房間時寫入 DEFAULT_ROOMS（已有房間時不做任何事，可重複執行）"""
+    columns = list(DEFAULT_ROOMS[0])
+    rows = " UNION ALL ".join(
+        "SELECT " + ", ".join(
+            "NULL" if room[col] is None else repr(room[col]) if isinstance(room[col], int) else f"'{room[col]}'"
+            for col in columns
+        )
+        for room in DEFAULT_ROOMS
+    )
+    return (
+        f"INSERT INTO rooms ({', '.join(columns)})"
+        f" SELECT * FROM ({rows}) AS seed"
+        f" WHERE NOT EXISTS (SELECT 1 FROM rooms WHERE property_id = {PROPERTY_DEFAULT[dialect]})"
+    )
+
+
+def _rollup_expr(expr, row: str, dialect: str) -> str:
+    if isinstance(expr, tuple):
+        part, column = expr
+        return DATE_PARTS[dialect][part].format(column.format(r=row))
+    return expr.format(r=row)
+
+
+def _rollup_upsert(table: str, row: str, sign: int, dialect: str) -> str:
+    """把一列（NEW / OLD）的貢獻乘上 sign 加進 monthly_rollup"""
+    source = ROLLUP_SOURCES[table]
+    keys = [_rollup_expr(expr, row, dialect) for expr in source["key"]]
+    measures = source["measures"]
+    values = [f"{sign} * ({_rollup_expr(expr, row, dialect)})" for expr in measures.values()]
+    return (
+        f"INSERT INTO monthly_rollup({', '.join(ROLLUP_KEY + tuple(measures))})"
+        f" SELECT {', '.join(keys + values)}"
+        f" WHERE {keys[0]} IS NOT NULL AND {keys[1]} IS NOT NULL"
+        f" ON CONFLICT ({', '.join(ROLLUP_KEY)}) DO UPDATE SET "
+        + ", ".join(f"{col} = monthly_rollup.{col} + excluded.{col}" for col in measures)
+    )
+
+
+def rollup_triggers(dialect: str) -> list:
+    """來源資料表寫入時，在同一個交易內增減 monthly_rollup 的 trigger（可重複執行）"""
+    statements = []
+    for table in ROLLUP_SOURCES:
+        if dialect == "postgres":
+            statements += [
+                f"""CREATE OR REPLACE FUNCTION rollup_{table}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        {_rollup_upsert(table, "OLD", -1, dialect)};
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        {_rollup_upsert(table, "NEW", 1, dialect)};
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""",
+                f"CREATE OR REPLACE TRIGGER {table}_rollup AFTER INSERT OR UPDATE OR DELETE ON {table}"
+                f" FOR EACH ROW EXECUTE FUNCTION rollup_{table}()",
+            ]
+        else:
+            for event, rows in (("INSERT", [("NEW", 1)]), ("UPDATE", [("OLD", -1), ("NEW", 1)]), ("DELETE", [("OLD", -1)])):
+                body = "".join(f"\n    {_rollup_upsert(table, row, sign, dialect)};" for row, sign in rows)
+                statements.append(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_rollup_{event.lower()} AFTER {event} ON {table}"
+                    f" BEGIN{body}\nEND"
+                )
+    return statements
+
+
+def rollup_rebuild(dialect: str) -> list:
+    """從來源資料表重算整個 monthly_rollup（既有資料庫第一次建立彙總表，或懷疑彙總不一致時執行）"""
+    statements = ["DELETE FROM monthly_rollup"]
+    for table, source in ROLLUP_SOURCES.items():
+        keys = [_rollup_expr(expr, "r", dialect) for expr in source["key"]]
+        measures = source["measures"]
+        sums = [f"SUM({_rollup_expr(expr, 'r', dialect)})" for expr in measures.values()]
+        statements.append(
+            f"INSERT INTO monthly_rollup({', '.join(ROLLUP_KEY + tuple(measures))})"
+            f" SELECT {', '.join(keys + sums)} FROM {table} AS r"
+            f" WHERE {keys[0]} IS NOT NULL AND {keys[1]} IS NOT NULL"
+            f" GROUP BY {', '.join(str(i) for i in range(1, len(ROLLUP_KEY) + 1))}"
+            f" ON CONFLICT ({', '.join(ROLLUP_KEY)}) DO UPDATE SET "
+            + ", ".join(f"{col} = monthly_rollup.{col} + excluded.{col}" for col in measures)
+        )
+    return statements
+
+
+def rollup_view(dialect: str) -> str:
+    """
+    與 monthly_rollup 欄位相同（不含 property_id）、直接由來源資料表算出的子查詢（每列來源資料一列，未彙總）
+
+    資料庫尚未建立 monthly_rollup 時，讀取彙總表的查詢改以這個子查詢代替
+    """
+    measures = [col for source in ROLLUP_SOURCES.values() for col in source["measures"]]
+    selects = []
+    for table, source in ROLLUP_SOURCES.items():
+        keys = [_rollup_expr(expr, "r", dialect) for expr in source["key"]]
+        values = [
+            f"{_rollup_expr(source['measures'][col], 'r', dialect)} AS {col}" if col in source["measures"] else f"0 AS {col}"
+            for col in measures
+        ]
+        # 沒有 monthly_rollup 的資料庫是還沒執行 property_migrations 的舊資料庫，來源資料表也沒有 property_id
+        keys = [key for key, col in zip(keys, ROLLUP_KEY) if col != "property_id"]
+        selects.append(
+            f"SELECT {', '.join(f'{key} AS {col}' for key, col in zip(keys, ROLLUP_KEY))}, {', '.join(values)}"
+            f" FROM {table} AS r WHERE {keys[0]} IS NOT NULL AND {keys[1]} IS NOT NULL"
+        )
+    return f"({' UNION ALL '.join(selects)}) AS monthly_rollup"
+
+
+def sync_migrations() -> list:
+    """
+    既有的 PostgreSQL 資料庫補上增量同步需要的 updated_at（欄位、索引與 UPDATE 時自動更新的 trigger）
+    以及記錄刪除的 deleted_rows（DELETE trigger）
+
+    所有語句皆可重複執行
+    """
+    statements = ["""CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := NOW();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql"""]
+    for table in SYNC_TABLES:
+        statements += [
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at)",
+            f"CREATE OR REPLACE TRIGGER {table}_updated_at BEFORE UPDATE ON {table}"
+            f" FOR EACH ROW EXECUTE FUNCTION set_updated_at()",
+        ]
+    # 刪除紀錄（tombstone）：鏡像只拉取上次同步之後的刪除，不必每次比對整表的 id
+    statements += [
+        f"CREATE TABLE IF NOT EXISTS {TOMBSTONE_TABLE} ("
+        f"table_name TEXT NOT NULL, row_id INTEGER NOT NULL, deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+        f"CREATE INDEX IF NOT EXISTS idx_{TOMBSTONE_TABLE}_table_deleted_at ON {TOMBSTONE_TABLE} (table_name, deleted_at)",
+        f"""CREATE OR REPLACE FUNCTION record_delete() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO {TOMBSTONE_TABLE}(table_name, row_id) VALUES (TG_ARGV[0], OLD.id);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql""",
+    ]
+    for table in SYNC_TABLES:
+        # 資料表名稱以參數傳入：分割資料表的 trigger 在分割區上執行，TG_TABLE_NAME 是分割區名稱
+        statements.append(
+            f"CREATE OR REPLACE TRIGGER {table}_deleted AFTER DELETE ON {table}"
+            f" FOR EACH ROW EXECUTE FUNCTION record_delete('{table}')"
+        )
+    return statements
+
+
+def property_migrations() -> list:
+    """
+    既有的 PostgreSQL 資料庫補上 property_id（既有的列屬於 property 1）並把唯一鍵換成含 property_id 的 UNIQUE，
+    須在 ddl() 之前執行
+
+    沒有 property_id 的舊 monthly_rollup 直接刪除，由 ddl() 重建、rollup_rebuild() 重算；
+    所有語句皆可重複執行
+    """
+    statements = []
+    for table in PROPERTY_TABLES:
+        if table in DERIVED_TABLES:
+            continue
+        statements += [
+            f"ALTER TABLE IF EXISTS {table} ADD COLUMN IF NOT EXISTS property_id INTEGER NOT NULL DEFAULT 1",
+            f"ALTER TABLE IF EXISTS {table} ALTER COLUMN property_id SET DEFAULT {PROPERTY_DEFAULT['postgres']}",
+        ]
+    # 舊的唯一鍵沒有 property_id（不同 property 的相同房號會互相覆蓋）：換成 UNIQUE 的新鍵
+    for table, keys in UNIQUE.items():
+        if table in DERIVED_TABLES:
+            continue
+        adds = "".join(f"\n        ALTER TABLE {table} ADD UNIQUE ({', '.join(cols)});" for cols in keys)
+        statements.append(f"""DO $$
+DECLARE
+    c record;
+BEGIN
+    IF to_regclass('{table}') IS NULL THEN
+        RETURN;
+    END IF;
+    FOR c IN SELECT conname FROM pg_constraint
+        WHERE conrelid = '{table}'::regclass AND contype = 'u' AND NOT EXISTS (
+            SELECT 1 FROM pg_attribute a
+            WHERE a.attrelid = conrelid AND a.attnum = ANY(conkey) AND a.attname = 'property_id'
+        )
+    LOOP
+        EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', c.conname);
+    END LOOP;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '{table}'::regclass AND contype = 'u') THEN{adds}
+    END IF;
+END
+$$""")
+    statements.append("""DO $$
+BEGIN
+    IF to_regclass('monthly_rollup') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM information_schema.columns WHERE table_name = 'monthly_rollup' AND column_name = 'property_id'
+    ) THEN
+        DROP TABLE monthly_rollup;
+    END IF;
+END
+$$""")
+    return statements
+
+
+# 依年份分割的大資料表（選用，見 partition_migrations）：資料表 -> (分割欄位, 欄位是年份 int 或日期 date)
+# 每個 UNIQUE 都已包含年份，分割後唯一鍵與 ON CONFLICT 不變
+PARTITIONS = {
+    "payment_schedule": ("payment_year", "int"),
+    "rent_records": ("year", "int"),
+    "expenses": ("expense_date", "date"),
+}
+
+
+def _partition_bounds(kind: str) -> str:
+    """分割區範圍的 format() 樣板，%1$s 為年份"""
+    if kind == "int":
+        return "FOR VALUES FROM (%1$s) TO (%1$s + 1)"
+    return "FOR VALUES FROM (make_date(%1$s, 1, 1)) TO (make_date(%1$s + 1, 1, 1))"
+
+
+def partition_migrations() -> list:
+    """
+    把 PARTITIONS 的資料表改成依年份分割（PostgreSQL 宣告式分割，選用）
+
+    已有資料的每個年份與今年、明年各一個分割區，其餘年份進 DEFAULT 分割區；
+    分割欄位是主鍵的一部分，不能是 NULL：有 NULL 的列時 migration 以錯誤中止（須先補上或刪除）。
+    依年份查詢（摘要、矩陣、排程）只讀該年的分割區，配合 PROPERTY_INDEXES 只讀該 property 的範圍。
+    已分割的資料表補上今年、明年與 DEFAULT 分割區裡已有列的年份（列移入新分割區），可重複執行（每年執行一次即可）。
+    之後重新建立索引與 trigger（ddl、sync_migrations），須在 property_migrations 之後執行
+    """
+    statements = []
+    for table, (column, kind) in PARTITIONS.items():
+        year = column if kind == "int" else f"EXTRACT(YEAR FROM {column})::int"
+        unique = "".join(f"\n        ALTER TABLE {table} ADD UNIQUE ({', '.join(cols)});" for cols in UNIQUE.get(table, ()))
+        assert all(column in cols for cols in UNIQUE.get(table, ())), f"{table} 的 UNIQUE 必須包含 {column}"
+        statements += [f"""DO $$
+DECLARE
+    y int;
+    years int[];
+    tombstones boolean;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = '{table}'::regclass) THEN
+        -- 分割欄位是主鍵的一部分（NOT NULL）：有 NULL 的列時整個 migration 中止，資料表不變
+        IF EXISTS (SELECT 1 FROM {table} WHERE {column} IS NULL) THEN
+            RAISE EXCEPTION '{table} 有 % 列的 {column} 是 NULL，無法依年份分割；請先補上 {column} 或刪除這些列',
+                (SELECT COUNT(*) FROM {table} WHERE {column} IS NULL);
+        END IF;
+        ALTER TABLE {table} RENAME TO {table}_unpartitioned;
+        CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE ({column});
+        ALTER TABLE {table} ADD PRIMARY KEY (id, {column});{unique}
+        EXECUTE format('ALTER SEQUENCE %s OWNED BY {table}.id', pg_get_serial_sequence('{table}_unpartitioned', 'id'));
+        FOR y IN SELECT DISTINCT {year} FROM {table}_unpartitioned LOOP
+            EXECUTE format('CREATE TABLE {table}_y%1$s PARTITION OF {table} {_partition_bounds(kind)}', y);
+        END LOOP;
+        CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;
+        INSERT INTO {table} SELECT * FROM {table}_unpartitioned;
+        DROP TABLE {table}_unpartitioned;
+    END IF;
+    -- 今年、明年與 DEFAULT 分割區裡已有列的年份：DEFAULT 有該年的列時建立分割區會失敗，
+    -- 先把這些列移到暫存表、建立分割區後再寫回（搬移不是刪除，不留 deleted_rows 紀錄）
+    -- （年份先讀進陣列：迴圈查詢還開著時不能 ALTER DEFAULT 分割區）
+    years := ARRAY(
+        SELECT EXTRACT(YEAR FROM now())::int + n FROM generate_series(0, 1) AS n
+        UNION SELECT DISTINCT {year} FROM {table}_default
+    );
+    -- 還沒執行過 sync_migrations（沒有 DELETE trigger）時不必停用
+    tombstones := EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgrelid = '{table}_default'::regclass AND tgname = '{table}_deleted'
+    );
+    FOREACH y IN ARRAY years LOOP
+        IF to_regclass('{table}_y' || y) IS NULL THEN
+            CREATE TEMP TABLE {table}_moving AS SELECT * FROM {table}_default WHERE {year} = y;
+            IF EXISTS (SELECT 1 FROM {table}_moving) THEN
+                IF tombstones THEN
+                    ALTER TABLE {table}_default DISABLE TRIGGER {table}_deleted;
+                END IF;
+                DELETE FROM {table}_default WHERE {year} = y;
+                IF tombstones THEN
+                    ALTER TABLE {table}_default ENABLE TRIGGER {table}_deleted;
+                END IF;
+            END IF;
+            EXECUTE format('CREATE TABLE {table}_y%1$s PARTITION OF {table} {_partition_bounds(kind)}', y);
+            INSERT INTO {table} SELECT * FROM {table}_moving;
+            DROP TABLE {table}_moving;
+        END IF;
+    END LOOP;
+END
+$$"""]
+    return statements + ddl("postgres") + sync_migrations()
+
+
+if __name__ == "__main__":
+    # python -m services.schema [postgres|sqlite]：印出建表 SQL（可貼到 Supabase SQL editor 執行）
+    # 最後的 rollup_rebuild 把既有資料補進 monthly_rollup，重複執行結果相同
+    # python -m services.schema partition：印出依年份分割大資料表的 SQL（選用，見 partition_migrations）
+    import sys
+
+    dialect = sys.argv[1] if len(sys.argv) > 1 else "postgres"
+    if dialect == "partition":
+        statements = partition_migrations()
+    elif dialect == "postgres":
+        statements = property_migrations() + ddl(dialect) + sync_migrations() + rollup_rebuild(dialect)
+    else:
+        statements = ddl(dialect) + rollup_rebuild(dialect)
+    print(";\n\n".join(statements) + ";")
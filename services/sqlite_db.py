@@ -0,0 +1,1005 @@
+# services/sqlite_db.py
+"""
+SQLite 版的 RentalBackend
+
+資料存在本機檔案（RENTAL_SQLITE_PATH），不需要網路或 Supabase 帳號，
+用於離線開發、AppTest 與 benchmarks/backend_latency.py 的延遲比較。
+資料表結構取自 services/schema.py，第一次連線時自動建立。
+"""
+import contextlib
+import csv
+import io
+import json
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+from services.backend import (
+    RentalBackend, pd, pnl_query, arrears_query, split_arrears, WATER_FEE, CATEGORY_COLUMNS,
+    IMPORT_STAGING, IMPORT_COLUMNS, generate_payment_schedule, clean_paid_rows,
+)
+from services.query_stats import record_connection, record_statement
+from services.rooms import clean_rooms
+from services.schema import ROLLUP_SOURCES, TABLES, UNIQUE, column_ddl, column_types, create_table, ddl, rollup_rebuild
+
+logger = logging.getLogger(__name__)
+
+# 等待其他連線寫入鎖的毫秒數
+BUSY_TIMEOUT_MS = 5000
+
+# 日期以 ISO 字串存放，與 PostgreSQL 的 date / timestamp 文字格式相同
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+# 查詢結果欄位 -> 可攜式型別（SQLite 查詢結果不帶型別，依欄位名稱轉換）
+_COLUMN_TYPES = {}
+for _table in TABLES:
+    _COLUMN_TYPES.update(column_types(_table))
+_COLUMN_TYPES.update({
+    # views 使用的中文別名
+    "年": "int", "月": "int", "金額": "numeric",
+    "房間度數": "numeric", "公用分攤": "numeric", "總度數": "numeric", "單價": "numeric", "應繳電費": "numeric",
+    "應繳金額": "numeric", "已繳金額": "numeric", "繳款日期": "date", "更新時間": "timestamp",
+    # get_arrears / get_pnl
+    "items": "int", "days_0_30": "numeric", "days_31_60": "numeric", "days_61_90": "numeric",
+    "days_90_plus": "numeric", "total": "numeric",
+    "rent_income": "numeric", "electricity_income": "numeric", "expenses": "numeric",
+    "net_income": "numeric", "cumulative_net": "numeric", "net_yoy": "numeric",
+})
+
+
+def _select_list(columns, required=()):
+    """SELECT 欄位：columns 為 None 時取全部，否則只取指定欄位（並補上分頁鍵）"""
+    if not columns:
+        return "*"
+    cols = list(columns) + [c for c in required if c not in columns]
+    return ", ".join(f'"{c}"' for c in cols)
+
+
+def _keyset_after(year_col: str, month_col: str, after):
+    """(年 DESC, 月 DESC, 房號 ASC) 排序下，取 after 這一列之後的條件"""
+    year, month, room = after
+    clause = (f" AND ({year_col} < ? OR ({year_col} = ? AND ({month_col} < ?"
+              f" OR ({month_col} = ? AND room_number > ?))))")
+    return clause, [year, year, month, month, room]
+
+
+def _read_frame(conn, query, params=()):
+    """
+    執行查詢並依欄位型別建立 DataFrame（與 services.db._read_frame 相同的型別）
+
+    日期 → datetime64、金額 → float64、含 NULL 的整數 → Int64、
+    CATEGORY_COLUMNS → category
+    """
+    cur = conn.cursor()
+    cur.execute(query, params)
+    names = [d[0] for d in cur.description]
+    df = pd.DataFrame.from_records(cur.fetchall(), columns=names)
+
+    for name in names:
+        kind = _COLUMN_TYPES.get(name)
+        if kind in ("date", "timestamp"):
+            df[name] = pd.to_datetime(df[name])
+        elif kind == "numeric":
+            df[name] = df[name].astype("float64")
+        elif kind == "bool":
+            df[name] = df[name].astype("boolean" if df[name].isna().any() else "bool")
+        elif kind in ("int", "serial") and df[name].isna().any():
+            df[name] = df[name].astype("Int64")
+        elif name in CATEGORY_COLUMNS:
+            df[name] = df[name].astype("category")
+    return df
+
+
+class _CountingCursor(sqlite3.Cursor):
+    """把執行的語句計入 query_stats"""
+
+    def execute(self, sql, parameters=()):
+        record_statement(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        record_statement(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+
+class SQLiteDB(RentalBackend):
+    """
+    SQLite 版的 RentalBackend
+
+    每個執行緒一條連線（WAL 模式，讀寫不互相阻塞）；
+    同一執行緒內巢狀的 _get_connection 共用同一個交易，由最外層 commit
+    """
+
+    def __init__(self, path="rental.db"):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, factory=_CountingConnection, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE（鏡像同步）刪除舊列時也觸發 DELETE trigger，monthly_rollup 才會扣掉舊值
+        conn.execute("PRAGMA recursive_triggers=ON")
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._migrate(conn)
+                conn.executescript(";\n".join(ddl("sqlite")) + ";")
+                # 建立彙總表之前就有資料的檔案：第一次連線時重算一次（之後由 trigger 維護）
+                if conn.execute("SELECT 1 FROM monthly_rollup LIMIT 1").fetchone() is None:
+                    conn.executescript(";\n".join(rollup_rebuild("sqlite")) + ";")
+                self._schema_ready = True
+        return conn
+
+    def _migrate(self, conn):
+        """
+        舊檔案補上 TABLES 新增的欄位、套用 UNIQUE 的新唯一鍵（ddl 的 CREATE TABLE IF NOT EXISTS 不會改既有的表）
+
+        monthly_rollup 缺欄位時（彙總鍵改變）連同 trigger 一起刪除，由 ddl 重建、_connect 重算
+        """
+        existing = {}
+        for table, column in conn.execute("""
+            SELECT m.name, p.name FROM sqlite_master m, pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+        """):
+            existing.setdefault(table, set()).add(column)
+        for table, columns in TABLES.items():
+            missing = [col for col in columns if col not in existing.get(table, columns)]
+            if table == "monthly_rollup":
+                if missing:
+                    for source in ROLLUP_SOURCES:
+                        for event in ("insert", "update", "delete"):
+                            conn.execute(f"DROP TRIGGER IF EXISTS {source}_rollup_{event}")
+                    conn.execute("DROP TABLE monthly_rollup")
+                continue
+            for col in missing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column_ddl(col, columns[col], 'sqlite')}")
+            if table in existing and self._unique_keys(conn, table) != set(UNIQUE.get(table, ())):
+                # 唯一鍵改變（例如加上 property_id）：SQLite 不能修改 constraint，以新定義重建資料表
+                # 舊表的 trigger 隨舊表刪除，由 ddl 重建；monthly_rollup 已包含這些列，不必重算
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+                conn.execute(create_table(table, "sqlite"))
+                cols = ", ".join(columns)
+                conn.execute(f"INSERT INTO {table}({cols}) SELECT {cols} FROM {table}_old")
+                conn.execute(f"DROP TABLE {table}_old")
+        conn.commit()
+
+    @staticmethod
+    def _unique_keys(conn, table):
+        """資料表的 UNIQUE constraint（欄位 tuple 的集合）"""
+        return {
+            tuple(col for _, col in sorted(conn.execute("SELECT seqno, name FROM pragma_index_info(?)", (name,))))
+            for name, in conn.execute("SELECT name FROM pragma_index_list(?) WHERE origin = 'u'", (table,))
+        }
+
+    @contextlib.contextmanager
+    def _get_connection(self, invalidates=()):
+        """
+        取得本執行緒的連線，最外層區塊結束時 commit
+
+        params:
+            invalidates: commit 成功後要清除的快取 key
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.depth = 0
+        record_connection()
+        outermost = self._local.depth == 0
+        self._local.depth += 1
+        committed = False
+        try:
+            yield conn
+            if outermost:
+                conn.commit()
+            committed = True
+            if invalidates:
+                self._invalidate(*invalidates)
+        except Exception as e:
+            logger.error(f"DB Connection Error: {e}")
+            raise
+        finally:
+            self._local.depth -= 1
+            # 例外（含 Streamlit 的 rerun/stop）時 rollback，不留下進行中的交易
+            if outermost and not committed:
+                conn.rollback()
+
+    def _load_schema(self):
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT m.name, p.name FROM sqlite_master m, pragma_table_info(m.name) p
+                WHERE m.type = 'table'
+            """)
+            schema = {}
+            for table, column in cur.fetchall():
+                schema.setdefault(table, set()).add(column)
+            return schema
+
+    def _warm_up_connections(self):
+        """開啟本執行緒的連線並建立資料表"""
+        with self._get_connection():
+            pass
+
+    # ==========================
+    # 房間 (Rooms)
+    # ==========================
+
+    def _load_rooms(self):
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT room_number, building, floor, sharing_group, sort_order FROM rooms WHERE is_active=1")
+            return [dict(zip([d[0] for d in cur.description], row)) for row in cur.fetchall()]
+
+    def save_rooms(self, rows):
+        """以 rows 取代房間清單（依房號新增或更新，不在 rows 的房間停用）"""
+        try:
+            rows = clean_rooms(rows)
+        except ValueError as e:
+            return False, f"❌ {e}"
+        try:
+            with self._get_connection(invalidates=("rooms",)) as conn:
+                cur = conn.cursor()
+                cur.executemany("""
+                    INSERT INTO rooms(room_number, building, floor, sharing_group, sort_order, is_active)
+                    VALUES(:room_number, :building, :floor, :sharing_group, :sort_order, 1)
+                    ON CONFLICT (property_id, room_number) DO UPDATE SET
+                        building=excluded.building, floor=excluded.floor, sharing_group=excluded.sharing_group,
+                        sort_order=excluded.sort_order, is_active=1
+                """, rows)
+                cur.execute(
+                    "UPDATE rooms SET is_active=0 WHERE is_active=1 AND room_number NOT IN (SELECT value FROM json_each(?))",
+                    (json.dumps([r["room_number"] for r in rows]),),
+                )
+            return True, f"✅ 已儲存 {len(rows)} 間房"
+        except Exception as e:
+            logger.error(f"Save rooms error: {e}")
+            return False, f"❌ 儲存失敗: {str(e)}"
+
+    # ==========================
+    # 房客管理 (Tenants)
+    # ==========================
+
+    def room_exists(self, room: str) -> bool:
+        """檢查房號是否已存在"""
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM tenants WHERE room_number=? AND is_active=1", (room,))
+            return cur.fetchone() is not None
+
+    def get_tenants(self, columns=None):
+        """取得所有房客列表（columns: 只取這些欄位）"""
+        return self._cached_columns("tenants", self._check_columns("tenants", columns), self._load_tenants)
+
+    def _load_tenants(self, columns=None):
+        with self._get_connection() as conn:
+            return _read_frame(conn, f"SELECT {_select_list(columns)} FROM tenants WHERE is_active=1 ORDER BY room_number")
+
+    def get_tenant_by_id(self, tid: int, columns=None):
+        """根據 ID 取得單一房客（columns: 只取這些欄位）"""
+        cols = _select_list(self._check_columns("tenants", columns))
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {cols} FROM tenants WHERE id=?", (tid,))
+            row = cur.fetchone()
+            if row:
+                return dict(zip([d[0] for d in cur.description], row))
+        return None
+
+    def add_tenant(self, room_number, tenant_name, phone, deposit, base_rent, lease_start, lease_end, payment_method="月繳"):
+        """新增房客"""
+        try:
+            if not isinstance(lease_start, str):
+                lease_start = lease_start.strftime('%Y-%m-%d')
+            if not isinstance(lease_end, str):
+                lease_end = lease_end.strftime('%Y-%m-%d')
+
+            with self._get_connection(invalidates=("tenants",)) as conn:
+                if self.room_exists(room_number):
+                    return False, f"❌ 房號 {room_number} 已存在"
+
+                cur = conn.cursor()
+                cur.execute("""
+                    INSERT INTO tenants(
+                        room_number, tenant_name, phone, deposit, base_rent,
+                        lease_start, lease_end, payment_method
+                    )
+                    VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+                """, (room_number, tenant_name, phone, deposit, base_rent, lease_start, lease_end, payment_method))
+
+                self._insert_schedule(cur, [(room_number, tenant_name, base_rent, False,
+                                             payment_method, lease_start, lease_end)])
+                return True, f"✅ 房號 {room_number} 已新增"
+
+        except Exception as e:
+            logger.error(f"Add tenant error: {e}")
+            return False, str(e)
+
+    def update_tenant(self, room_number, tenant_name=None, phone=None, deposit=None,
+                      base_rent=None, lease_start=None, lease_end=None, payment_method=None):
+        """編輯房客資訊"""
+        try:
+            if lease_start and not isinstance(lease_start, str):
+                lease_start = lease_start.strftime('%Y-%m-%d')
+            if lease_end and not isinstance(lease_end, str):
+                lease_end = lease_end.strftime('%Y-%m-%d')
+            values = {
+                "tenant_name": tenant_name, "phone": phone, "deposit": deposit, "base_rent": base_rent,
+                "lease_start": lease_start, "lease_end": lease_end, "payment_method": payment_method,
+            }
+            updates = {k: v for k, v in values.items() if v is not None}
+
+            with self._get_connection(invalidates=("tenants",)) as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT id FROM tenants WHERE room_number=? AND is_active=1", (room_number,))
+                result = cur.fetchone()
+                if not result:
+                    return False, f"❌ 房號 {room_number} 不存在"
+
+                if updates:
+                    assignments = ", ".join(f"{k}=?" for k in updates)
+                    cur.execute(f"UPDATE tenants SET {assignments} WHERE id=?", (*updates.values(), result[0]))
+                return True, f"✅ 房號 {room_number} 已更新"
+
+        except Exception as e:
+            logger.error(f"Update tenant error: {e}")
+            return False, str(e)
+
+    def delete_tenant(self, tenant_id: int):
+        """刪除房客（軟刪除）"""
+        try:
+            with self._get_connection(invalidates=("tenants",)) as conn:
+                conn.cursor().execute("UPDATE tenants SET is_active=0 WHERE id=?", (tenant_id,))
+                return True, "✅ 已刪除"
+        except Exception as e:
+            return False, str(e)
+
+    def _insert_schedule(self, cur, tenants):
+        """
+        為新房客產生繳費排程
+
+        params:
+            tenants: [(room, tenant_name, base_rent, has_water_fee, payment_method, lease_start, lease_end), ...]
+
+        returns:
+            新增的期數
+        """
+        rows = []
+        for room, tenant_name, base_rent, has_water_fee, payment_method, start, end in tenants:
+            amount = base_rent + (WATER_FEE if has_water_fee else 0)
+            for year, month in generate_payment_schedule(payment_method, start, end):
+                due_date = f"{year + 1}-01-05" if month == 12 else f"{year}-{month + 1:02d}-05"
+                rows.append((room, tenant_name, year, month, amount, payment_method, due_date))
+        if not rows:
+            return 0
+        cur.executemany("""
+            INSERT INTO payment_schedule(
+                room_number, tenant_name, payment_year, payment_month,
+                amount, payment_method, due_date, status
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?, '未繳')
+            ON CONFLICT (property_id, room_number, payment_year, payment_month) DO NOTHING
+        """, rows)
+        return cur.rowcount
+
+    # ==========================
+    # 繳費排程 (Payment Schedule)
+    # ==========================
+
+    def _payment_schedule_filter(self, room=None, status=None, year=None):
+        q = " WHERE 1=1"
+        params = []
+
+        if room and room != "全部":
+            q += " AND room_number=?"
+            params.append(room)
+        if status and status != "全部":
+            q += " AND status=?"
+            params.append(status)
+        if year:
+            q += " AND payment_year=?"
+            params.append(year)
+        return q, params
+
+    def get_payment_schedule(self, room=None, status=None, year=None, after=None, limit=None, columns=None):
+        """取得繳費排程（keyset 分頁，參數同 SupabaseDB）"""
+        columns = self._check_columns("payment_schedule", columns)
+        where, params = self._payment_schedule_filter(room, status, year)
+        if after:
+            clause, keys = _keyset_after("payment_year", "payment_month", after)
+            where += clause
+            params += keys
+
+        q = (f"SELECT {_select_list(columns, ('payment_year', 'payment_month', 'room_number'))}"
+             f" FROM payment_schedule{where} ORDER BY payment_year DESC, payment_month DESC, room_number")
+        if limit:
+            q += " LIMIT ?"
+            params.append(limit)
+
+        with self._get_connection() as conn:
+            return _read_frame(conn, q, params)
+
+    def estimate_payment_schedule_count(self, room=None, status=None, year=None) -> int:
+        """繳費排程筆數（SQLite 沒有查詢計畫的筆數估計，直接 COUNT）"""
+        where, params = self._payment_schedule_filter(room, status, year)
+        return self._count("SELECT COUNT(*) FROM payment_schedule" + where, params)
+
+    def _count(self, q, params=()):
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(q, params)
+            return cur.fetchone()[0]
+
+    def mark_payment_done(self, payment_id: int, paid_date: str, paid_amount: float, notes: str = ""):
+        """標記繳費完成"""
+        ok, msg = self.mark_payments_done_bulk([(payment_id, paid_date, paid_amount, notes)])
+        return ok, "✅ 繳費已標記" if ok else msg
+
+    def mark_payments_done_bulk(self, rows):
+        """
+        批次標記繳費完成
+
+        params:
+            rows: [(payment_id, paid_date, paid_amount, notes), ...]
+        """
+        try:
+            rows = [(paid_date, amount, notes, pid) for pid, paid_date, amount, notes in clean_paid_rows(rows)]
+        except ValueError as e:
+            return False, f"❌ {e}"
+        if not rows:
+            return False, "❌ 未選擇任何繳費項目"
+        try:
+            with self._get_connection() as conn:
+                cur = conn.cursor()
+                cur.executemany("""
+                    UPDATE payment_schedule
+                    SET status='已繳', paid_date=?, paid_amount=?, notes=?, updated_at=CURRENT_TIMESTAMP
+                    WHERE id=?
+                """, rows)
+                return True, f"✅ 已標記 {cur.rowcount} 筆繳費"
+        except Exception as e:
+            return False, str(e)
+
+    def get_payment_summary(self, year: int):
+        """取得繳費摘要（讀 monthly_rollup）"""
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT SUM(schedule_due), SUM(schedule_paid), SUM(schedule_unpaid_count)
+                FROM monthly_rollup WHERE year=?
+            """, (year,))
+            due, paid, unpaid = (v or 0 for v in cur.fetchone())
+            # 金額一律回傳 float（SUM 可能是 int，與 SupabaseDB 相同）
+            due, paid = float(due), float(paid)
+            return {
+                'total_due': due,
+                'total_paid': paid,
+                'unpaid_count': int(unpaid),
+                'collection_rate': (paid / due * 100) if due > 0 else 0.0
+            }
+
+    def get_overdue_payments(self):
+        """取得逾期未繳"""
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT room_number, tenant_name, payment_month, amount, due_date
+                FROM payment_schedule
+                WHERE status='未繳' AND due_date < ?
+                ORDER BY due_date ASC
+            """, (date.today(),))
+
+    def get_upcoming_payments(self, days_ahead: int = 7):
+        """取得近期應繳"""
+        today = date.today()
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT room_number, tenant_name, payment_month, amount, due_date
+                FROM payment_schedule
+                WHERE status='未繳' AND due_date >= ? AND due_date <= ?
+                ORDER BY due_date ASC
+            """, (today, today + timedelta(days=days_ahead)))
+
+    def get_arrears(self, as_of=None) -> dict:
+        """逾期帳齡（與 SupabaseDB 相同的 SQL）"""
+        with self._get_connection() as conn:
+            df = _read_frame(conn, arrears_query("sqlite"), (as_of or date.today(),))
+        return split_arrears(df)
+
+    # ==========================
+    # 租金紀錄 (Rent Records)
+    # ==========================
+
+    def batch_record_rent(self, room, tenant_name, start_year, start_month, months_count,
+                          base_rent, water_fee, discount, payment_method="月繳", notes=""):
+        """批量預填租金"""
+        try:
+            actual_amount = base_rent + water_fee - discount
+            rows = []
+            year, month = start_year, start_month
+            for _ in range(months_count):
+                rows.append((room, tenant_name, year, month, base_rent, water_fee, discount,
+                             actual_amount, payment_method, notes))
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+            with self._get_connection() as conn:
+                conn.cursor().executemany("""
+                    INSERT INTO rent_records(
+                        room_number, tenant_name, year, month, base_amount,
+                        water_fee, discount_amount, actual_amount, paid_amount,
+                        payment_method, notes, status, recorded_by
+                    )
+                    VALUES(?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, '待確認', 'batch')
+                    ON CONFLICT (property_id, room_number, year, month) DO UPDATE SET
+                    base_amount=excluded.base_amount, water_fee=excluded.water_fee,
+                    discount_amount=excluded.discount_amount, actual_amount=excluded.actual_amount,
+                    payment_method=excluded.payment_method, notes=excluded.notes, updated_at=CURRENT_TIMESTAMP
+                """, rows)
+                return True, f"✅ 已預填 {months_count} 個月租金"
+        except Exception as e:
+            return False, str(e)
+
+    def get_pending_rents(self):
+        """取得待確認租金"""
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT id, room_number, tenant_name, year, month, actual_amount, status
+                FROM rent_records WHERE status IN ('待確認', '未收')
+                ORDER BY year DESC, month DESC, room_number
+            """)
+
+    def confirm_rent_payment(self, rent_id, paid_date, paid_amount=None):
+        """確認租金已繳"""
+        try:
+            with self._get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    UPDATE rent_records
+                    SET status='已收', paid_date=?, paid_amount=COALESCE(?, actual_amount), updated_at=CURRENT_TIMESTAMP
+                    WHERE id=?
+                """, (paid_date, paid_amount, rent_id))
+                if cur.rowcount == 0:
+                    return False, "❌ 找不到記錄"
+                return True, "✅ 租金已確認"
+        except Exception as e:
+            return False, str(e)
+
+    def confirm_rent_payments(self, rent_ids, paid_date):
+        """批次確認租金已繳（實收金額 = 應收金額）"""
+        ids = [int(i) for i in rent_ids]
+        if not ids:
+            return False, "❌ 未選擇任何租金單"
+        try:
+            with self._get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute(f"""
+                    UPDATE rent_records
+                    SET status='已收', paid_date=?, paid_amount=actual_amount, updated_at=CURRENT_TIMESTAMP
+                    WHERE id IN ({', '.join('?' * len(ids))}) AND status <> '已收'
+                """, (paid_date, *ids))
+                return True, f"✅ 已確認 {cur.rowcount} 筆租金"
+        except Exception as e:
+            return False, str(e)
+
+    def get_rent_summary(self, year: int):
+        """取得租金摘要（讀 monthly_rollup）"""
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT SUM(rent_due), SUM(rent_paid), SUM(rent_unpaid)
+                FROM monthly_rollup WHERE year=?
+            """, (year,))
+            due, paid, unpaid = (float(v or 0) for v in cur.fetchone())
+            return {
+                'total_due': due,
+                'total_paid': paid,
+                'total_unpaid': unpaid,
+                'collection_rate': (paid / due * 100) if due > 0 else 0.0
+            }
+
+    def get_rent_records(self, year=None, after=None, limit=None, columns=None):
+        """取得租金記錄（keyset 分頁，參數同 SupabaseDB）"""
+        columns = self._check_columns("rent_records", columns)
+        where = " WHERE 1=1"
+        params = []
+
+        if year:
+            where += " AND year=?"
+            params.append(year)
+        if after:
+            clause, keys = _keyset_after("year", "month", after)
+            where += clause
+            params += keys
+
+        q = (f"SELECT {_select_list(columns, ('year', 'month', 'room_number'))}"
+             f" FROM rent_records{where} ORDER BY year DESC, month DESC, room_number")
+        if limit:
+            q += " LIMIT ?"
+            params.append(limit)
+
+        with self._get_connection() as conn:
+            return _read_frame(conn, q, params)
+
+    def estimate_rent_records_count(self, year=None) -> int:
+        """租金記錄筆數"""
+        if year:
+            return self._count("SELECT COUNT(*) FROM rent_records WHERE year=?", (year,))
+        return self._count("SELECT COUNT(*) FROM rent_records")
+
+    def get_rent_matrix(self, year: int):
+        """取得租金矩陣"""
+        with self._get_connection() as conn:
+            df = _read_frame(conn, """
+                SELECT room_number, month, status, actual_amount
+                FROM rent_records WHERE year = ?
+                ORDER BY room_number, month
+            """, (year,))
+
+        if df.empty:
+            return pd.DataFrame()
+
+        matrix = {r: {m: "" for m in range(1, 13)} for r in self.get_rooms()}
+        for room, month, status, amount in df.itertuples(index=False):
+            if room in matrix:
+                matrix[room][month] = "✅" if status == '已收' else f"❌ ${int(amount)}"
+
+        res = pd.DataFrame.from_dict(matrix, orient='index')
+        res.columns = [f"{m}月" for m in range(1, 13)]
+        return res
+
+    def get_unpaid_rents(self):
+        """取得未繳租金"""
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT room_number as "房號", tenant_name as "房客", year as "年", month as "月", actual_amount as "金額"
+                FROM rent_records WHERE status IN ('未收', '待確認')
+                ORDER BY year DESC, month DESC
+            """)
+
+    # ==========================
+    # 電費管理 (Electricity)
+    # ==========================
+
+    def add_electricity_period(self, year, ms, me):
+        """新增計費期間"""
+        try:
+            with self._get_connection(invalidates=("periods",)) as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT 1 FROM electricity_period WHERE period_year=? AND period_month_start=? AND period_month_end=?", (year, ms, me))
+                if cur.fetchone():
+                    return True, "✅ 期間已存在", 0
+
+                cur.execute("INSERT INTO electricity_period(period_year, period_month_start, period_month_end) VALUES(?, ?, ?)", (year, ms, me))
+                return True, "✅ 新增成功", cur.lastrowid
+        except Exception as e:
+            return False, str(e), 0
+
+    def get_all_periods(self, columns=None):
+        """取得所有計費期間（columns: 只取這些欄位）"""
+        return self._cached_columns("periods", self._check_columns("electricity_period", columns), self._load_periods)
+
+    def _load_periods(self, columns=None):
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {_select_list(columns)} FROM electricity_period ORDER BY id DESC")
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def delete_electricity_period(self, period_id: int):
+        """刪除計費期間及相關所有紀錄"""
+        try:
+            with self._get_connection(invalidates=("periods",)) as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT id FROM electricity_period WHERE id=?", (period_id,))
+                if not cur.fetchone():
+                    return False, f"❌ 期間 ID {period_id} 不存在"
+
+                for table in ("electricity_payment", "electricity_meter", "electricity_tdy_bill", "electricity_calculation"):
+                    cur.execute(f"DELETE FROM {table} WHERE period_id=?", (period_id,))
+                cur.execute("DELETE FROM electricity_period WHERE id=?", (period_id,))
+
+                logger.info(f"Period {period_id} and all related records deleted")
+                return True, "✅ 計費期間已刪除"
+
+        except Exception as e:
+            logger.error(f"Delete electricity period error: {e}")
+            return False, f"❌ 刪除失敗: {str(e)}"
+
+    def add_tdy_bill(self, pid, floor, kwh, fee):
+        """新增台電單據"""
+        with self._get_connection() as conn:
+            conn.cursor().execute("""
+                INSERT INTO electricity_tdy_bill(period_id, floor_name, tdy_total_kwh, tdy_total_fee)
+                VALUES(?, ?, ?, ?)
+                ON CONFLICT (property_id, period_id, floor_name) DO UPDATE SET
+                tdy_total_kwh=excluded.tdy_total_kwh, tdy_total_fee=excluded.tdy_total_fee
+            """, (pid, floor, kwh, fee))
+
+    def add_meter_reading(self, pid, room, start, end):
+        """新增電表讀數"""
+        with self._get_connection() as conn:
+            conn.cursor().execute("""
+                INSERT INTO electricity_meter(period_id, room_number, meter_start_reading, meter_end_reading, meter_kwh_usage)
+                VALUES(?, ?, ?, ?, ?)
+                ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
+                meter_start_reading=excluded.meter_start_reading, meter_end_reading=excluded.meter_end_reading, meter_kwh_usage=excluded.meter_kwh_usage
+            """, (pid, room, start, end, round(end - start, 2)))
+
+    def get_period_report(self, pid):
+        """取得計費報告"""
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT room_number as "房號", private_kwh as "房間度數", public_kwh as "公用分攤",
+                total_kwh as "總度數", unit_price as "單價", calculated_fee as "應繳電費"
+                FROM electricity_calculation WHERE period_id = ? ORDER BY room_number
+            """, (pid,))
+
+    def save_electricity_record(self, period_id, results):
+        """儲存計費記錄（全部房間的應繳金額）"""
+        try:
+            rows = [(period_id, result.get('房號'), int(result.get('應繳金額', 0))) for result in results]
+            with self._get_connection() as conn:
+                conn.cursor().executemany("""
+                    INSERT INTO electricity_payment(period_id, room_number, calculated_fee, status)
+                    VALUES(?, ?, ?, '未繳')
+                    ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
+                    calculated_fee=excluded.calculated_fee, updated_at=CURRENT_TIMESTAMP
+                """, rows)
+            return True, "✅ 計費記錄已儲存到資料庫"
+        except Exception as e:
+            logger.error(f"Save electricity record error: {e}")
+            return False, f"❌ 儲存失敗: {str(e)}"
+
+    def get_electricity_payment_record(self, period_id):
+        """取得某個計費期間的繳費紀錄（用於「計費結果」Tab）"""
+        try:
+            with self._get_connection() as conn:
+                return _read_frame(conn, """
+                    SELECT
+                        room_number as "房號",
+                        calculated_fee as "應繳金額",
+                        paid_amount as "已繳金額",
+                        status as "繳費狀態",
+                        payment_date as "繳款日期",
+                        notes as "備註",
+                        updated_at as "更新時間"
+                    FROM electricity_payment
+                    WHERE period_id = ?
+                    ORDER BY room_number
+                """, (period_id,))
+        except Exception as e:
+            logger.error(f"Get electricity payment record error: {e}")
+            return pd.DataFrame()
+
+    def update_electricity_payment(self, period_id, room_number, status, paid_amount=None, payment_date=None, notes=""):
+        """更新繳費狀態"""
+        try:
+            with self._get_connection() as conn:
+                conn.cursor().execute("""
+                    UPDATE electricity_payment
+                    SET status=?, paid_amount=?, payment_date=?, notes=?, updated_at=CURRENT_TIMESTAMP
+                    WHERE period_id=? AND room_number=?
+                """, (status, paid_amount or 0, payment_date, notes, period_id, room_number))
+            return True, "✅ 繳費狀態已更新"
+        except Exception as e:
+            logger.error(f"Update electricity payment error: {e}")
+            return False, f"❌ 更新失敗: {str(e)}"
+
+    def get_electricity_payment_summary(self, period_id):
+        """取得某個計費期間的繳費統計"""
+        try:
+            with self._get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT SUM(calculated_fee), SUM(paid_amount),
+                           COUNT(CASE WHEN status='未繳' THEN 1 END),
+                           COUNT(CASE WHEN status='已繳' THEN 1 END),
+                           COUNT(CASE WHEN status='部分繳' THEN 1 END)
+                    FROM electricity_payment WHERE period_id=?
+                """, (period_id,))
+                total_due, total_paid, unpaid_rooms, paid_rooms, partial_rooms = cur.fetchone()
+            total_due, total_paid = float(total_due or 0), float(total_paid or 0)
+            return {
+                'total_due': total_due,
+                'total_paid': total_paid,
+                'total_balance': total_due - total_paid,
+                'paid_rooms': paid_rooms,
+                'unpaid_rooms': unpaid_rooms,
+                'partial_rooms': partial_rooms,
+                'collection_rate': (total_paid / total_due * 100) if total_due > 0 else 0.0
+            }
+        except Exception as e:
+            logger.error(f"Get electricity payment summary error: {e}")
+            return {}
+
+    # ==========================
+    # 支出 (Expenses)
+    # ==========================
+
+    def add_expense(self, date, cat, amt, desc):
+        """新增支出"""
+        try:
+            with self._get_connection() as conn:
+                conn.cursor().execute("""
+                    INSERT INTO expenses(expense_date, category, amount, description)
+                    VALUES(?, ?, ?, ?)
+                """, (date, cat, amt, desc))
+                return True
+        except Exception as e:
+            logger.error(f"Add expense error: {e}")
+            return False
+
+    def get_expenses(self, limit=50, columns=None):
+        """取得支出列表（columns: 只取這些欄位）"""
+        cols = _select_list(self._check_columns("expenses", columns))
+        with self._get_connection() as conn:
+            return _read_frame(conn, f"SELECT {cols} FROM expenses ORDER BY expense_date DESC LIMIT ?", (limit,))
+
+    # ==========================
+    # 報表 (Reports)
+    # ==========================
+
+    def get_monthly_rollup(self, year_from: int, year_to: int = None):
+        """取得每月彙總（year_from ~ year_to）"""
+        with self._get_connection() as conn:
+            return _read_frame(conn, """
+                SELECT * FROM monthly_rollup WHERE year BETWEEN ? AND ?
+                ORDER BY year, month, room_number, category
+            """, (year_from, year_to or year_from))
+
+    def get_pnl(self, year_from: int, year_to: int = None, granularity: str = "month"):
+        """損益表（與 SupabaseDB 相同的 SQL）"""
+        with self._get_connection() as conn:
+            df = _read_frame(conn, pnl_query(granularity, "?"), (year_from - 1, year_to or year_from, year_from))
+        return df if granularity == "month" else df.drop(columns="month")
+
+    # ==========================
+    # 匯出 (Export)
+    # ==========================
+
+    def copy_to_csv(self, query, fileobj, params=None):
+        """
+        將查詢結果（CSV 含標題列）逐段寫入 fileobj
+
+        以 fetchmany 分段讀取，不會整批載入記憶體；NULL 寫成空白欄位（與 COPY 相同）
+        """
+        with self._get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, params or ())
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow([d[0] for d in cur.description])
+            while True:
+                rows = cur.fetchmany(1000)
+                writer.writerows(rows)
+                fileobj.write(buf.getvalue().encode("utf-8"))
+                buf.seek(0)
+                buf.truncate()
+                if not rows:
+                    break
+
+    # ==========================
+    # 批次匯入 (Import)
+    # ==========================
+
+    def bulk_import(self, files, period_id=None):
+        """
+        批次匯入（已驗證的 CSV，不含標題列）
+
+        每個檔案先載入暫存表，再在同一個交易內合併到正式表格；
+        任何一步失敗整批 rollback。新房客的繳費排程以 generate_payment_schedule 產生。
+
+        returns:
+            (ok, msg, counts)
+        """
+        counts = {}
+        try:
+            with self._get_connection(invalidates=("tenants",)) as conn:
+                cur = conn.cursor()
+                if "tenants" in files:
+                    self._copy_staging(cur, "tenants", files["tenants"])
+                    cur.execute("""
+                        INSERT INTO tenants(
+                            room_number, tenant_name, phone, deposit, base_rent,
+                            lease_start, lease_end, payment_method, has_water_fee
+                        )
+                        SELECT s.room_number, s.tenant_name, COALESCE(s.phone, ''), s.deposit, s.base_rent,
+                               s.lease_start, s.lease_end, s.payment_method, s.has_water_fee
+                        FROM import_tenants s
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM tenants t WHERE t.room_number = s.room_number AND t.is_active = 1
+                        )
+                        RETURNING room_number, tenant_name, base_rent, has_water_fee,
+                                  payment_method, lease_start, lease_end
+                    """)
+                    new = cur.fetchall()
+                    counts["tenants"] = len(new)
+                    counts["schedule"] = self._insert_schedule(cur, new)
+
+                if "meters" in files:
+                    self._copy_staging(cur, "meters", files["meters"])
+                    cur.execute("""
+                        INSERT INTO electricity_meter(period_id, room_number, meter_start_reading, meter_end_reading, meter_kwh_usage)
+                        SELECT ?, room_number, meter_start_reading, meter_end_reading,
+                               ROUND(meter_end_reading - meter_start_reading, 2)
+                        FROM import_meters WHERE true
+                        ON CONFLICT (property_id, period_id, room_number) DO UPDATE SET
+                        meter_start_reading=excluded.meter_start_reading, meter_end_reading=excluded.meter_end_reading, meter_kwh_usage=excluded.meter_kwh_usage
+                    """, (period_id,))
+                    counts["meters"] = cur.rowcount
+
+                if "expenses" in files:
+                    self._copy_staging(cur, "expenses", files["expenses"])
+                    cur.execute("""
+                        INSERT INTO expenses(expense_date, category, amount, description)
+                        SELECT expense_date, category, amount, COALESCE(description, '') FROM import_expenses
+                    """)
+                    counts["expenses"] = cur.rowcount
+
+            return True, "✅ 匯入完成", counts
+        except Exception as e:
+            logger.error(f"Bulk import error: {e}")
+            return False, f"❌ 匯入失敗: {str(e)}", {}
+
+    def _copy_staging(self, cur, name, fileobj):
+        """建立暫存表並逐段載入 CSV（空白欄位為 NULL，布林為 0/1）"""
+        columns = IMPORT_COLUMNS[name]
+        booleans = [i for i, col in enumerate(IMPORT_STAGING[name].split(",")) if col.split()[1] == "boolean"]
+        cur.execute(f"DROP TABLE IF EXISTS temp.import_{name}")
+        cur.execute(f"CREATE TEMP TABLE import_{name} ({IMPORT_STAGING[name]})")
+
+        reader = csv.reader(fileobj)
+        insert = f"INSERT INTO import_{name}({', '.join(columns)}) VALUES({', '.join('?' * len(columns))})"
+        batch = []
+        for row in reader:
+            row = [value if value != "" else None for value in row]
+            for i in booleans:
+                row[i] = int(row[i] in ("True", "true", "t", "1")) if row[i] is not None else None
+            batch.append(row)
+            if len(batch) >= 1000:
+                cur.executemany(insert, batch)
+                batch = []
+        if batch:
+            cur.executemany(insert, batch)
+
+    # ==========================
+    # 備忘錄 (Memos)
+    # ==========================
+
+    def get_memos(self, completed=False, columns=None):
+        """取得備忘錄（columns: 只取這些欄位）"""
+        cols = _select_list(self._check_columns("memos", columns))
+        with self._get_connection() as conn:
+            return _read_frame(conn, f"""
+                SELECT {cols} FROM memos
+                WHERE is_completed=?
+                ORDER BY priority DESC, created_at DESC
+            """, (1 if completed else 0,))
+
+    def add_memo(self, text, prio="normal"):
+        """新增備忘錄"""
+        try:
+            with self._get_connection() as conn:
+                conn.cursor().execute("INSERT INTO memos(memo_text, priority) VALUES(?, ?)", (text, prio))
+                return True
+        except Exception as e:
+            logger.error(f"Add memo error: {e}")
+            return False
+
+    def complete_memo(self, mid):
+        """完成備忘錄"""
+        try:
+            with self._get_connection() as conn:
+                conn.cursor().execute("UPDATE memos SET is_completed=1 WHERE id=?", (mid,))
+                return True
+        except Exception as e:
+            logger.error(f"Complete memo error: {e}")
+            return False
@@ -0,0 +1,129 @@
+# tests/test_leases.py
+"""services.leases.lease_status：所有房間一次算完的租約狀態"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.leases import EXPIRING_DAYS, STATUS_COLORS, lease_status
+
+TODAY = date(2026, 3, 1)
+
+
+def _tenants(rows):
+    df = pd.DataFrame(rows, columns=["room_number", "tenant_name", "lease_end", "payment_method"])
+    df["lease_end"] = pd.to_datetime(df["lease_end"])
+    return df
+
+
+def _by_room(result):
+    return {row["room_number"]: row for row in result.to_dict("records")}
+
+
+def test_expired_lease():
+    result = _by_room(lease_status(_tenants([("1A", "王", "2026-02-20", "月繳")]), ["1A"], TODAY))
+    row = result["1A"]
+    assert row["status"] == "expired"
+    assert row["color"] == "red"
+    assert row["days_left"] == -9
+    assert row["status_text"] == "9 天已逾期"
+    assert row["detail_text"] == "月繳"
+
+
+@pytest.mark.parametrize("days, status, color", [
+    (0, "expiring", "orange"),
+    (EXPIRING_DAYS - 1, "expiring", "orange"),
+    (EXPIRING_DAYS, "ok", "green"),
+])
+def test_expiring_soon_boundary(days, status, color):
+    lease_end = pd.Timestamp(TODAY) + pd.Timedelta(days=days)
+    row = _by_room(lease_status(_tenants([("2A", "李", lease_end, "年繳")]), ["2A"], TODAY))["2A"]
+    assert (row["status"], row["color"], row["days_left"]) == (status, color, days)
+    assert row["status_text"] == "李"
+
+
+def test_vacant_rooms_are_listed_once():
+    tenants = _tenants([("1A", "王", "2026-12-31", "月繳")])
+    result = lease_status(tenants, ["1A", "1B", "1C"], TODAY)
+    vacant = result[result["status"] == "vacant"]
+    assert list(vacant["room_number"]) == ["1B", "1C"]
+    assert set(vacant["color"]) == {"gray"}
+    assert set(vacant["status_text"]) == {"空房"}
+    assert set(vacant["detail_text"]) == {""}
+    assert vacant["days_left"].isna().all()
+    assert vacant["lease_end"].isna().all()
+
+
+def test_multiple_leases_in_one_room():
+    tenants = _tenants([
+        ("3A", "甲", "2026-02-01", "月繳"),
+        ("3A", "乙", "2027-02-01", "半年繳"),
+    ])
+    result = lease_status(tenants, ["3A"], TODAY)
+    assert list(result["tenant_name"]) == ["甲", "乙"]
+    assert list(result["status"]) == ["expired", "ok"]
+    # 有房客的房間不會再列為空房
+    assert "vacant" not in set(result["status"])
+
+
+def test_missing_lease_end_and_payment_method():
+    tenants = pd.DataFrame({"room_number": ["4A"], "tenant_name": ["陳"], "lease_end": [None]})
+    row = _by_room(lease_status(tenants, ["4A"], TODAY))["4A"]
+    assert row["status"] == "ok"
+    assert pd.isna(row["days_left"])
+    assert row["detail_text"] == ""
+
+
+def test_no_tenants():
+    tenants = _tenants([])
+    result = lease_status(tenants, ["1A", "1B"], TODAY)
+    assert list(result["status"]) == ["vacant", "vacant"]
+
+
+def _random_portfolio(n_rooms, seed):
+    """n_rooms 個房間、約 85% 有房客；含沒有租約結束日 / 繳費方式的房客與同房多筆租約"""
+    rng = np.random.default_rng(seed)
+    rooms = [f"{i // 100 + 1}-{i % 100:02d}" for i in range(n_rooms)]
+    occupied = [room for room in rooms if rng.random() < 0.85]
+    occupied += list(rng.choice(occupied, n_rooms // 50))
+    n = len(occupied)
+    lease_end = pd.Timestamp(TODAY) + pd.to_timedelta(rng.integers(-365, 365, n), unit="D")
+    tenants = pd.DataFrame({
+        "room_number": occupied,
+        "tenant_name": [f"房客{i}" for i in range(n)],
+        "lease_end": lease_end.where(rng.random(n) > 0.03),
+        "payment_method": pd.Series(rng.choice(["月繳", "半年繳", "年繳"], n)).where(rng.random(n) > 0.03, None),
+    })
+    return tenants, rooms
+
+
+def _reference(tenants, rooms):
+    """逐列計算的租約狀態（與 lease_status 相同的規則），作為大量資料比對的基準"""
+    rows = []
+    for t in tenants.itertuples(index=False):
+        days = None if pd.isna(t.lease_end) else (t.lease_end.date() - TODAY).days
+        if days is not None and days < 0:
+            status = "expired"
+        elif days is not None and days < EXPIRING_DAYS:
+            status = "expiring"
+        else:
+            status = "ok"
+        text = f"{-days} 天已逾期" if status == "expired" else t.tenant_name
+        detail = "" if pd.isna(t.payment_method) else t.payment_method
+        rows.append((t.room_number, t.tenant_name, days, status, STATUS_COLORS[status], text, detail))
+    occupied = set(tenants["room_number"])
+    rows += [(room, None, None, "vacant", "gray", "空房", "") for room in rooms if room not in occupied]
+    return rows
+
+
+@pytest.mark.parametrize("n_rooms, seed", [(1000, 0), (1000, 1), (1500, 2)])
+def test_matches_row_by_row_reference(n_rooms, seed):
+    tenants, rooms = _random_portfolio(n_rooms, seed)
+    result = lease_status(tenants, rooms, TODAY)
+    columns = ["room_number", "tenant_name", "days_left", "status", "color", "status_text", "detail_text"]
+    actual = [
+        tuple(None if pd.isna(v) else v for v in row)
+        for row in result[columns].itertuples(index=False)
+    ]
+    assert actual == _reference(tenants, rooms)
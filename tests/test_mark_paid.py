@@ -0,0 +1,43 @@
+# tests/test_mark_paid.py
+"""
+批次標記繳費：data_editor 清空的實收金額（None / NaN / pd.NA）回傳 (False, msg)，不寫入資料庫
+"""
+import math
+
+import pandas as pd
+import pytest
+
+from services.sqlite_db import SQLiteDB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLiteDB(str(tmp_path / "paid.db"))
+    ok, msg = db.add_tenant("1A", "王", "0912", 10000, 5000, "2026-01-01", "2026-03-31", "月繳")
+    assert ok, msg
+    return db
+
+
+def _schedule(db):
+    return db.get_payment_schedule(room="1A").sort_values("payment_month")
+
+
+@pytest.mark.parametrize("amount", [None, math.nan, pd.NA])
+def test_blank_amount_rejected(db, amount):
+    ids = list(_schedule(db)["id"])
+    ok, msg = db.mark_payments_done_bulk([(ids[0], "2026-01-03", 5000, "現金"), (ids[1], "2026-01-03", amount, None)])
+
+    assert not ok
+    assert "第 2 筆" in msg
+    assert set(_schedule(db)["status"]) == {"未繳"}
+
+
+def test_marks_rows_paid(db):
+    ids = list(_schedule(db)["id"])
+    ok, msg = db.mark_payments_done_bulk([(ids[0], "2026-01-03", 5000, math.nan), (ids[1], "2026-02-03", 4800.5, "少收")])
+
+    assert ok, msg
+    paid = _schedule(db).set_index("id").loc[ids[:2]]
+    assert list(paid["status"]) == ["已繳", "已繳"]
+    assert list(paid["paid_amount"]) == [5000.0, 4800.5]
+    assert list(paid["notes"]) == ["", "少收"]
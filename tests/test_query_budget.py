@@ -0,0 +1,96 @@
+# tests/test_query_budget.py
+"""
+每個 view（含每個分頁）在種子資料的 SQLite 上渲染一次，查詢數不得超過 view 的 QUERY_BUDGET
+
+每個案例都是全新的 backend（清除 st.cache_resource、不執行背景暖機），
+參考資料快取一律從空的開始，結果與測試順序、暖機進度無關。
+RENTAL_QUERY_BUDGET=strict 時 main 超出預算會拋出 QueryBudgetExceeded。
+"""
+import importlib
+import os
+from datetime import date
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from services.backend import RentalBackend
+from services.sqlite_db import SQLiteDB
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+# (選單, view 模組, (lazy_tabs 的 key, 分頁) 或 None, 是否先選好電費期間)
+CASES = [
+    ("📊 儀表板", "dashboard", None, False),
+    ("💵 租金收繳", "rent", ("rent", "單筆預填"), False),
+    ("💵 租金收繳", "rent", ("rent", "批量預填"), False),
+    ("💵 租金收繳", "rent", ("rent", "確認繳費"), False),
+    ("💵 租金收繳", "rent", ("rent", "統計"), False),
+    ("📅 繳費追蹤", "tracking", ("tracking", "🔍 繳費排程查詢"), False),
+    ("📅 繳費追蹤", "tracking", ("tracking", "📝 標記已繳"), False),
+    ("👥 房客管理", "tenants", ("tenants", "📋 房客列表"), False),
+    ("👥 房客管理", "tenants", ("tenants", "➕ 新增房客"), False),
+    ("👥 房客管理", "tenants", ("tenants", "✏️ 編輯房客"), False),
+    ("⚡ 電費管理", "electricity", ("electricity", "📋 計費期間"), False),
+    ("⚡ 電費管理", "electricity", ("electricity", "📊 度數輸入與計算"), True),
+    ("⚡ 電費管理", "electricity", ("electricity", "📈 繳費記錄"), True),
+    ("💰 支出管理", "expenses", None, False),
+    ("📈 損益報表", "reports", None, False),
+    ("⚙️ 系統設置", "settings", None, False),
+]
+
+
+@pytest.fixture(scope="session")
+def seeded_db(tmp_path_factory):
+    """有房客、繳費排程、租金、電費與支出的 SQLite 檔案"""
+    path = str(tmp_path_factory.mktemp("budget") / "rental.db")
+    db = SQLiteDB(path)
+    year = date.today().year
+    for room, name, method in [("1A", "王", "月繳"), ("2A", "李", "半年繳"), ("3B", "陳", "年繳")]:
+        ok, msg = db.add_tenant(room, name, "0912", 10000, 5000, f"{year - 1}-01-01", f"{year + 1}-12-31", method)
+        assert ok, msg
+        ok, msg = db.batch_record_rent(room, name, year, 1, 6, 5000, 100, 0)
+        assert ok, msg
+    ok, msg, period_id = db.add_electricity_period(year, 1, 2)
+    assert ok, msg
+    db.add_tdy_bill(period_id, "2F", 500, 2500)
+    db.add_meter_reading(period_id, "2A", 100, 180)
+    ok, msg = db.save_electricity_record(period_id, [{"房號": "1A", "應繳金額": 300}, {"房號": "2A", "應繳金額": 450}])
+    assert ok, msg
+    assert db.add_expense(f"{year}-01-15", "維修", 1200, "冷氣")
+    assert db.add_memo("繳管理費")
+    return {"path": path, "period_id": period_id}
+
+
+@pytest.fixture
+def cold_app(seeded_db, monkeypatch):
+    """每次都建立新的 backend，快取是空的、不在背景暖機"""
+    monkeypatch.setenv("RENTAL_DB_BACKEND", "sqlite")
+    monkeypatch.setenv("RENTAL_SQLITE_PATH", seeded_db["path"])
+    monkeypatch.setenv("RENTAL_QUERY_BUDGET", "strict")
+    monkeypatch.delenv("RENTAL_MIRROR_PATH", raising=False)
+    monkeypatch.setattr(RentalBackend, "start_warm_up", lambda self, preload_modules=(): None)
+    st.cache_resource.clear()
+    yield lambda: AppTest.from_file(MAIN, default_timeout=60)
+    st.cache_resource.clear()
+
+
+@pytest.mark.parametrize("menu, module, tab, with_period", CASES,
+                         ids=[f"{m}-{t[1] if t else ''}" for _, m, t, _ in CASES])
+def test_view_within_query_budget(cold_app, seeded_db, menu, module, tab, with_period):
+    at = cold_app()
+    at.session_state["menu"] = menu
+    if tab:
+        key, label = tab
+        at.session_state[f"lazy_tab_{key}"] = label
+    if with_period:
+        at.session_state["current_period_id"] = seeded_db["period_id"]
+        at.session_state["current_period_info"] = "測試期間"
+    at.run()
+
+    assert not at.exception, [e.value for e in at.exception]
+    stats = at.session_state["last_query_stats"]
+    assert stats["menu"] == menu
+    budget = importlib.import_module(f"views.{module}").QUERY_BUDGET
+    assert stats["connections"] <= budget["connections"], stats
+    assert stats["statements"] <= budget["statements"], stats
@@ -1,72 +1,93 @@
 # views/dashboard.py
 import streamlit as st
-import pandas as pd
-from datetime import datetime, date, timedelta
-import time
+from datetime import date
 import sys
 from pathlib import Path
 
 # 修正 import 路徑
 sys.path.append(str(Path(__file__).parent.parent))
-from components.cards import display_card, display_room_card
+from components.cards import kpi_grid, room_grid
+from components.refresh import refresh_after_write, show_flash
+from services.leases import lease_status
 
-ALLROOMS = ["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 7, "statements": 7}
+
+# 只取儀表板用到的欄位
+TENANT_COLUMNS = ["room_number", "tenant_name", "lease_end", "payment_method"]
+MEMO_COLUMNS = ["id", "memo_text"]
 
 def render(db):
     """首頁 Dashboard"""
     st.header("📊 租屋系統 - 儀表板")
 
-    tenants = db.get_tenants()
+    rooms = db.get_rooms()
+    tenants = db.get_tenants(columns=TENANT_COLUMNS)
     today = date.today()
+    # 到期警示與房間卡片共用：所有房間的剩餘天數與狀態一次算完
+    leases = lease_status(tenants, rooms.numbers, today)
 
     st.markdown("### 📈 關鍵指標")
-    col1, col2, col3, col4 = st.columns(4)
 
     occupancy = len(tenants)
-    rate = (occupancy / 12 * 100) if occupancy > 0 else 0
+    vacant = int((leases['status'] == "vacant").sum())
+    rate = (occupancy / len(rooms) * 100) if occupancy > 0 and len(rooms) else 0
 
-    with col1:
-        display_card("佔用率", f"{occupancy}", "green")
-    with col2:
-        display_card("佔用百分比", f"{rate:.0f}%", "blue")
-    with col3:
-        display_card("空房數", f"{12 - occupancy}", "red")
-    with col4:
-        display_card("總房間數", "12", "orange")
+    kpi_grid([
+        ("佔用率", f"{occupancy}", "green"),
+        ("佔用百分比", f"{rate:.0f}%", "blue"),
+        ("空房數", f"{vacant}", "red"),
+        ("總房間數", f"{len(rooms)}", "orange"),
+    ])
 
     st.divider()
 
     st.markdown("### ⚠️ 繳費狀態")
-    col1, col2, col3 = st.columns(3)
 
-    overdue = db.get_overdue_payments()
+    # 逾期只需要筆數與帳齡合計，由資料庫彙總，不下載逾期明細
+    arrears = db.get_arrears()
+    overdue = arrears['totals']
     upcoming = db.get_upcoming_payments(7)
     summary = db.get_payment_summary(today.year)
 
-    with col1:
-        display_card("逾期未繳", f"{len(overdue)}", "red" if len(overdue) > 0 else "green")
-    with col2:
-        display_card("7天內應繳", f"{len(upcoming)}", "orange" if len(upcoming) > 0 else "green")
-    with col3:
-        display_card("收款率", f"{summary['collection_rate']:.1f}%", "blue")
+    kpi_grid([
+        ("逾期未繳", f"{overdue['items']}", "red" if overdue['items'] > 0 else "green"),
+        ("7天內應繳", f"{len(upcoming)}", "orange" if len(upcoming) > 0 else "green"),
+        ("收款率", f"{summary['collection_rate']:.1f}%", "blue"),
+    ])
+    if overdue['items']:
+        st.caption(
+            f"共 ${overdue['total']:,.0f}｜0-30 天 ${overdue['days_0_30']:,.0f}｜31-60 天 ${overdue['days_31_60']:,.0f}"
+            f"｜61-90 天 ${overdue['days_61_90']:,.0f}｜90 天以上 ${overdue['days_90_plus']:,.0f}"
+        )
+        with st.expander("依房客"):
+            st.dataframe(
+                arrears['by_tenant'],
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "room_number": "房號",
+                    "tenant_name": "房客",
+                    "items": st.column_config.NumberColumn("筆數", format="%d"),
+                    "days_0_30": st.column_config.NumberColumn("0-30 天", format="$%d"),
+                    "days_31_60": st.column_config.NumberColumn("31-60 天", format="$%d"),
+                    "days_61_90": st.column_config.NumberColumn("61-90 天", format="$%d"),
+                    "days_90_plus": st.column_config.NumberColumn("90 天以上", format="$%d"),
+                    "total": st.column_config.NumberColumn("合計", format="$%d"),
+                },
+            )
 
     st.divider()
 
     st.markdown("### 🏠 租約到期警示")
-    expiringsoon = []
-    expired = []
-
-    if not tenants.empty:
-        for _, t in tenants.iterrows():
-            try:
-                enddate = datetime.strptime(str(t['lease_end']), "%Y-%m-%d").date()
-                daysleft = (enddate - today).days
-                if daysleft < 0:
-                    expired.append((t['room_number'], t['tenant_name'], abs(daysleft), t['lease_end']))
-                elif 0 <= daysleft < 45:
-                    expiringsoon.append((t['room_number'], t['tenant_name'], daysleft, t['lease_end']))
-            except:
-                pass
+    expired = [
+        (t.room_number, t.tenant_name, -t.days_left, f"{t.lease_end:%Y-%m-%d}")
+        for t in leases[leases['status'] == "expired"].itertuples()
+    ]
+    expiringsoon = [
+        (t.room_number, t.tenant_name, t.days_left, f"{t.lease_end:%Y-%m-%d}")
+        for t in leases[leases['status'] == "expiring"].itertuples()
+    ]
 
     if expired:
         st.markdown("#### 🚨 已過期租約")
@@ -89,28 +110,12 @@ def render(db):
 
     st.markdown("### 🏘️ 房間狀態")
     if not tenants.empty:
-        activerooms = tenants.set_index('room_number')
-        cols = st.columns(6)
-
-        for i, room in enumerate(ALLROOMS):
-            with cols[i % 6]:
-                if not activerooms.empty and room in activerooms.index:
-                    t = activerooms.loc[room]
-                    try:
-                        days = (datetime.strptime(str(t['lease_end']), "%Y-%m-%d").date() - today).days
-                        if days < 0:
-                            statuscolor, statustext = "red", f"{abs(days)} 天已逾期"
-                        elif days < 45:
-                            statuscolor, statustext = "orange", t['tenant_name']
-                        else:
-                            statuscolor, statustext = "green", t['tenant_name']
-                        detailtext = t.get('payment_method', '')
-                    except:
-                        statuscolor, statustext, detailtext = "green", t['tenant_name'], t.get('payment_method', '')
-
-                    display_room_card(room, statuscolor, statustext, detailtext)
-                else:
-                    display_room_card(room, "gray", "空房", "")
+        # 同一房間有多位房客時卡片顯示第一位；每棟的房間卡片是同一個元素
+        cards = leases.drop_duplicates('room_number').set_index('room_number')
+        for building, numbers in rooms.by_building.items():
+            if len(rooms.by_building) > 1:
+                st.markdown(f"#### 🏢 {building or '未分棟'}")
+            room_grid(cards.loc[numbers].reset_index())
     else:
         st.info("📭 目前沒有房客資訊")
 
@@ -132,34 +137,7 @@ def render(db):
 
     # ===== 備忘錄區塊（✨ 新增功能）=====
     with colmemo:
-        st.markdown("#### 📝 代辦備忘錄")
-        memos = db.get_memos(completed=False)
-
-        if not memos.empty:
-            for _, memo in memos.iterrows():
-                c1, c2 = st.columns([5, 1])
-                c1.write(f"• {memo['memo_text']}")
-                if c2.button("✅", key=f"m{memo['id']}"):
-                    db.complete_memo(memo['id'])
-                    st.rerun()
-        else:
-            st.caption("目前沒有待辦事項 ✅")
-
-        # ✨ 新增：輸入新備忘錄功能
-        st.markdown("---")
-        with st.form("new_memo"):
-            new_memo_text = st.text_input(
-                "📝 新增待辦",
-                placeholder="例如：清洗冷氣 4A、檢查熱水器..."
-            )
-            if st.form_submit_button("➕ 新增", use_container_width=True):
-                if new_memo_text.strip():
-                    db.add_memo(new_memo_text)
-                    st.toast("✅ 已新增待辦事項", icon="📝")
-                    time.sleep(0.5)
-                    st.rerun()
-                else:
-                    st.warning("⚠️ 請輸入待辦內容")
+        memo_section(db)
 
     # ===== 未繳租金區塊 =====
     with colunpaid:
@@ -169,3 +147,34 @@ def render(db):
             st.dataframe(unpaid, use_container_width=True, hide_index=True)
         else:
             st.caption("所有租金已收齊 ✅")
+
+@st.fragment
+def memo_section(db):
+    """備忘錄區塊：新增 / 完成後只重跑這個 fragment"""
+    show_flash()
+    st.markdown("#### 📝 代辦備忘錄")
+    memos = db.get_memos(completed=False, columns=MEMO_COLUMNS)
+
+    if not memos.empty:
+        for _, memo in memos.iterrows():
+            c1, c2 = st.columns([5, 1])
+            c1.write(f"• {memo['memo_text']}")
+            if c2.button("✅", key=f"m{memo['id']}"):
+                if db.complete_memo(memo['id']):
+                    refresh_after_write("已完成待辦事項")
+    else:
+        st.caption("目前沒有待辦事項 ✅")
+
+    # ✨ 新增：輸入新備忘錄功能
+    st.markdown("---")
+    with st.form("new_memo"):
+        new_memo_text = st.text_input(
+            "📝 新增待辦",
+            placeholder="例如：清洗冷氣 4A、檢查熱水器..."
+        )
+        if st.form_submit_button("➕ 新增", use_container_width=True):
+            if new_memo_text.strip():
+                db.add_memo(new_memo_text)
+                refresh_after_write("✅ 已新增待辦事項", icon="📝")
+            else:
+                st.warning("⚠️ 請輸入待辦內容")
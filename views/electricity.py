@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 from datetime import datetime
-import time
+from components.tabs import lazy_tabs
+from components.refresh import refresh_after_write, show_flash
 
-ROOM_NUMBERS = ["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
-SHARING_ROOMS = ["2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 2, "statements": 6}
+
+# 計費期間只取用到的欄位
+PERIOD_COLUMNS = ["id", "period_year", "period_month_start", "period_month_end"]
 
 def render(db):
     st.header("⚡ 電費管理")
@@ -30,16 +33,16 @@ def render(db):
             "unit_price": 0,
             "meter_data": {},
             "public_kwh": 0,
-            "public_per_room": 0,
+            "public_per_room": {},
             "notes": "",
             "results": None
         }
     
     # 三個 Tab
-    tab1, tab2, tab3 = st.tabs(["📋 計費期間", "📊 度數輸入與計算", "📈 繳費記錄"])
+    tab = lazy_tabs(["📋 計費期間", "📊 度數輸入與計算", "📈 繳費記錄"], key="electricity")
     
     # ===== TAB 1: 計費期間設定 =====
-    with tab1:
+    if tab == "📋 計費期間":
         st.subheader("📋 計費期間設定")
         st.markdown("新增或選擇計費期間")
         
@@ -69,17 +72,13 @@ def render(db):
                                 if ok:
                                     st.session_state.current_period_id = period_id
                                     st.session_state.current_period_info = f"{year}年 {month_start}-{month_end}月"
-                                    st.success(f"✅ {msg}")
-                                    time.sleep(1)
-                                    st.rerun()
+                                    refresh_after_write(f"✅ {msg}")
                                 else:
                                     st.error(f"❌ {msg}")
                             except AttributeError:
                                 st.session_state.current_period_id = hash((year, month_start, month_end)) % 100000
                                 st.session_state.current_period_info = f"{year}年 {month_start}-{month_end}月"
-                                st.success(f"✅ 計費期間已建立（本機模式）")
-                                time.sleep(1)
-                                st.rerun()
+                                refresh_after_write("✅ 計費期間已建立（本機模式）")
                         except Exception as e:
                             st.error(f"❌ 建立失敗: {str(e)}")
         
@@ -87,7 +86,7 @@ def render(db):
         else:
             period_id = st.session_state.edit_period_id
             try:
-                periods = db.get_all_periods()
+                periods = db.get_all_periods(columns=PERIOD_COLUMNS)
                 edit_period = None
                 for p in periods:
                     if p['id'] == period_id:
@@ -114,10 +113,8 @@ def render(db):
                         
                         if submit:
                             try:
-                                st.success("✅ 期間已更新")
-                                time.sleep(1)
                                 st.session_state.edit_period_id = None
-                                st.rerun()
+                                refresh_after_write("✅ 期間已更新")
                             except Exception as e:
                                 st.error(f"❌ 更新失敗: {str(e)}")
                         
@@ -146,12 +143,10 @@ def render(db):
                                     except:
                                         pass  # 方法不存在，忽略
                                     
-                                    st.success("✅ 期間已刪除")
-                                    time.sleep(1)
                                     st.session_state.edit_period_id = None
                                     st.session_state.confirm_delete = False
                                     st.session_state.current_period_id = None
-                                    st.rerun()
+                                    refresh_after_write("✅ 期間已刪除")
                                 except Exception as e:
                                     st.error(f"❌ 刪除失敗: {str(e)}")
                         
@@ -176,7 +171,7 @@ def render(db):
         st.subheader("📚 已建立的計費期間")
         
         try:
-            periods = db.get_all_periods()
+            periods = db.get_all_periods(columns=PERIOD_COLUMNS)
             if periods:
                 for period in periods:
                     with st.container(border=True):
@@ -206,7 +201,7 @@ def render(db):
             st.error(f"❌ 讀取失敗: {str(e)}")
     
     # ===== TAB 2: 度數輸入與計算 =====
-    with tab2:
+    elif tab == "📊 度數輸入與計算":
         st.subheader("📊 度數輸入與計算")
         
         if not st.session_state.current_period_id:
@@ -214,6 +209,9 @@ def render(db):
         else:
             st.info(f"📌 目前期間: {st.session_state.current_period_info}")
             
+            # 房間、樓層與分攤群組都來自 rooms 資料表
+            rooms = db.get_rooms()
+            
             if st.session_state.calc_state["step"] == 1:
                 # 度數輸入表單
                 st.markdown("##### 輸入各樓層台電單據與全部房間度數")
@@ -241,11 +239,17 @@ def render(db):
                     total_fee = 0
                     total_kwh = 0
                     
-                    for floor_name, floor_key in [("2樓", "2F"), ("3樓", "3F"), ("4樓", "4F")]:
+                    # 有分攤房間的樓層才有台電單據（獨享電表的房間直接以單位電價計費）
+                    tdy_floors = []
+                    for group in rooms.sharing_groups:
+                        tdy_floors += [f for f in rooms.group_floors(group) if f not in tdy_floors]
+                    
+                    for building, floor in tdy_floors:
+                        floor_name, floor_key = rooms.floor_label(building, floor), rooms.floor_key(building, floor)
                         cols = st.columns([1, 2, 2])
                         cols[0].write(floor_name)
-                        fee = cols[1].number_input(f"金額", min_value=0, step=100, key=f"fee_{floor_key}")
-                        kwh = cols[2].number_input(f"度數", min_value=0.0, step=1.0, key=f"kwh_{floor_key}")
+                        fee = cols[1].number_input("金額", min_value=0, step=100, key=f"fee_{floor_key}")
+                        kwh = cols[2].number_input("度數", min_value=0.0, step=1.0, key=f"kwh_{floor_key}")
                         
                         if fee > 0 and kwh > 0:
                             tdy_data[floor_key] = (fee, kwh)
@@ -270,11 +274,11 @@ def render(db):
                     
                     # 用 columns 方式展示，每行 4 個房間
                     col_rooms = st.columns(4)
-                    for i, room in enumerate(ROOM_NUMBERS):
+                    for i, room in enumerate(rooms):
                         with col_rooms[i % 4]:
                             st.markdown(f"**{room}**")
-                            start = st.number_input(f"上期", min_value=0.0, step=1.0, key=f"start_{room}", label_visibility="collapsed")
-                            end = st.number_input(f"本期", min_value=0.0, step=1.0, key=f"end_{room}", label_visibility="collapsed")
+                            start = st.number_input("上期", min_value=0.0, step=1.0, key=f"start_{room}", label_visibility="collapsed")
+                            end = st.number_input("本期", min_value=0.0, step=1.0, key=f"end_{room}", label_visibility="collapsed")
                             meter_data[room] = (start, end)
                     
                     st.divider()
@@ -293,25 +297,35 @@ def render(db):
                         
                         # 驗證房間抄表
                         valid_rooms = 0
-                        total_meter_kwh = 0
-                        for room in SHARING_ROOMS:
-                            start, end = meter_data[room]
-                            if end > start:
-                                usage = round(end - start, 2)
-                                valid_rooms += 1
-                                total_meter_kwh += usage
+                        group_meter_kwh = {}
+                        for group, members in rooms.sharing_groups.items():
+                            group_meter_kwh[group] = 0
+                            for room in members:
+                                start, end = meter_data[room]
+                                if end > start:
+                                    usage = round(end - start, 2)
+                                    valid_rooms += 1
+                                    group_meter_kwh[group] += usage
                         
                         if valid_rooms == 0:
                             st.error("❌ 沒有有效的分攤房間度數")
                             st.stop()
                         
-                        # 計算公用電
-                        public_kwh = round(total_kwh - total_meter_kwh, 2)
-                        if public_kwh < 0:
-                            st.error("❌ 計算錯誤：房間總度數超過台電總度數")
-                            st.stop()
-                        
-                        public_per_room = round(public_kwh / len(SHARING_ROOMS), 2)
+                        # 計算公用電：每個分攤群組以自己樓層的台電度數扣掉房間度數，由群組內的房間平分
+                        public_kwh = 0
+                        public_per_room = {}
+                        for group, members in rooms.sharing_groups.items():
+                            group_kwh = sum(
+                                tdy_data[key][1] for key in (rooms.floor_key(*f) for f in rooms.group_floors(group))
+                                if key in tdy_data
+                            )
+                            group_public = round(group_kwh - group_meter_kwh[group], 2)
+                            if group_public < 0:
+                                label = "" if len(rooms.sharing_groups) == 1 else f"（{group}）"
+                                st.error(f"❌ 計算錯誤：房間總度數超過台電總度數{label}")
+                                st.stop()
+                            public_kwh = round(public_kwh + group_public, 2)
+                            public_per_room[group] = round(group_public / len(members), 2)
                         
                         # 儲存到 session state
                         st.session_state.calc_state["step"] = 2
@@ -325,9 +339,7 @@ def render(db):
                         st.session_state.calc_state["public_per_room"] = public_per_room
                         st.session_state.calc_state["notes"] = notes
                         
-                        st.success("✅ 計算完成！")
-                        time.sleep(1)
-                        st.rerun()
+                        refresh_after_write("✅ 計算完成！")
             
             else:
                 # 計算結果顯示
@@ -357,8 +369,10 @@ def render(db):
                 
                 calc_results = []
                 
-                # 獨享房間 (1A, 1B)
-                for room in ["1A", "1B"]:
+                # 獨享房間（沒有分攤群組）
+                for room in rooms:
+                    if rooms.sharing_group(room) is not None or room not in meter_data:
+                        continue
                     start, end = meter_data[room]
                     if end > start:
                         usage = round(end - start, 2)
@@ -372,18 +386,21 @@ def render(db):
                             "應繳金額": int(fee)
                         })
                 
-                # 分攤房間 (2A, 2B, 3A, 3B, 3C, 3D, 4A, 4B, 4C, 4D)
-                for room in SHARING_ROOMS:
+                # 分攤房間：加上所屬群組的公用分攤
+                for room in rooms:
+                    group = rooms.sharing_group(room)
+                    if group is None or room not in meter_data or group not in public_per_room:
+                        continue
                     start, end = meter_data[room]
                     if end > start:
                         usage = round(end - start, 2)
-                        total_usage = round(usage + public_per_room, 2)
+                        total_usage = round(usage + public_per_room[group], 2)
                         fee = round(total_usage * unit_price, 0)
                         calc_results.append({
                             "房號": room,
                             "類型": "分攤",
                             "使用度數": usage,
-                            "公用分攤": public_per_room,
+                            "公用分攤": public_per_room[group],
                             "總度數": total_usage,
                             "應繳金額": int(fee)
                         })
@@ -420,7 +437,6 @@ def render(db):
                             if ok:
                                 st.session_state.calc_state["results"] = calc_results
                                 st.success("✅ 計費記錄已儲存到資料庫\n\n切換到「繳費記錄」Tab 即可管理繳費狀態")
-                                time.sleep(2)
                             else:
                                 st.error(f"❌ {msg}")
                         except Exception as e:
@@ -436,118 +452,122 @@ def render(db):
                     st.info(f"📝 備註: {notes}")
     
     # ===== TAB 3: 繳費記錄管理 =====
-    with tab3:
-        st.subheader("📈 電費繳費記錄")
+    elif tab == "📈 繳費記錄":
+        payment_section(db)
+
+@st.fragment
+def payment_section(db):
+    """繳費狀態表與標記表單：標記後只重跑這個 fragment"""
+    show_flash()
+    st.subheader("📈 電費繳費記錄")
+    
+    if not st.session_state.current_period_id:
+        st.warning("⚠️ 請先在「計費期間」選擇或建立一個期間")
+    else:
+        st.info(f"📌 目前期間: {st.session_state.current_period_info}")
         
-        if not st.session_state.current_period_id:
-            st.warning("⚠️ 請先在「計費期間」選擇或建立一個期間")
-        else:
-            st.info(f"📌 目前期間: {st.session_state.current_period_info}")
-            
-            st.markdown("##### 📋 房間繳費狀態與記錄")
-            st.divider()
+        st.markdown("##### 📋 房間繳費狀態與記錄")
+        st.divider()
+        
+        try:
+            # 取得繳費紀錄
+            payment_df = db.get_electricity_payment_record(st.session_state.current_period_id)
             
-            try:
-                # 取得繳費紀錄
-                payment_df = db.get_electricity_payment_record(st.session_state.current_period_id)
+            if payment_df.empty:
+                st.info("📭 此期間尚無計費記錄\n\n**請先在「度數輸入與計算」進行計算並儲存**")
+            else:
+                # 顯示繳費表格
+                st.markdown("**所有房間的繳費狀態：**")
+                st.dataframe(
+                    payment_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "房號": st.column_config.TextColumn("房號", width=80),
+                        "應繳金額": st.column_config.NumberColumn("應繳金額", format="NT$ %d", width=100),
+                        "已繳金額": st.column_config.NumberColumn("已繳金額", format="NT$ %d", width=100),
+                        "繳費狀態": st.column_config.TextColumn("繳費狀態", width=100),
+                        "繳款日期": st.column_config.DateColumn("繳款日期", format="YYYY-MM-DD", width=100),
+                        "備註": st.column_config.TextColumn("備註", width=150),
+                        "更新時間": st.column_config.DatetimeColumn("更新時間", format="YYYY-MM-DD HH:mm", width=120)
+                    }
+                )
                 
-                if payment_df.empty:
-                    st.info("📭 此期間尚無計費記錄\n\n**請先在「度數輸入與計算」進行計算並儲存**")
-                else:
-                    # 顯示繳費表格
-                    st.markdown("**所有房間的繳費狀態：**")
-                    st.dataframe(
-                        payment_df,
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            "房號": st.column_config.TextColumn("房號", width=80),
-                            "應繳金額": st.column_config.NumberColumn("應繳金額", format="NT$ %d", width=100),
-                            "已繳金額": st.column_config.NumberColumn("已繳金額", format="NT$ %d", width=100),
-                            "繳費狀態": st.column_config.TextColumn("繳費狀態", width=100),
-                            "繳款日期": st.column_config.TextColumn("繳款日期", width=100),
-                            "備註": st.column_config.TextColumn("備註", width=150),
-                            "更新時間": st.column_config.TextColumn("更新時間", width=120)
-                        }
-                    )
+                st.divider()
+                
+                # === 更新繳費狀態 ===
+                st.markdown("##### ✏️ 標記房間繳費狀態")
+                
+                with st.form("update_payment_form", border=True):
+                    c1, c2, c3 = st.columns(3)
                     
-                    st.divider()
+                    with c1:
+                        payment_room = st.selectbox(
+                            "選擇房號",
+                            payment_df['房號'].tolist(),
+                            key="update_payment_room"
+                        )
                     
-                    # === 更新繳費狀態 ===
-                    st.markdown("##### ✏️ 標記房間繳費狀態")
+                    with c2:
+                        payment_status = st.selectbox(
+                            "繳費狀態",
+                            ["未繳", "已繳", "部分繳"],
+                            key="update_payment_status"
+                        )
                     
-                    with st.form("update_payment_form", border=True):
-                        c1, c2, c3 = st.columns(3)
-                        
-                        with c1:
-                            payment_room = st.selectbox(
-                                "選擇房號",
-                                payment_df['房號'].unique(),
-                                key="update_payment_room"
-                            )
-                        
-                        with c2:
-                            payment_status = st.selectbox(
-                                "繳費狀態",
-                                ["未繳", "已繳", "部分繳"],
-                                key="update_payment_status"
+                    with c3:
+                        payment_date = st.date_input("繳款日期", key="update_payment_date")
+                    
+                    # 已繳金額
+                    paid_amt_col1, paid_amt_col2 = st.columns(2)
+                    with paid_amt_col1:
+                        paid_amount = st.number_input("已繳金額 (NT$)", min_value=0, step=100, key="update_paid_amount")
+                    with paid_amt_col2:
+                        notes = st.text_input("繳費備註", key="update_notes")
+                    
+                    submit_payment = st.form_submit_button("✅ 標記繳費", type="primary", use_container_width=True)
+                    
+                    if submit_payment:
+                        try:
+                            ok, msg = db.update_electricity_payment(
+                                st.session_state.current_period_id,
+                                payment_room,
+                                payment_status,
+                                paid_amount=paid_amount if payment_status != "未繳" else 0,
+                                payment_date=payment_date.strftime("%Y-%m-%d") if payment_status != "未繳" else None,
+                                notes=notes
                             )
-                        
-                        with c3:
-                            payment_date = st.date_input("繳款日期", key="update_payment_date")
-                        
-                        # 已繳金額
-                        paid_amt_col1, paid_amt_col2 = st.columns(2)
-                        with paid_amt_col1:
-                            paid_amount = st.number_input("已繳金額 (NT$)", min_value=0, step=100, key="update_paid_amount")
-                        with paid_amt_col2:
-                            notes = st.text_input("繳費備註", key="update_notes")
-                        
-                        submit_payment = st.form_submit_button("✅ 標記繳費", type="primary", use_container_width=True)
-                        
-                        if submit_payment:
-                            try:
-                                ok, msg = db.update_electricity_payment(
-                                    st.session_state.current_period_id,
-                                    payment_room,
-                                    payment_status,
-                                    paid_amount=paid_amount if payment_status != "未繳" else 0,
-                                    payment_date=payment_date.strftime("%Y-%m-%d") if payment_status != "未繳" else None,
-                                    notes=notes
-                                )
-                                
-                                if ok:
-                                    st.success(f"✅ {payment_room} 已標記為 {payment_status}")
-                                    time.sleep(1)
-                                    st.rerun()
-                                else:
-                                    st.error(f"❌ {msg}")
-                            except Exception as e:
-                                st.error(f"❌ 標記失敗: {str(e)}")
+                            
+                            if ok:
+                                refresh_after_write(f"✅ {payment_room} 已標記為 {payment_status}")
+                            else:
+                                st.error(f"❌ {msg}")
+                        except Exception as e:
+                            st.error(f"❌ 標記失敗: {str(e)}")
+                
+                st.divider()
+                
+                # === 繳費統計 ===
+                st.markdown("##### 📊 繳費統計")
+                try:
+                    summary = db.get_electricity_payment_summary(st.session_state.current_period_id)
                     
-                    st.divider()
+                    col1, col2, col3, col4, col5 = st.columns(5)
+                    with col1:
+                        st.metric("應收總額", f"NT$ {int(summary['total_due']):,}")
+                    with col2:
+                        st.metric("已繳總額", f"NT$ {int(summary['total_paid']):,}")
+                    with col3:
+                        st.metric("未繳餘額", f"NT$ {int(summary['total_balance']):,}")
+                    with col4:
+                        st.metric("已繳房間", f"{summary['paid_rooms']} 間")
+                    with col5:
+                        st.metric("未繳房間", f"{summary['unpaid_rooms']} 間", delta_color="inverse")
                     
-                    # === 繳費統計 ===
-                    st.markdown("##### 📊 繳費統計")
-                    try:
-                        summary = db.get_electricity_payment_summary(st.session_state.current_period_id)
-                        
-                        col1, col2, col3, col4, col5 = st.columns(5)
-                        with col1:
-                            st.metric("應收總額", f"NT$ {int(summary['total_due']):,}")
-                        with col2:
-                            st.metric("已繳總額", f"NT$ {int(summary['total_paid']):,}")
-                        with col3:
-                            st.metric("未繳餘額", f"NT$ {int(summary['total_balance']):,}")
-                        with col4:
-                            st.metric("已繳房間", f"{summary['paid_rooms']} 間")
-                        with col5:
-                            st.metric("未繳房間", f"{summary['unpaid_rooms']} 間", delta_color="inverse")
-                        
-                        # 繳款率
-                        st.progress(min(summary['collection_rate'] / 100, 1.0), text=f"繳款率: {summary['collection_rate']:.1f}%")
-                    except Exception as e:
-                        st.warning(f"⚠️ 無法計算統計: {str(e)}")
-            
-            except Exception as e:
-                st.error(f"❌ 讀取繳費記錄失敗: {str(e)}")
+                    # 繳款率
+                    st.progress(min(summary['collection_rate'] / 100, 1.0), text=f"繳款率: {summary['collection_rate']:.1f}%")
+                except Exception as e:
+                    st.warning(f"⚠️ 無法計算統計: {str(e)}")
+        
+        except Exception as e:
+            st.error(f"❌ 讀取繳費記錄失敗: {str(e)}")
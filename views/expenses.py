@@ -1,13 +1,25 @@
 import streamlit as st
-import time
 from datetime import date
 from components.cards import section_header
+from components.refresh import refresh_after_write, show_flash
 
 EXPENSE_CATEGORIES = ["維修", "雜項", "貸款", "水電費", "網路費"]
 
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 1, "statements": 1}
+
+# 支出清單只取畫面上的欄位
+EXPENSE_COLUMNS = ["expense_date", "category", "amount", "description"]
+
 def render(db):
     section_header("💰 支出管理", "Expense Tracking")
     
+    expense_section(db)
+
+@st.fragment
+def expense_section(db):
+    """新增表單與支出清單：儲存後只重跑這個 fragment"""
+    show_flash()
     col_form, col_list = st.columns([1, 2])
     
     with col_form:
@@ -21,26 +33,24 @@ def render(db):
                 
                 if st.form_submit_button("💾 儲存紀錄", type="primary"):
                     if db.add_expense(d.strftime("%Y-%m-%d"), cat, amt, desc):
-                        st.toast("已儲存", icon="✅")
-                        time.sleep(0.5)
-                        st.rerun()
+                        refresh_after_write("已儲存")
                     else:
                         st.error("儲存失敗")
 
     with col_list:
         st.subheader("最近 50 筆支出")
-        df = db.get_expenses(limit=50)
+        df = db.get_expenses(limit=50, columns=EXPENSE_COLUMNS)
         if not df.empty:
             st.dataframe(
                 df, 
                 use_container_width=True, 
                 hide_index=True,
                 column_config={
-                    "expense_date": "日期",
+                    "expense_date": st.column_config.DateColumn("日期", format="YYYY-MM-DD"),
                     "category": "分類",
                     "amount": st.column_config.NumberColumn("金額", format="$%d"),
                     "description": "說明"
                 }
             )
         else:
-            st.info("暫無支出紀錄")
\ No newline at end of file
+            st.info("暫無支出紀錄")
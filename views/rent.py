@@ -1,19 +1,31 @@
 import streamlit as st
-import time
 from datetime import datetime, date
 from components.cards import section_header
+from components.tabs import lazy_tabs
+from components.refresh import refresh_after_write, show_flash
+from components.pager import keyset_pager
 
 WATER_FEE = 100
 
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 3, "statements": 3}
+
+PAGE_SIZE = 50
+
+# 各分頁只取用到的欄位
+TENANT_COLUMNS = ["room_number", "tenant_name", "base_rent", "has_water_fee", "payment_method"]
+RECORD_COLUMNS = ["room_number", "tenant_name", "year", "month", "actual_amount",
+                  "paid_amount", "status", "paid_date", "notes"]
+
 def render(db):
     section_header("💵 租金收繳", "Rent Collection")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["單筆預填", "批量預填", "確認繳費", "統計"])
+    tab = lazy_tabs(["單筆預填", "批量預填", "確認繳費", "統計"], key="rent")
     
     # --- 單筆預填 ---
-    with tab1:
+    if tab == "單筆預填":
         st.markdown("##### 📌 單筆租金預填")
-        tenants = db.get_tenants()
+        tenants = db.get_tenants(columns=TENANT_COLUMNS)
         if tenants.empty:
             st.warning("暫無房客資料，請先至房客管理新增。")
         else:
@@ -44,12 +56,13 @@ def render(db):
                 
                 if st.button("建立應收單", type="primary", use_container_width=True):
                     ok, msg = db.batch_record_rent(room, t_data['tenant_name'], year, month, 1, new_base, new_water, new_discount, t_data['payment_method'], notes)
-                    if ok: st.toast(msg, icon="✅"); time.sleep(1); st.rerun()
+                    if ok: refresh_after_write(msg)
                     else: st.toast(msg, icon="❌")
 
     # --- 批量預填 ---
-    with tab2:
+    elif tab == "批量預填":
         st.markdown("##### 📚 批量租金預填")
+        tenants = db.get_tenants(columns=TENANT_COLUMNS)
         if tenants.empty:
             st.warning("暫無房客")
         else:
@@ -76,31 +89,15 @@ def render(db):
                         base, water, 0, 
                         t_data_batch['payment_method'], "批量建立"
                     )
-                    if ok: st.toast(msg, icon="✅"); time.sleep(1); st.rerun()
+                    if ok: refresh_after_write(msg)
                     else: st.toast(msg, icon="❌")
 
     # --- 確認繳費 ---
-    with tab3:
-        st.markdown("##### ✅ 確認繳費")
-        pending = db.get_pending_rents()
-        if pending.empty:
-            st.info("目前無待確認的租金單")
-        else:
-            # 篩選掉已收的 (雖然 SQL 已經篩選了)
-            pending_only = pending[pending['status'] != '已收']
-            
-            for _, row in pending_only.iterrows():
-                with st.container(border=True):
-                    cols = st.columns([2, 1, 1, 1])
-                    cols[0].write(f"**{row['room_number']}** {row['tenant_name']}")
-                    cols[1].write(f"{row['year']}年{row['month']}月")
-                    cols[2].write(f"**${row['actual_amount']:,.0f}**")
-                    if cols[3].button("確認收款", key=f"pay_{row['id']}"):
-                        ok, msg = db.confirm_rent_payment(row['id'], date.today().strftime("%Y-%m-%d"), row['actual_amount'])
-                        if ok: st.toast(msg, icon="✅"); time.sleep(0.5); st.rerun()
+    elif tab == "確認繳費":
+        pending_section(db)
 
     # --- 統計 ---
-    with tab4:
+    elif tab == "統計":
         st.markdown("##### 📊 年度統計")
         y_stat = st.number_input("統計年份", value=datetime.now().year, key="stat_y")
         summary = db.get_rent_summary(y_stat)
@@ -110,4 +107,55 @@ def render(db):
         sc2.metric("已收總額", f"${summary['total_paid']:,.0f}")
         sc3.metric("未收餘額", f"${summary['total_unpaid']:,.0f}", delta_color="inverse")
         
-        st.dataframe(db.get_rent_records(year=y_stat), use_container_width=True)
\ No newline at end of file
+        records = keyset_pager(
+            f"rent_records_{y_stat}",
+            lambda after, limit: db.get_rent_records(year=y_stat, after=after, limit=limit, columns=RECORD_COLUMNS),
+            lambda row: (int(row['year']), int(row['month']), row['room_number']),
+            page_size=PAGE_SIZE,
+            total=db.estimate_rent_records_count(y_stat),
+        )
+        st.dataframe(records, use_container_width=True)
+
+@st.fragment
+def pending_section(db):
+    """待確認租金清單：確認後只重跑這個 fragment"""
+    show_flash()
+    st.markdown("##### ✅ 確認繳費")
+    pending = db.get_pending_rents()
+    if pending.empty:
+        st.info("目前無待確認的租金單")
+    else:
+        # 篩選掉已收的 (雖然 SQL 已經篩選了)
+        pending_only = pending[pending['status'] != '已收'].copy()
+        pending_only.insert(0, "confirm", False)
+        
+        # 一張可勾選的表格 + 一次送出，取代每列一個按鈕
+        with st.form("confirm_rents_form", border=True):
+            edited = st.data_editor(
+                pending_only,
+                use_container_width=True,
+                hide_index=True,
+                column_order=["confirm", "room_number", "tenant_name", "year", "month", "actual_amount", "status"],
+                column_config={
+                    "confirm": st.column_config.CheckboxColumn("確認", default=False),
+                    "room_number": "房號",
+                    "tenant_name": "房客",
+                    "year": st.column_config.NumberColumn("年", format="%d"),
+                    "month": st.column_config.NumberColumn("月", format="%d"),
+                    "actual_amount": st.column_config.NumberColumn("應收金額", format="$%d"),
+                    "status": "狀態",
+                },
+                disabled=["room_number", "tenant_name", "year", "month", "actual_amount", "status"],
+                key="pending_rents_editor",
+            )
+            c1, c2 = st.columns(2)
+            paid_d = c1.date_input("繳費日期", value=date.today())
+            select_all = c2.checkbox(f"全部確認（{len(pending_only)} 筆）")
+            
+            if st.form_submit_button("✅ 確認收款", type="primary", use_container_width=True):
+                ids = pending_only['id'] if select_all else edited.loc[edited['confirm'], 'id']
+                ok, msg = db.confirm_rent_payments(ids.tolist(), paid_d.strftime("%Y-%m-%d"))
+                if ok:
+                    refresh_after_write(msg)
+                else:
+                    st.toast(msg, icon="❌")
\ No newline at end of file
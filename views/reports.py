@@ -0,0 +1,63 @@
+# views/reports.py
+import streamlit as st
+from datetime import date
+from components.cards import section_header
+
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 1, "statements": 1}
+
+GRANULARITIES = {"每月": "month", "每年": "year"}
+
+def render(db):
+    section_header("📈 損益報表", "Profit & Loss")
+
+    this_year = date.today().year
+    c1, c2, c3 = st.columns(3)
+    y_from = c1.number_input("起始年份", value=this_year - 1, step=1, key="pnl_from")
+    y_to = c2.number_input("結束年份", value=this_year, step=1, key="pnl_to")
+    granularity = GRANULARITIES[c3.radio("彙總", list(GRANULARITIES), horizontal=True, key="pnl_granularity")]
+
+    if y_from > y_to:
+        st.warning("起始年份不可晚於結束年份")
+        return
+
+    # 收入 / 支出 / 累計與年增減都在資料庫算好（monthly_rollup），這裡只負責呈現
+    pnl = db.get_pnl(int(y_from), int(y_to), granularity)
+    if pnl.empty:
+        st.info("此區間沒有收支資料")
+        return
+
+    income = pnl['rent_income'].sum() + pnl['electricity_income'].sum()
+    m1, m2, m3 = st.columns(3)
+    m1.metric("總收入", f"${income:,.0f}")
+    m2.metric("總支出", f"${pnl['expenses'].sum():,.0f}")
+    m3.metric("淨利", f"${pnl['net_income'].sum():,.0f}")
+
+    if granularity == "month":
+        pnl.insert(0, "period", pnl['year'].astype(str) + "-" + pnl['month'].map("{:02d}".format))
+    else:
+        pnl.insert(0, "period", pnl['year'].astype(str))
+
+    chart = pnl.set_index("period")
+    st.bar_chart(
+        chart[['rent_income', 'electricity_income', 'expenses']].rename(
+            columns={"rent_income": "租金收入", "electricity_income": "電費收入", "expenses": "支出"}
+        ),
+        stack=False,
+    )
+    st.line_chart(chart[['cumulative_net']].rename(columns={"cumulative_net": "累計淨利"}))
+
+    st.dataframe(
+        pnl.drop(columns=[c for c in ("year", "month") if c in pnl]),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "period": "期間",
+            "rent_income": st.column_config.NumberColumn("租金收入", format="$%d"),
+            "electricity_income": st.column_config.NumberColumn("電費收入", format="$%d"),
+            "expenses": st.column_config.NumberColumn("支出", format="$%d"),
+            "net_income": st.column_config.NumberColumn("淨利", format="$%d"),
+            "cumulative_net": st.column_config.NumberColumn("累計淨利", format="$%d"),
+            "net_yoy": st.column_config.NumberColumn("淨利年增減", format="$%d"),
+        },
+    )
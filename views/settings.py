@@ -1,5 +1,22 @@
+import time
+
 import streamlit as st
 from components.cards import section_header
+from components.refresh import refresh_after_write
+from services.backend import pd
+from services.export import EXPORTS, export_csv, export_filename
+from services.importer import IMPORTS, import_csv_files
+from services.profiling import PROFILE_ENV, list_profiles, load_allocations, top_functions
+
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 1, "statements": 1}
+
+
+def _read_export(db, name, compress):
+    """匯出內容（bytes）；讀完即關閉暫存檔，超過 SPOOL_MAX_BYTES 的磁碟暫存檔才會刪除"""
+    with export_csv(db, name, compress) as f:
+        return f.read()
+
 
 def render(db):
     section_header("⚙️ 系統設置", "System Settings")
@@ -7,13 +24,123 @@ def render(db):
     st.info("目前使用 Supabase 雲端資料庫，資料已自動備份於雲端。")
     
     st.subheader("📥 資料匯出")
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        name = st.selectbox("匯出項目", list(EXPORTS), format_func=lambda k: EXPORTS[k][0])
+    with c2:
+        compress = st.checkbox("gzip 壓縮", help="資料量大時可大幅縮小下載檔")
+    # data 給函式：按下下載才執行 COPY，畫面顯示時不查詢資料庫
+    # （name / compress 在建立時綁定，下面匯入的迴圈會重新指定 name）
+    st.download_button(
+        "下載 CSV",
+        data=lambda name=name, compress=compress: _read_export(db, name, compress),
+        file_name=export_filename(name, compress),
+        mime="application/gzip" if compress else "text/csv",
+        use_container_width=True,
+    )
+
+    st.divider()
+    st.subheader("📤 批次匯入")
+    st.caption("第一列為欄位名稱；所有檔案驗證通過才會在同一個交易內寫入，否則列出每一列的錯誤。")
+    
+    uploads = {}
+    cols = st.columns(len(IMPORTS))
+    for col, (name, (label, required, optional)) in zip(cols, IMPORTS.items()):
+        with col:
+            f = st.file_uploader(label, type="csv", key=f"import_{name}")
+            st.caption(f"必填: {', '.join(required)}" + (f"；選填: {', '.join(optional)}" if optional else ""))
+            if f is not None:
+                uploads[name] = f
+    
+    period_id = None
+    if "meters" in uploads:
+        periods = db.get_all_periods()
+        if periods:
+            period = st.selectbox(
+                "電表讀數的計費期間", periods,
+                format_func=lambda p: f"{p['period_year']}年 {p['period_month_start']}-{p['period_month_end']}月",
+            )
+            period_id = period["id"]
+        else:
+            st.warning("請先在電費管理新增計費期間")
+    
+    if st.button("開始匯入", type="primary", disabled=not uploads):
+        ok, msg, report = import_csv_files(db, uploads, period_id=period_id)
+        if ok:
+            refresh_after_write(msg)
+        st.error(msg)
+        if not report.empty:
+            st.dataframe(report, use_container_width=True, hide_index=True)
+
+    st.divider()
+    st.subheader("🏢 房間設定")
+    st.caption("分攤群組相同的房間平分所在樓層台電單據的公用電；留空為獨享電表。刪除的列會停用該房間（歷史紀錄保留）。")
+    
+    columns = ["room_number", "building", "floor", "sharing_group"]
+    edited = st.data_editor(
+        pd.DataFrame(list(db.get_rooms().rooms), columns=columns),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "room_number": st.column_config.TextColumn("房號", required=True),
+            "building": st.column_config.TextColumn("棟"),
+            "floor": st.column_config.NumberColumn("樓層", min_value=0, step=1, required=True),
+            "sharing_group": st.column_config.TextColumn("分攤群組"),
+        },
+        key="rooms_editor",
+    )
+    if st.button("儲存房間設定"):
+        ok, msg = db.save_rooms(edited.to_dict("records"))
+        if ok:
+            refresh_after_write(msg)
+        st.error(msg)
+    
+    st.divider()
+    st.subheader("🩺 系統診斷")
+    
+    warmup = getattr(db, "warmup_status", None)
+    if warmup:
+        if warmup["state"] == "done":
+            st.caption(f"啟動暖機完成，耗時 {warmup['duration_ms']:,.0f} ms")
+        elif warmup["state"] == "failed":
+            st.caption(f"啟動暖機失敗（{warmup['duration_ms']:,.0f} ms）: {warmup['error']}")
+        else:
+            st.caption("啟動暖機進行中…")
+    
+    sync = getattr(db, "sync", None)
+    if sync:
+        status = sync.status
+        if status["synced_at"]:
+            st.caption(f"本機鏡像：{time.time() - status['synced_at']:,.0f} 秒前完整同步")
+        else:
+            st.caption(f"本機鏡像尚未就緒，讀取改查 Supabase（{status['state']}）")
+        if status["error"]:
+            st.caption(f"鏡像同步錯誤: {status['error']}")
+    
+    stats = st.session_state.get("last_query_stats")
+    if stats:
+        st.caption(f"上一頁「{stats['menu']}」: {stats['connections']} 個連線、{stats['statements']} 個 SQL 語句")
+    
+    profiles = list_profiles()
+    if not profiles:
+        st.caption(f"尚無效能分析紀錄。設定環境變數 {PROFILE_ENV}=1 或在網址加上 ?profile=1 後重新操作頁面。")
+        return
+    
+    labels = {
+        f"{p['name']} ({p['wall_ms']} ms)" if p['wall_ms'] is not None else p['name']: p
+        for p in profiles
+    }
+    selected = labels[st.selectbox("選擇分析紀錄", list(labels.keys()), key="profile_pick")]
+    
     c1, c2 = st.columns(2)
     with c1:
-        if st.button("下載房客資料 (CSV)", use_container_width=True):
-            df = db.get_tenants()
-            st.download_button("點此下載", df.to_csv(index=False).encode('utf-8-sig'), "tenants.csv", "text/csv")
-            
+        st.markdown("##### ⏱️ 耗時函式")
+        st.dataframe(top_functions(selected["path"]), use_container_width=True, hide_index=True)
     with c2:
-        if st.button("下載收支紀錄 (CSV)", use_container_width=True):
-            df = db.get_expenses(limit=1000)
-            st.download_button("點此下載", df.to_csv(index=False).encode('utf-8-sig'), "expenses.csv", "text/csv")
\ No newline at end of file
+        st.markdown("##### 🧠 記憶體配置")
+        allocations = load_allocations(selected["path"]).get("allocations", [])
+        st.dataframe(allocations, use_container_width=True, hide_index=True)
+    
+    with open(selected["path"], "rb") as f:
+        st.download_button("下載原始 .prof 檔", f.read(), selected["name"], "application/octet-stream")
\ No newline at end of file
@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
-import time
+from components.tabs import lazy_tabs
+from components.refresh import refresh_after_write
 
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 1, "statements": 1}
 
-# 房號列表
-ROOM_NUMBERS = ["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
+# 房客列表只取畫面上的欄位
+TENANT_LIST_COLUMNS = [
+    'room_number', 'tenant_name', 'phone', 'base_rent',
+    'lease_start', 'lease_end', 'payment_method'
+]
 
 
 def render(db):
@@ -12,25 +17,22 @@ def render(db):
     st.header("👥 房客管理")
     st.markdown("新增、編輯、刪除房客資訊")
     
-    tab1, tab2, tab3 = st.tabs(["📋 房客列表", "➕ 新增房客", "✏️ 編輯房客"])
+    tab = lazy_tabs(["📋 房客列表", "➕ 新增房客", "✏️ 編輯房客"], key="tenants")
     
     # === TAB 1: 列表 ===
-    with tab1:
+    if tab == "📋 房客列表":
         st.subheader("房客列表")
-        tenants = db.get_tenants()
+        tenants = db.get_tenants(columns=TENANT_LIST_COLUMNS)
         if not tenants.empty:
             st.dataframe(
-                tenants[[
-                    'room_number', 'tenant_name', 'phone', 'base_rent', 
-                    'lease_start', 'lease_end', 'payment_method'
-                ]],
+                tenants,
                 column_config={
                     "room_number": "房號",
                     "tenant_name": "房客名稱",
                     "phone": "電話",
                     "base_rent": st.column_config.NumberColumn("月租", format="$%d"),
-                    "lease_start": "租約開始",
-                    "lease_end": "租約到期",
+                    "lease_start": st.column_config.DateColumn("租約開始", format="YYYY-MM-DD"),
+                    "lease_end": st.column_config.DateColumn("租約到期", format="YYYY-MM-DD"),
                     "payment_method": "繳款方式"
                 },
                 use_container_width=True,
@@ -40,12 +42,12 @@ def render(db):
             st.info("📭 目前沒有房客")
     
     # === TAB 2: 新增 ===
-    with tab2:
+    elif tab == "➕ 新增房客":
         st.subheader("➕ 新增房客")
         with st.form("add_tenant_form", border=True):
             c1, c2 = st.columns(2)
             with c1:
-                room_number = st.selectbox("房號 (必填)", ROOM_NUMBERS, key="room_add")
+                room_number = st.selectbox("房號 (必填)", db.get_rooms().numbers, key="room_add")
                 tenant_name = st.text_input("房客名稱 (必填)", placeholder="例: 王小明", key="name_add")
             with c2:
                 phone = st.text_input("電話 (選填)", placeholder="例: 0912-345-678", key="phone_add")
@@ -91,16 +93,14 @@ def render(db):
                             discount_notes=discount_notes
                         )
                         if ok:
-                            st.success(msg)
-                            time.sleep(1)
-                            st.rerun()
+                            refresh_after_write(msg)
                         else:
                             st.error(msg)
                     except Exception as e:
                         st.error(f"❌ 新增失敗: {str(e)}")
     
     # === TAB 3: 編輯 ===
-    with tab3:
+    elif tab == "✏️ 編輯房客":
         st.subheader("✏️ 編輯房客")
         tenants = db.get_tenants()
         if not tenants.empty:
@@ -123,9 +123,9 @@ def render(db):
                 
                 c3, c4 = st.columns(2)
                 with c3:
-                    new_lease_start = st.date_input("租約開始", value=pd.to_datetime(tenant_data['lease_start']).date(), key="start_edit")
+                    new_lease_start = st.date_input("租約開始", value=tenant_data['lease_start'].date(), key="start_edit")
                 with c4:
-                    new_lease_end = st.date_input("租約到期", value=pd.to_datetime(tenant_data['lease_end']).date(), key="end_edit")
+                    new_lease_end = st.date_input("租約到期", value=tenant_data['lease_end'].date(), key="end_edit")
                 
                 new_payment_method = st.selectbox("繳款方式", ["月繳", "半年繳", "年繳"], 
                                                   index=["月繳", "半年繳", "年繳"].index(tenant_data.get('payment_method', '月繳')),
@@ -159,9 +159,7 @@ def render(db):
                             tenant_id=int(tenants[tenants['room_number'] == selected_room]['id'].iloc[0])
                         )
                         if ok:
-                            st.success(msg)
-                            time.sleep(1)
-                            st.rerun()
+                            refresh_after_write(msg)
                         else:
                             st.error(msg)
                     except Exception as e:
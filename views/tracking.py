@@ -1,26 +1,42 @@
 import streamlit as st
-import time
 from datetime import date, datetime
 from components.cards import section_header
+from components.tabs import lazy_tabs
+from components.refresh import refresh_after_write, show_flash
+from components.pager import keyset_pager
 
-ALL_ROOMS = ["1A", "1B", "2A", "2B", "3A", "3B", "3C", "3D", "4A", "4B", "4C", "4D"]
+# 每次 rerun 的查詢預算（設定 RENTAL_QUERY_BUDGET 時由 main 檢查）
+QUERY_BUDGET = {"connections": 2, "statements": 2}
+
+PAGE_SIZE = 50
+UNPAID_PAGE_SIZE = 100
+UNPAID_COLUMNS = ["id", "room_number", "tenant_name", "payment_year", "payment_month", "amount"]
+SCHEDULE_COLUMNS = ["room_number", "tenant_name", "payment_year", "payment_month", "amount",
+                    "paid_amount", "due_date", "status", "paid_date", "notes"]
 
 def render(db):
     section_header("📅 繳費追蹤", "Payment Tracking")
     
-    tab1, tab2 = st.tabs(["🔍 繳費排程查詢", "📝 標記已繳"])
+    tab = lazy_tabs(["🔍 繳費排程查詢", "📝 標記已繳"], key="tracking")
     
-    with tab1:
+    if tab == "🔍 繳費排程查詢":
         c1, c2, c3 = st.columns(3)
-        room_filter = c1.selectbox("房號篩選", ["全部"] + ALL_ROOMS)
+        room_filter = c1.selectbox("房號篩選", ["全部"] + db.get_rooms().numbers)
         status_filter = c2.selectbox("狀態篩選", ["全部", "未繳", "已繳"])
         year_filter = c3.number_input("年份", value=datetime.now().year)
         
-        df = db.get_payment_schedule(
+        filters = dict(
             room=room_filter if room_filter != "全部" else None,
             status=status_filter if status_filter != "全部" else None,
             year=year_filter
         )
+        df = keyset_pager(
+            f"schedule_{room_filter}_{status_filter}_{year_filter}",
+            lambda after, limit: db.get_payment_schedule(**filters, after=after, limit=limit, columns=SCHEDULE_COLUMNS),
+            schedule_cursor,
+            page_size=PAGE_SIZE,
+            total=db.estimate_payment_schedule_count(**filters),
+        )
         
         if not df.empty:
             st.dataframe(
@@ -30,43 +46,102 @@ def render(db):
                 column_config={
                     "amount": st.column_config.NumberColumn("金額", format="$%d"),
                     "paid_amount": st.column_config.NumberColumn("已付", format="$%d"),
+                    "due_date": st.column_config.DateColumn("應繳日", format="YYYY-MM-DD"),
+                    "paid_date": st.column_config.DateColumn("繳費日", format="YYYY-MM-DD"),
                     "status": "狀態"
                 }
             )
         else:
             st.info("無符合條件的資料")
 
-    with tab2:
-        st.markdown("##### 快速標記未繳項目")
-        unpaid = db.get_payment_schedule(status="未繳")
+    elif tab == "📝 標記已繳":
+        mark_paid_section(db)
+
+def schedule_cursor(row):
+    """一列繳費排程 -> 下一頁的 keyset 游標"""
+    return (int(row['payment_year']), int(row['payment_month']), row['room_number'])
+
+def unpaid_options(unpaid):
+    """以向量化字串運算產生「標籤 -> id」選項（取代 iterrows）"""
+    labels = (
+        unpaid['room_number'].astype(str) + " " + unpaid['tenant_name'].astype(str)
+        + " - " + unpaid['payment_year'].astype(str) + "/" + unpaid['payment_month'].astype(str) + "月 ($"
+        + unpaid['amount'].astype(float).round().astype(int).astype(str) + ")"
+    )
+    return dict(zip(labels, unpaid['id']))
+
+@st.fragment
+def mark_paid_section(db):
+    """未繳清單與標記表單：標記後只重跑這個 fragment"""
+    show_flash()
+    st.markdown("##### 快速標記未繳項目")
+    # 未繳項目可能跨很多年，分頁取用並只取需要的欄位
+    unpaid = keyset_pager(
+        "unpaid",
+        lambda after, limit: db.get_payment_schedule(status="未繳", after=after, limit=limit, columns=UNPAID_COLUMNS),
+        schedule_cursor,
+        page_size=UNPAID_PAGE_SIZE,
+    )
+    
+    if unpaid.empty:
+        st.success("🎉 太棒了！目前所有帳單皆已繳清。")
+        return
+    
+    options = unpaid_options(unpaid)
+    selected_label = st.selectbox("選擇待繳項目", list(options.keys()))
+    selected_id = options[selected_label]
+    
+    # 找到該筆資料的預設金額
+    default_amount = float(unpaid.loc[unpaid['id'] == selected_id, 'amount'].iloc[0])
+    
+    with st.form("mark_paid_form"):
+        c1, c2 = st.columns(2)
+        paid_d = c1.date_input("繳費日期", value=date.today())
+        paid_a = c2.number_input("實收金額", value=default_amount, step=100.0)
+        note = st.text_input("備註")
         
-        if unpaid.empty:
-            st.success("🎉 太棒了！目前所有帳單皆已繳清。")
-        else:
-            # 製作選項清單
-            options = {
-                f"{r['room_number']} {r['tenant_name']} - {r['payment_month']}月 (${r['amount']:.0f})": r['id'] 
-                for _, r in unpaid.iterrows()
-            }
-            
-            selected_label = st.selectbox("選擇待繳項目", list(options.keys()))
-            selected_id = options[selected_label]
-            
-            # 找到該筆資料的預設金額
-            target_row = unpaid[unpaid['id'] == selected_id].iloc[0]
-            default_amount = float(target_row['amount'])
-            
-            with st.form("mark_paid_form"):
-                c1, c2 = st.columns(2)
-                paid_d = c1.date_input("繳費日期", value=date.today())
-                paid_a = c2.number_input("實收金額", value=default_amount, step=100.0)
-                note = st.text_input("備註")
-                
-                if st.form_submit_button("✅ 標記為已繳", type="primary"):
-                    ok, msg = db.mark_payment_done(selected_id, paid_d.strftime("%Y-%m-%d"), paid_a, note)
-                    if ok:
-                        st.toast(msg, icon="✅")
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.toast(msg, icon="❌")
\ No newline at end of file
+        if st.form_submit_button("✅ 標記為已繳", type="primary"):
+            ok, msg = db.mark_payments_done_bulk([(selected_id, paid_d.strftime("%Y-%m-%d"), paid_a, note)])
+            if ok:
+                refresh_after_write(msg)
+            else:
+                st.toast(msg, icon="❌")
+    
+    # === 批次標記 ===
+    st.markdown("##### 批次標記")
+    grid = unpaid[['id', 'room_number', 'tenant_name', 'payment_year', 'payment_month', 'amount']].copy()
+    grid.insert(0, "selected", False)
+    grid['paid_amount'] = grid['amount']
+    grid['notes'] = ""
+    
+    with st.form("mark_paid_bulk_form"):
+        edited = st.data_editor(
+            grid,
+            use_container_width=True,
+            hide_index=True,
+            column_order=["selected", "room_number", "tenant_name", "payment_year", "payment_month",
+                          "amount", "paid_amount", "notes"],
+            column_config={
+                "selected": st.column_config.CheckboxColumn("選取", default=False),
+                "room_number": "房號",
+                "tenant_name": "房客",
+                "payment_year": st.column_config.NumberColumn("年", format="%d"),
+                "payment_month": st.column_config.NumberColumn("月", format="%d"),
+                "amount": st.column_config.NumberColumn("應繳", format="$%d"),
+                "paid_amount": st.column_config.NumberColumn("實收金額", format="$%d", min_value=0),
+                "notes": st.column_config.TextColumn("備註"),
+            },
+            disabled=["room_number", "tenant_name", "payment_year", "payment_month", "amount"],
+            key="mark_paid_bulk_editor",
+        )
+        bulk_date = st.date_input("繳費日期", value=date.today(), key="bulk_paid_date")
+        
+        if st.form_submit_button("✅ 標記選取項目為已繳", type="primary"):
+            chosen = edited[edited['selected']]
+            paid_date = bulk_date.strftime("%Y-%m-%d")
+            rows = list(zip(chosen['id'], [paid_date] * len(chosen), chosen['paid_amount'], chosen['notes']))
+            ok, msg = db.mark_payments_done_bulk(rows)
+            if ok:
+                refresh_after_write(msg)
+            else:
+                st.toast(msg, icon="❌")
\ No newline at end of file